@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime
+
+import cv2
+
+
+def load_sample(input_dir, file_lists, sample_size, seed):
+    """Pick videos present in input_dir from the TP/FP gs:// file lists."""
+    names = []
+    for list_path in file_lists:
+        with open(list_path, 'r') as f:
+            names.extend(os.path.basename(line.strip()) for line in f if line.strip())
+    names = sorted(set(n for n in names if os.path.exists(os.path.join(input_dir, n))))
+    random.Random(seed).shuffle(names)
+    return [os.path.join(input_dir, n) for n in names[:sample_size]]
+
+
+def frame_count_of(video_path):
+    cap = cv2.VideoCapture(video_path)
+    n = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    cap.release()
+    return n
+
+
+def run_backend(backend, model_name, videos, precision=None):
+    from detector import FollowingDistanceDetector  # Import the local (injected) detector class
+
+    detector = FollowingDistanceDetector(model_name=model_name, backend=backend, precision=precision)
+    # Counted before timing starts: opening each container again is not the backend's cost
+    frame_counts = {video_path: frame_count_of(video_path) for video_path in videos}
+    verdicts = {}
+    frames = 0
+    start = time.perf_counter()
+    for video_path in videos:
+        name = os.path.basename(video_path)
+        try:
+            result = detector.analyze_video(video_path, output_path=None, annotate=False)
+            verdicts[name] = {
+                "status": result["status"],
+                "seconds": [bool(s["isDetected"]) for s in result["logs"]["followingDistance"]],
+            }
+            frames += frame_counts[video_path]
+        except Exception as e:
+            print(f"[{backend}] Error processing {video_path}: {e}")
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed_sec": elapsed,
+        "frames": frames,
+        "frames_per_sec": frames / elapsed if elapsed > 0 else 0.0,
+        "verdicts": verdicts,
+    }
+
+
+def agreement(reference, candidate):
+    common = sorted(set(reference) & set(candidate))
+    if not common:
+        return {"videos": 0, "verdict_agreement": None, "second_agreement": None, "mismatches": []}
+    same = [n for n in common if reference[n]["status"] == candidate[n]["status"]]
+    sec_total = sec_same = 0
+    for n in common:
+        a, b = reference[n]["seconds"], candidate[n]["seconds"]
+        length = max(len(a), len(b))
+        a = a + [False] * (length - len(a))
+        b = b + [False] * (length - len(b))
+        sec_total += length
+        sec_same += sum(1 for x, y in zip(a, b) if x == y)
+    return {
+        "videos": len(common),
+        "verdict_agreement": len(same) / len(common),
+        "second_agreement": sec_same / sec_total if sec_total else 1.0,
+        "mismatches": [
+            {"video": n, "reference": reference[n]["status"], "candidate": candidate[n]["status"]}
+            for n in common if n not in same
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inference backends on a sample of the TP/FP corpus")
+    parser.add_argument("--input_dir", required=True)
+    parser.add_argument("--file_lists", nargs="+", default=["tp_file_list.txt", "fp_file_list.txt"])
+    parser.add_argument("--sample", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "openvino"])
+    parser.add_argument("--model", default="yolo11x.pt")
+    parser.add_argument("--output", default="backend_benchmark.json")
+    args = parser.parse_args()
+
+    videos = load_sample(args.input_dir, args.file_lists, args.sample, args.seed)
+    print(f"Benchmarking {len(videos)} videos on backends: {args.backends}")
+
+    runs = {}
+    for backend in args.backends:
+        print(f"--- Backend: {backend} ---")
+        runs[backend] = run_backend(backend, args.model, videos)
+        print(f"{backend}: {runs[backend]['frames_per_sec']:.1f} frames/sec")
+
+    reference = args.backends[0]
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "reference": reference,
+        "videos": [os.path.basename(v) for v in videos],
+        "backends": {},
+    }
+    for backend, run in runs.items():
+        report["backends"][backend] = {
+            "elapsed_sec": run["elapsed_sec"],
+            "frames": run["frames"],
+            "frames_per_sec": run["frames_per_sec"],
+            "speedup": (run["frames_per_sec"] / runs[reference]["frames_per_sec"]) if runs[reference]["frames_per_sec"] else None,
+            "agreement": agreement(runs[reference]["verdicts"], run["verdicts"]),
+        }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    print("| Backend | frames/sec | speedup | verdict agreement | per-second agreement |")
+    print("| :--- | ---: | ---: | ---: | ---: |")
+    for backend, r in report["backends"].items():
+        a = r["agreement"]
+        speedup = f"{r['speedup']:.2f}x" if r["speedup"] else "-"
+        verdict = f"{a['verdict_agreement']:.1%}" if a["verdict_agreement"] is not None else "-"
+        second = f"{a['second_agreement']:.1%}" if a["second_agreement"] is not None else "-"
+        print(f"| {backend} | {r['frames_per_sec']:.1f} | {speedup} | {verdict} | {second} |")
+    print(f"Saved report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
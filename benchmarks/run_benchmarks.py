@@ -0,0 +1,206 @@
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.synthetic import RESOLUTIONS, generate_suite
+from stage_profiler import peak_rss_mb, summarize_profiles
+
+# Offline throughput benchmarks for the following-distance pipeline.
+#
+#   python -m benchmarks.run_benchmarks --detector_module detector_dynamic            # stub backend
+#   python -m benchmarks.run_benchmarks --real --model yolo11x.pt                      # real model
+#   python -m benchmarks.run_benchmarks --save_baseline                                # record baseline
+#   python -m benchmarks.run_benchmarks --check --tolerance 0.1                        # exit 1 on regression
+#   python -m benchmarks.run_benchmarks --real --cases suite --streams 4               # batched multi-stream
+#
+# Every case runs in a fresh spawned process so peak RSS is per case.
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+SUITE_EXPERIMENTS = [
+    {"id": "bench_a", "params": {"DIST_DANGER_M": 13.0, "DANGER_PERSISTENCE_SEC": 0.6}},
+    {"id": "bench_b", "params": {"DIST_DANGER_M": 14.5, "DANGER_PERSISTENCE_SEC": 0.8}},
+]
+
+
+def _load_detector_module(name):
+    module = importlib.import_module(name)
+    # run_experiment_suite does `from detector import FollowingDistanceDetector`
+    sys.modules.setdefault("detector", module)
+    return module
+
+
+def _make_backend(opts):
+    if opts["real"]:
+        return opts["backend"]
+    from benchmarks.stub_backend import StubBackend
+
+    return StubBackend()
+
+
+def _make_detector(opts):
+    module = _load_detector_module(opts["detector_module"])
+    backend = _make_backend(opts)
+    detector = module.FollowingDistanceDetector(model_name=opts["model"], backend=backend)
+    if not opts["real"]:
+        backend.frame_skip = detector.params["FRAME_SKIP"]
+    return detector
+
+
+def _metrics(elapsed, profiles):
+    summary = summarize_profiles(profiles)
+    frames = summary["counters"].get("frames_read", {}).get("sum", 0)
+    return {
+        "elapsed_sec": elapsed,
+        "frames": frames,
+        "frames_per_sec": frames / elapsed if elapsed > 0 else 0.0,
+        "stage_mean_ms_per_video": {name: 1000.0 * s["mean"] for name, s in summary["stages_sec"].items()},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_analyze_video(opts, video_path):
+    detector = _make_detector(opts)
+    detector.analyze_video(video_path, profile=False)  # warm-up (model load, codec init)
+    start = time.perf_counter()
+    result = detector.analyze_video(video_path, profile=True)
+    return _metrics(time.perf_counter() - start, [result["profile"]])
+
+
+def bench_batch(opts, videos):
+    detector = _make_detector(opts)
+    profiles = []
+    start = time.perf_counter()
+    for video_path in videos:
+        profiles.append(detector.analyze_video(video_path, profile=True)["profile"])
+    return _metrics(time.perf_counter() - start, profiles)
+
+
+def bench_suite(opts, video_dir):
+    _load_detector_module(opts["detector_module"])
+    from run_experiment_suite import run_experiment_suite
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = os.path.join(tmp, "experiments.json")
+        with open(config_path, 'w') as f:
+            json.dump(SUITE_EXPERIMENTS, f)
+        output_dir = os.path.join(tmp, "output")
+        os.makedirs(output_dir)
+
+        start = time.perf_counter()
+        run_experiment_suite(video_dir, output_dir, config_path, profile=True, backend=_make_backend(opts),
+                             streams=opts["streams"])
+        elapsed = time.perf_counter() - start
+
+        profiles = []
+        for exp in SUITE_EXPERIMENTS:
+            with open(os.path.join(output_dir, f"profile_{exp['id']}.jsonl"), 'r') as f:
+                profiles.extend(json.loads(line)["profile"] for line in f if line.strip())
+    return _metrics(elapsed, profiles)
+
+
+def _run_case(case):
+    kind, opts, target = case
+    if kind == "analyze_video":
+        return bench_analyze_video(opts, target)
+    if kind == "batch":
+        return bench_batch(opts, target)
+    return bench_suite(opts, target)
+
+
+def run_cases(cases):
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for name, case in cases:
+        print(f"--- {name} ---")
+        with ctx.Pool(1) as pool:
+            results[name] = pool.apply(_run_case, (case,))
+        print(f"{name}: {results[name]['frames_per_sec']:.1f} frames/sec, peak RSS {results[name]['peak_rss_mb']:.0f} MB")
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return a list of regression messages (throughput below baseline * (1 - tolerance))."""
+    regressions = []
+    for name, base in baseline["cases"].items():
+        current = results.get(name)
+        if current is None:
+            continue
+        floor = base["frames_per_sec"] * (1 - tolerance)
+        if current["frames_per_sec"] < floor:
+            regressions.append(
+                f"{name}: {current['frames_per_sec']:.1f} frames/sec < {floor:.1f} "
+                f"(baseline {base['frames_per_sec']:.1f}, tolerance {tolerance:.0%})"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Following-distance pipeline benchmarks")
+    parser.add_argument("--detector_module", default="detector_dynamic")
+    parser.add_argument("--video_dir", default=os.path.join(tempfile.gettempdir(), "fd_benchmark_videos"))
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--copies", type=int, default=2, help="Synthetic clips per resolution for batch/suite cases")
+    parser.add_argument("--cases", nargs="+", default=["analyze_video", "batch", "suite"],
+                        choices=["analyze_video", "batch", "suite"])
+    parser.add_argument("--real", action="store_true", help="Use the real model instead of the stub backend")
+    parser.add_argument("--model", default="yolo11x.pt")
+    parser.add_argument("--backend", default="torch", help="Inference backend for --real")
+    parser.add_argument("--streams", type=int, default=1, help="Concurrent videos in the experiment_suite case")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--save_baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="Fail when throughput regresses beyond --tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    videos = generate_suite(args.video_dir, seconds=args.seconds, copies=args.copies)
+    opts = {"detector_module": args.detector_module, "real": args.real, "model": args.model, "backend": args.backend,
+            "streams": args.streams}
+
+    cases = []
+    if "analyze_video" in args.cases:
+        for name, _, _ in RESOLUTIONS:
+            video_path = next(v for v in videos if f"_{name}_" in os.path.basename(v))
+            cases.append((f"analyze_video[{name}]", ("analyze_video", opts, video_path)))
+    if "batch" in args.cases:
+        cases.append(("batch", ("batch", opts, videos)))
+    if "suite" in args.cases:
+        cases.append(("experiment_suite", ("suite", opts, args.video_dir)))
+
+    results = run_cases(cases)
+    mode = f"real_{args.backend}" if args.real else "stub"
+    report = {"timestamp": datetime.now().isoformat(), "mode": mode, "cases": results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {args.output}")
+
+    baseline_path = os.path.join(BASELINE_DIR, f"{mode}.json")
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {baseline_path}")
+
+    if args.check:
+        if not os.path.exists(baseline_path):
+            print(f"No baseline at {baseline_path}; run with --save_baseline first")
+            sys.exit(2)
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("Throughput regressions:")
+            for msg in regressions:
+                print(f"  {msg}")
+            sys.exit(1)
+        print("No throughput regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import json
+import os
+
+import numpy as np
+
+from stage_profiler import NULL_PROFILER
+
+# Deterministic stand-in for inference_backends.YoloTrackBackend.
+# Replays the boxes / track ids scripted by benchmarks.synthetic so the
+# detector's decode, lane and distance logic can be benchmarked without a model.
+
+
+class StubBackend:
+    name = "stub"
+
+    def __init__(self, frame_skip=2):
+        self.frame_skip = frame_skip
+
+    def open_stream(self, video_path, start_frame=0):
+        script_path = os.path.splitext(str(video_path))[0] + ".boxes.json"
+        with open(script_path, 'r') as f:
+            # First kept frame after a seek to start_frame is the next multiple of frame_skip (1-based)
+            return {"video_path": video_path, "script": json.load(f), "calls": start_frame // self.frame_skip}
+
+    def _replay(self, frame, stream):
+        # analyze_video infers on frame_count % FRAME_SKIP == 0 (1-based), i.e. 0-based index k*skip + skip - 1
+        stream["calls"] += 1
+        idx = stream["calls"] * self.frame_skip - 1
+        script = stream["script"]
+        frames = script["frames"]
+        if idx >= len(frames) or not frames[idx]:
+            return None, None
+
+        # Scripts are in source-resolution pixels; follow the frame actually handed to us
+        sx = frame.shape[1] / script["width"]
+        sy = frame.shape[0] / script["height"]
+        entries = np.asarray(frames[idx], dtype=np.float32)
+        boxes = entries[:, :4] * np.array([sx, sy, sx, sy], dtype=np.float32)
+        track_ids = entries[:, 4].astype(int).tolist()
+        return boxes, track_ids
+
+    def track_batch(self, frames, streams, profiler=NULL_PROFILER, isolate_errors=False):
+        results = []
+        for frame, stream in zip(frames, streams):
+            try:
+                results.append(self._replay(frame, stream))
+            except Exception as e:
+                if not isolate_errors:
+                    raise
+                print(f"Error processing {stream['video_path']}: {e}")
+                results.append(None)
+        return results
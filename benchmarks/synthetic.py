@@ -0,0 +1,81 @@
+import json
+import math
+import os
+
+import cv2
+import numpy as np
+
+# Synthetic dashcam clips for throughput benchmarks.
+# Each clip has a lead vehicle that approaches into the danger zone and backs
+# off again (so danger / warning / recovery paths all run), plus an out-of-lane
+# vehicle. The exact boxes are written next to the clip as <name>.boxes.json and
+# replayed by benchmarks.stub_backend.StubBackend.
+
+# (name, width, height): 16:9 clips take the HFOV 100 branch, 4:3 clips HFOV 85
+RESOLUTIONS = [
+    ("1080p_16x9", 1920, 1080),
+    ("720p_16x9", 1280, 720),
+    ("1440x1080_4x3", 1440, 1080),
+    ("vga_4x3", 640, 480),
+]
+
+
+def scripted_boxes(frame_idx, width, height, fps, period_sec=6.0):
+    """[[xc, yc, w, h, track_id], ...] in pixels for frame_idx (0-based)."""
+    phase = (frame_idx / fps) % period_sec / period_sec
+    closeness = 0.5 - 0.5 * math.cos(2 * math.pi * phase)  # 0 far -> 1 close -> 0 far
+
+    lead_w = width * (0.06 + 0.30 * closeness)
+    lead_h = lead_w * 0.75
+    lead_bottom = height * (0.62 + 0.33 * closeness)
+    lead_xc = width / 2 + width * 0.02
+    boxes = [[lead_xc, lead_bottom - lead_h / 2, lead_w, lead_h, 1]]
+
+    side_w = width * 0.10
+    side_h = side_w * 0.75
+    side_xc = width * (0.15 + 0.05 * math.sin(2 * math.pi * phase))
+    boxes.append([side_xc, height * 0.75 - side_h / 2, side_w, side_h, 2])
+    return boxes
+
+
+def render_frame(boxes, width, height):
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[: height // 2] = (200, 170, 140)   # sky
+    frame[height // 2:] = (90, 90, 90)       # road
+    cx = width // 2
+    cv2.line(frame, (cx - width // 20, height // 2), (cx - width // 3, height), (255, 255, 255), max(2, width // 300))
+    cv2.line(frame, (cx + width // 20, height // 2), (cx + width // 3, height), (255, 255, 255), max(2, width // 300))
+    for xc, yc, w, h, _ in boxes:
+        cv2.rectangle(frame, (int(xc - w / 2), int(yc - h / 2)), (int(xc + w / 2), int(yc + h / 2)), (30, 30, 160), -1)
+    return frame
+
+
+def generate_video(output_dir, name, width, height, seconds=10, fps=30.0):
+    """Write <name>.mp4 and <name>.boxes.json; returns the video path. Existing clips are reused."""
+    video_path = os.path.join(output_dir, f"{name}.mp4")
+    script_path = os.path.join(output_dir, f"{name}.boxes.json")
+    if os.path.exists(video_path) and os.path.exists(script_path):
+        return video_path
+
+    num_frames = int(seconds * fps)
+    script = {"width": width, "height": height, "fps": fps, "frames": []}
+    out = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for idx in range(num_frames):
+        boxes = scripted_boxes(idx, width, height, fps)
+        script["frames"].append(boxes)
+        out.write(render_frame(boxes, width, height))
+    out.release()
+
+    with open(script_path, 'w') as f:
+        json.dump(script, f)
+    return video_path
+
+
+def generate_suite(output_dir, resolutions=RESOLUTIONS, seconds=10, fps=30.0, copies=1):
+    """Generate `copies` clips per resolution; returns the list of video paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    videos = []
+    for name, width, height in resolutions:
+        for i in range(copies):
+            videos.append(generate_video(output_dir, f"synthetic_{name}_{i:02d}", width, height, seconds, fps))
+    return videos
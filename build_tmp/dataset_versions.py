@@ -0,0 +1,386 @@
+import argparse
+import errno
+import hashlib
+import json
+import os
+import random
+import shutil
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+# optimize_v4/v5/v6.py の非破壊版: データセットのバージョンを「相対パス -> 内容ハッシュ」の
+# マニフェストとして記録し、画像本体は共有の content-addressed プールに 1 回だけ置く。
+#
+#   python build_tmp/dataset_versions.py --store ds_store import --src classification/dataset --name v3
+#   python build_tmp/dataset_versions.py --store ds_store derive --from v3 --name v4 --recipe v4
+#   python build_tmp/dataset_versions.py --store ds_store derive --from v4 --name v5 --recipe v5
+#   python build_tmp/dataset_versions.py --store ds_store derive --from v5 --name v6 \
+#       --op balance phone,cigarette others
+#   python build_tmp/dataset_versions.py --store ds_store checkout --name v6 --dest classification/dataset_v6
+#   python build_tmp/dataset_versions.py --store ds_store diff v4 v6
+#   python build_tmp/dataset_versions.py --store ds_store list
+#
+# <store>/objects/ab/cdef...  file contents, named by sha256 (read-only)
+# <store>/versions/<name>.json  {"files": {"train/phone/x.jpg": sha256}, "parent", "ops", "seed", ...}
+#
+# Ops work on <split>/<class>/ of the parent version (RECIPES: the v4 / v5 / v6
+# scripts). Sampling is seeded per op over sorted file names, so a
+# version can be re-derived exactly. checkout builds a training view from
+# hardlinks (symlinks across file systems) in seconds; disk usage grows with
+# unique images, not with the number of versions.
+#
+# diverse_uuid_limit / diverse_subsample / diverse_balance (recipes
+# v4-diverse ...) keep the same counts but pick for coverage instead of at
+# random, from image signatures cached by content hash (diverse_sampling.py).
+
+HASH_CHUNK = 1 << 20
+VIEW_MARKER = ".dataset_version"
+
+RECIPES = {
+    # optimize_v4.py: others は UUID ごとに 1 枚、phone / cigarette は 2/3 を残す
+    "v4": [["uuid_limit", "others", "1"], ["subsample", "phone", str(2 / 3)], ["subsample", "cigarette", str(2 / 3)]],
+    # optimize_v5.py: phone / cigarette を UUID ごとに 5 枚まで
+    "v5": [["uuid_limit", "phone", "5"], ["uuid_limit", "cigarette", "5"]],
+    # optimize_v6.py: phone / cigarette を others と同数まで
+    "v6": [["balance", "phone,cigarette", "others"]],
+}
+# Same steps with diverse_* ops: v4-diverse, v5-diverse, v6-diverse
+RECIPES.update({f"{name}-diverse": [[f"diverse_{op[0]}", *op[1:]] for op in ops] for name, ops in list(RECIPES.items())})
+
+
+def uuid_of(name):
+    """Source clip of an image: video_<UUID>_... (v4) or clip-<UUID>_... (v5); None if neither."""
+    if "video_" in name:
+        parts = name.split('_')
+        return parts[1] if len(parts) > 1 else None
+    if "clip-" in name:
+        return name.split('_')[0].replace("clip-", "")
+    return None
+
+
+def _class_files(files, split, class_name):
+    prefix = f"{split}/{class_name}/"
+    return sorted(p for p in files if p.startswith(prefix) and "/" not in p[len(prefix):])
+
+
+def _uuid_groups(files, split, class_name):
+    groups = defaultdict(list)
+    for path in _class_files(files, split, class_name):
+        uuid = uuid_of(os.path.basename(path))
+        if uuid is not None:
+            groups[uuid].append(path)
+    return groups
+
+
+def op_uuid_limit(ctx, files, rng, class_name, limit):
+    """Keep at most `limit` images per source UUID (images without a UUID are kept)."""
+    groups = _uuid_groups(files, ctx["split"], class_name)
+    removed = []
+    for uuid in sorted(groups):
+        fs = groups[uuid]
+        if len(fs) > int(limit):
+            rng.shuffle(fs)
+            removed.extend(fs[int(limit):])
+    return removed
+
+
+def op_subsample(ctx, files, rng, class_name, fraction):
+    """Keep int(n * fraction) images of the class."""
+    fs = _class_files(files, ctx["split"], class_name)
+    rng.shuffle(fs)
+    return fs[int(len(fs) * float(fraction)):]
+
+
+def op_balance(ctx, files, rng, class_names, reference):
+    """Downsample each of the comma-separated classes to the reference class's count."""
+    target = len(_class_files(files, ctx["split"], reference))
+    removed = []
+    for class_name in class_names.split(","):
+        fs = _class_files(files, ctx["split"], class_name)
+        rng.shuffle(fs)
+        removed.extend(fs[target:])
+    return removed
+
+
+# diverse_*: same targets as the random ops, but the kept images are chosen
+# for coverage from cached image signatures (diverse_sampling.py)
+
+def _signatures(ctx, files, paths):
+    from diverse_sampling import SignatureCache
+    cache = ctx.get("signatures")
+    if cache is None:
+        cache = ctx["signatures"] = SignatureCache(os.path.join(ctx["store"].root, "signatures.bin"))
+    digests = [files[p] for p in paths]
+    return cache.get(digests, [ctx["store"].object_path(d) for d in digests], ctx["workers"])
+
+
+def _diverse_removed(ctx, files, rng, paths, k):
+    from diverse_sampling import select_diverse
+    if k >= len(paths):
+        return []
+    keep = set(select_diverse(_signatures(ctx, files, paths), k, seed=rng.randrange(2 ** 32)))
+    return [p for i, p in enumerate(paths) if i not in keep]
+
+
+def op_diverse_uuid_limit(ctx, files, rng, class_name, limit):
+    """uuid_limit keeping the `limit` most dissimilar images of each UUID."""
+    from diverse_sampling import select_per_group
+    groups = _uuid_groups(files, ctx["split"], class_name)
+    paths = [p for uuid in sorted(groups) for p in groups[uuid]]
+    if not paths:
+        return []
+    keep = set(select_per_group(_signatures(ctx, files, paths), [len(groups[uuid]) for uuid in sorted(groups)],
+                                int(limit), seed=rng.randrange(2 ** 32)))
+    return [p for i, p in enumerate(paths) if i not in keep]
+
+
+def op_diverse_subsample(ctx, files, rng, class_name, fraction):
+    """subsample keeping the int(n * fraction) images that best cover the class."""
+    fs = _class_files(files, ctx["split"], class_name)
+    return _diverse_removed(ctx, files, rng, fs, int(len(fs) * float(fraction)))
+
+
+def op_diverse_balance(ctx, files, rng, class_names, reference):
+    """balance keeping, per class, the reference-count images that best cover it."""
+    target = len(_class_files(files, ctx["split"], reference))
+    removed = []
+    for class_name in class_names.split(","):
+        removed.extend(_diverse_removed(ctx, files, rng, _class_files(files, ctx["split"], class_name), target))
+    return removed
+
+
+OPS = {
+    "uuid_limit": op_uuid_limit,
+    "subsample": op_subsample,
+    "balance": op_balance,
+    "diverse_uuid_limit": op_diverse_uuid_limit,
+    "diverse_subsample": op_diverse_subsample,
+    "diverse_balance": op_diverse_balance,
+}
+
+
+class Store:
+    def __init__(self, root):
+        self.root = root
+        self.objects = os.path.join(root, "objects")
+        self.versions = os.path.join(root, "versions")
+        os.makedirs(self.objects, exist_ok=True)
+        os.makedirs(self.versions, exist_ok=True)
+
+    def object_path(self, digest):
+        return os.path.join(self.objects, digest[:2], digest[2:])
+
+    def add_file(self, path, hardlink=False):
+        """sha256 of the file, stored in the pool once; hardlink=True links instead of copying when possible."""
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        obj = self.object_path(digest)
+        if not os.path.exists(obj):
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            tmp = f"{obj}.{os.getpid()}.tmp"
+            try:
+                if not hardlink:
+                    raise OSError(errno.EXDEV, "copy requested")
+                os.link(path, tmp)
+            except OSError:
+                shutil.copyfile(path, tmp)
+                os.chmod(tmp, 0o444)  # views link to objects; editing one must not change every version
+            os.replace(tmp, obj)
+        return digest
+
+    def version_path(self, name):
+        return os.path.join(self.versions, f"{name}.json")
+
+    def load(self, name):
+        path = self.version_path(name)
+        if not os.path.exists(path):
+            print(f"Unknown version {name} (known: {', '.join(self.names()) or 'none'})")
+            sys.exit(1)
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def check_new(self, name):
+        if os.path.exists(self.version_path(name)):
+            print(f"Version {name} already exists; versions are immutable")
+            sys.exit(1)
+
+    def save(self, version):
+        path = self.version_path(version["name"])
+        self.check_new(version["name"])
+        with open(path + ".tmp", 'w') as f:
+            json.dump(version, f, indent=1, sort_keys=True)
+        os.replace(path + ".tmp", path)
+
+    def names(self):
+        return sorted(n[:-len(".json")] for n in os.listdir(self.versions) if n.endswith(".json"))
+
+
+def import_dir(store, src, name, hardlink=False):
+    store.check_new(name)
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(src):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.startswith("."):
+                continue
+            path = os.path.join(dirpath, filename)
+            files[os.path.relpath(path, src).replace(os.sep, "/")] = store.add_file(path, hardlink)
+            if len(files) % 5000 == 0:
+                print(f"Imported {len(files)} files...")
+    version = {"name": name, "parent": None, "source": os.path.abspath(src), "ops": [], "seed": None,
+               "created_at": datetime.now().isoformat(), "files": files}
+    store.save(version)
+    return version
+
+
+def derive(store, parent_name, name, ops, seed=0, split="train", workers=None):
+    store.check_new(name)
+    parent = store.load(parent_name)
+    files = dict(parent["files"])
+    ctx = {"store": store, "split": split, "workers": workers}
+    for i, op in enumerate(ops):
+        func = OPS.get(op[0])
+        if func is None:
+            print(f"Unknown op {op[0]} (known: {', '.join(OPS)})")
+            sys.exit(1)
+        # Seeded per op position, so editing one op leaves the others' choices alone
+        rng = random.Random(f"{seed}:{i}:{' '.join(op)}")
+        removed = func(ctx, files, rng, *op[1:])
+        for path in removed:
+            del files[path]
+        print(f"{' '.join(op)}: removed {len(removed)}, {len(files)} files left")
+    version = {"name": name, "parent": parent_name, "source": None, "ops": ops, "seed": seed, "split": split,
+               "created_at": datetime.now().isoformat(), "files": files}
+    store.save(version)
+    return version
+
+
+def checkout(store, name, dest, link="hard", force=False):
+    """Materialise a version as a directory tree of links into the pool."""
+    version = store.load(name)
+    if os.path.exists(dest) and os.listdir(dest):
+        if not (force and os.path.exists(os.path.join(dest, VIEW_MARKER))):
+            print(f"{dest} is not empty (--force replaces a previous checkout, never other directories)")
+            sys.exit(1)
+        shutil.rmtree(dest)
+    for directory in sorted({os.path.dirname(p) for p in version["files"]}):
+        os.makedirs(os.path.join(dest, directory), exist_ok=True)
+    for path, digest in version["files"].items():
+        obj = os.path.abspath(store.object_path(digest))
+        target = os.path.join(dest, path)
+        if link == "hard":
+            try:
+                os.link(obj, target)
+                continue
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                link = "sym"  # pool on another file system
+                print("Pool is on another file system; using symlinks")
+        if link == "sym":
+            os.symlink(obj, target)
+        else:
+            shutil.copyfile(obj, target)
+    with open(os.path.join(dest, VIEW_MARKER), 'w') as f:
+        f.write(name + "\n")
+    return len(version["files"])
+
+
+def class_counts(files):
+    counts = defaultdict(int)
+    for path in files:
+        counts[os.path.dirname(path)] += 1
+    return counts
+
+
+def diff(old, new):
+    """{class dir: {"added": [...], "removed": [...], "changed": [...]}} between two versions' files."""
+    result = defaultdict(lambda: {"added": [], "removed": [], "changed": []})
+    for path in sorted(set(old) | set(new)):
+        if path not in new:
+            result[os.path.dirname(path)]["removed"].append(path)
+        elif path not in old:
+            result[os.path.dirname(path)]["added"].append(path)
+        elif old[path] != new[path]:
+            result[os.path.dirname(path)]["changed"].append(path)
+    return dict(result)
+
+
+def pool_bytes(store, digests):
+    return sum(os.path.getsize(store.object_path(d)) for d in digests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manifest-based dataset versions over a content-addressed file pool")
+    parser.add_argument("--store", required=True, help="Pool + version manifests directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("import", help="Record a dataset directory as a version")
+    p.add_argument("--src", required=True)
+    p.add_argument("--name", required=True)
+    p.add_argument("--hardlink", action="store_true", help="Link source files into the pool instead of copying")
+    p = sub.add_parser("derive", help="New version from a parent version and ops")
+    p.add_argument("--from", dest="parent", required=True)
+    p.add_argument("--name", required=True)
+    p.add_argument("--recipe", choices=sorted(RECIPES), help="Ops of optimize_v4/v5/v6.py")
+    p.add_argument("--op", nargs="+", action="append", default=[], metavar="ARG",
+                   help=f"Op and its arguments, e.g. --op uuid_limit phone 5 (ops: {', '.join(OPS)})")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--split", default="train")
+    p.add_argument("--workers", type=int, default=None, help="diverse_* ops: signature processes (default: all cores)")
+    p = sub.add_parser("checkout", help="Materialise a version as a training directory")
+    p.add_argument("--name", required=True)
+    p.add_argument("--dest", required=True)
+    p.add_argument("--link", default="hard", choices=["hard", "sym", "copy"])
+    p.add_argument("--force", action="store_true", help="Replace a previous checkout at --dest")
+    p = sub.add_parser("diff", help="Per-class differences between two versions")
+    p.add_argument("old")
+    p.add_argument("new")
+    p.add_argument("--files", action="store_true", help="Also list the paths")
+    sub.add_parser("list", help="Versions, their class counts and the pool size")
+    args = parser.parse_args()
+
+    store = Store(args.store)
+    if args.command == "import":
+        version = import_dir(store, args.src, args.name, args.hardlink)
+        print(f"Version {args.name}: {len(version['files'])} files")
+    elif args.command == "derive":
+        ops = (RECIPES[args.recipe] if args.recipe else []) + args.op
+        if not ops:
+            parser.error("derive needs --recipe or --op")
+        version = derive(store, args.parent, args.name, ops, args.seed, args.split, args.workers)
+        print(f"Version {args.name}: {len(version['files'])} files")
+    elif args.command == "checkout":
+        n = checkout(store, args.name, args.dest, args.link, args.force)
+        print(f"Checked out {args.name} ({n} files) to {args.dest}")
+    elif args.command == "diff":
+        old, new = store.load(args.old)["files"], store.load(args.new)["files"]
+        old_counts, new_counts = class_counts(old), class_counts(new)
+        print(f"| Class | {args.old} | {args.new} | Added | Removed | Changed |")
+        print("| :--- | :---: | :---: | :---: | :---: | :---: |")
+        changes = diff(old, new)
+        for directory in sorted(set(old_counts) | set(new_counts)):
+            c = changes.get(directory, {"added": [], "removed": [], "changed": []})
+            print(f"| {directory} | {old_counts.get(directory, 0)} | {new_counts.get(directory, 0)} | "
+                  f"{len(c['added'])} | {len(c['removed'])} | {len(c['changed'])} |")
+        if args.files:
+            for directory, c in sorted(changes.items()):
+                for kind, sign in (("added", "+"), ("removed", "-"), ("changed", "~")):
+                    for path in c[kind]:
+                        print(f"{sign} {path}")
+    else:
+        referenced = set()
+        for name in store.names():
+            version = store.load(name)
+            referenced.update(version["files"].values())
+            counts = class_counts(version["files"])
+            print(f"{name} (from {version['parent'] or version['source']}): {len(version['files'])} files, "
+                  + ", ".join(f"{d}={n}" for d, n in sorted(counts.items())))
+        print(f"Pool: {len(referenced)} unique files, {pool_bytes(store, referenced) / (1 << 20):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import multiprocessing
+import os
+
+import cv2
+import numpy as np
+
+# Diversity-aware downsampling for dataset_versions.py (diverse_* ops).
+#
+# Every image gets a compact signature (16x16 grayscale thumbnail from a
+# 1/4-scale JPEG decode, computed in parallel) cached by content hash in
+# <store>/signatures.bin, so only images new to the pool are ever decoded.
+# Selection (select_diverse): contrast-normalised signatures are reduced to
+# PCA_DIMS, clustered with k-means (fitted on a sample), the target count is
+# water-filled across clusters (small clusters keep everything, near-duplicate
+# heavy clusters are capped) and each cluster's share is picked by greedy
+# k-center (farthest point first). Random picks spend the budget in proportion
+# to how often a scene repeats; this spends it on coverage.
+
+SIG_SIZE = 16
+PCA_DIMS = 32
+MAX_CLUSTERS = 512
+KMEANS_SAMPLE = 50000
+KMEANS_ITERS = 10
+_RECORD = np.dtype([("digest", np.uint8, (32,)), ("sig", np.uint8, (SIG_SIZE * SIG_SIZE,))])
+
+
+def signature(path):
+    """16x16 grayscale thumbnail (256 uint8) of an image file, or None if it cannot be decoded."""
+    im = cv2.imread(path, cv2.IMREAD_REDUCED_GRAYSCALE_4)  # JPEG DCT scaling: decodes far less than the full image
+    if im is None:
+        im = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if im is None:
+            return None
+    return cv2.resize(im, (SIG_SIZE, SIG_SIZE), interpolation=cv2.INTER_AREA).ravel()
+
+
+def _signature_job(job):
+    digest, path = job
+    return digest, signature(path)
+
+
+def _digest_index(records, start):
+    # Raw bytes rather than an "S32" field: NumPy strips trailing NULs from those
+    raw = records["digest"].tobytes()
+    return {raw[i * 32:(i + 1) * 32].hex(): start + i for i in range(len(records))}
+
+
+class SignatureCache:
+    """Append-only file of (sha256, signature) records; a torn last record is cut off on load."""
+
+    def __init__(self, path):
+        self.path = path
+        self.index = {}
+        self.sigs = np.zeros((0, SIG_SIZE * SIG_SIZE), np.uint8)
+        if os.path.exists(path):
+            size = os.path.getsize(path)
+            if size % _RECORD.itemsize:
+                with open(path, 'r+b') as f:
+                    f.truncate(size - size % _RECORD.itemsize)
+            records = np.fromfile(path, dtype=_RECORD)
+            self.sigs = records["sig"]
+            self.index = _digest_index(records, 0)
+
+    def get(self, digests, paths, workers=None):
+        """(n, 256) uint8 signatures for hex digests, computing the missing ones from paths in parallel."""
+        missing = sorted({d: p for d, p in zip(digests, paths) if d not in self.index}.items())
+        if missing:
+            print(f"Computing {len(missing)} signatures ({len(digests) - len(missing)} cached)...")
+            new, undecodable = [], 0
+            with multiprocessing.Pool(workers or os.cpu_count()) as pool:
+                for i, (digest, sig) in enumerate(pool.imap_unordered(_signature_job, missing, chunksize=256), 1):
+                    if sig is None:
+                        undecodable += 1
+                        sig = np.zeros(SIG_SIZE * SIG_SIZE, np.uint8)
+                    new.append((np.frombuffer(bytes.fromhex(digest), np.uint8), sig))
+                    if i % 50000 == 0:
+                        print(f"  {i}/{len(missing)}")
+            if undecodable:
+                print(f"{undecodable} undecodable images got a blank signature")
+            records = np.array(new, dtype=_RECORD)
+            with open(self.path, 'ab') as f:
+                records.tofile(f)
+            start = len(self.sigs)
+            self.sigs = np.concatenate([self.sigs, records["sig"]])
+            self.index.update(_digest_index(records, start))
+        return self.sigs[[self.index[d] for d in digests]]
+
+
+def _normalise(sigs):
+    x = sigs.astype(np.float32)
+    x -= x.mean(axis=1, keepdims=True)
+    x /= np.linalg.norm(x, axis=1, keepdims=True) + 1e-6
+    return x
+
+
+def features(sigs, rng):
+    """Contrast-normalised signatures projected onto their top PCA_DIMS components (basis from a sample)."""
+    sample = _normalise(sigs[rng.choice(len(sigs), min(len(sigs), 20000), replace=False)])
+    mean = sample.mean(axis=0)
+    _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+    basis = vt[:PCA_DIMS].T
+    x = np.empty((len(sigs), basis.shape[1]), np.float32)
+    for start in range(0, len(sigs), 65536):  # float copies of 500k signatures would not fit comfortably
+        x[start:start + 65536] = (_normalise(sigs[start:start + 65536]) - mean) @ basis
+    return x
+
+
+def _sq_dists(x, centers):
+    return (x * x).sum(1)[:, None] - 2 * x @ centers.T + (centers * centers).sum(1)[None, :]
+
+
+def k_center(x, k):
+    """Greedy k-center: start nearest the mean, then repeatedly take the point farthest from the picks."""
+    first = int(((x - x.mean(0)) ** 2).sum(1).argmin())
+    picks = [first]
+    dist = ((x - x[first]) ** 2).sum(1)
+    dist[first] = -1  # picked; exact duplicates (distance 0) must not be picked twice
+    for _ in range(k - 1):
+        i = int(dist.argmax())
+        picks.append(i)
+        dist = np.minimum(dist, ((x - x[i]) ** 2).sum(1))
+        dist[i] = -1
+    return picks
+
+
+def kmeans(x, n_clusters, rng):
+    """Cluster labels of every row; centroids are fitted on at most KMEANS_SAMPLE rows."""
+    sample = x[rng.choice(len(x), min(len(x), KMEANS_SAMPLE), replace=False)]
+    # Farthest-point seeds: every distinct mode gets a centroid before a dense one is split up
+    centers = sample[k_center(sample, n_clusters)]
+    for _ in range(KMEANS_ITERS):
+        labels = _sq_dists(sample, centers).argmin(1)
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, sample)
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+    labels = np.empty(len(x), np.int64)
+    for start in range(0, len(x), 65536):  # bounds the distance matrix
+        labels[start:start + 65536] = _sq_dists(x[start:start + 65536], centers).argmin(1)
+    return labels
+
+
+def water_fill(sizes, k):
+    """Split k across groups as evenly as their sizes allow."""
+    quotas = np.zeros(len(sizes), np.int64)
+    remaining, left = k, len(sizes)
+    for g in np.argsort(sizes, kind="stable"):
+        quotas[g] = min(sizes[g], remaining // left)
+        remaining -= quotas[g]
+        left -= 1
+    # Integer remainder goes to the largest groups with room
+    for g in np.argsort(-sizes, kind="stable"):
+        if remaining == 0:
+            break
+        extra = min(sizes[g] - quotas[g], remaining)
+        quotas[g] += extra
+        remaining -= extra
+    return quotas
+
+
+def select_diverse(sigs, k, seed=0):
+    """Indices of k rows of sigs covering them as evenly as possible (all rows if k >= len)."""
+    n = len(sigs)
+    if k >= n:
+        return list(range(n))
+    if k <= 0:
+        return []
+    rng = np.random.default_rng(seed)
+    x = features(sigs, rng)
+    n_clusters = max(1, min(MAX_CLUSTERS, k // 8))
+    labels = kmeans(x, n_clusters, rng) if n_clusters > 1 else np.zeros(n, np.int64)
+    order = np.argsort(labels, kind="stable")
+    members = np.split(order, np.cumsum(np.bincount(labels, minlength=n_clusters))[:-1])
+    quotas = water_fill(np.array([len(m) for m in members]), k)
+    selected = []
+    for m, q in zip(members, quotas):
+        if q:
+            selected.extend(m[k_center(x[m], int(q))].tolist())
+    return sorted(selected)
+
+
+def select_per_group(sigs, group_sizes, limit, seed=0):
+    """Indices keeping at most `limit` mutually dissimilar rows of each consecutive group of rows."""
+    x = features(sigs, np.random.default_rng(seed))  # one projection, so groups are treated alike
+    selected, start = [], 0
+    for size in group_sizes:
+        if size > limit:
+            selected.extend(start + i for i in k_center(x[start:start + size], limit))
+        else:
+            selected.extend(range(start, start + size))
+        start += size
+    return sorted(selected)
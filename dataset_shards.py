@@ -0,0 +1,379 @@
+import argparse
+import glob
+import json
+import math
+import os
+import tarfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from run_journal import read_journal
+
+# Sharded training-data output: instead of a .jpg + .txt per frame in one flat
+# directory, samples are appended to ~1 GB tar shards, each with a JSONL index
+# of member offsets:
+#
+#   <shard_dir>/shard-000000.tar        plain tar (tar -tf / tar -xf work)
+#   <shard_dir>/shard-000000.idx.jsonl  {"key", "files": {"jpg": [offset, size], "txt": [...]}, "shape": [h, w], ...}
+#
+#   writer = ShardWriter(shard_dir); writer.add(key, {"jpg": ..., "txt": ...}); writer.commit()
+#   reader = ShardReader(shard_dir); reader.image(key), reader.labels(key)
+#
+# commit() fsyncs the tar, ends it with a valid end-of-archive marker and only
+# then appends the batch's index lines, so the index never points past durable
+# data; the next add() overwrites the marker. A writer never reopens a shard:
+# every writer claims a new shard number (safe across --procs workers), and
+# repair_shards() cuts an interrupted shard back to its last commit. Readers
+# keep the last record per key, so a video redone after a crash shadows its
+# earlier copy; delete(keys) appends {"key", "deleted": true} tombstones for
+# samples a redo does not write again (committed with the redo's samples).
+#
+# YOLO training straight from shards (ultralytics, no extraction):
+#
+#   from ultralytics import YOLO
+#   from dataset_shards import yolo_trainer_class
+#   YOLO("yolo11n.pt").train(data="shards.yaml", trainer=yolo_trainer_class(), epochs=50)
+#
+# with train: / val: in shards.yaml pointing at shard directories.
+#
+#   python dataset_shards.py pack --input_dir labels_fp/ --shard_dir labels_fp_shards/
+#   python dataset_shards.py info --shard_dir labels_fp_shards/
+
+SHARD_BYTES = 1 << 30
+_BLOCK = tarfile.BLOCKSIZE
+_END_OF_ARCHIVE = b"\0" * (2 * _BLOCK)
+
+
+def _index_path(tar_path):
+    return tar_path[:-len(".tar")] + ".idx.jsonl"
+
+
+def _record_end(record):
+    """End of the record's last member, rounded up to the tar block size."""
+    end = max((offset + size for offset, size in record.get("files", {}).values()), default=0)  # 0: tombstone
+    return -(-end // _BLOCK) * _BLOCK
+
+
+def repair_shards(shard_dir):
+    """
+    Cut shards left open by a killed writer back to their last commit; returns the number repaired.
+    Only while no writer is running on shard_dir.
+    """
+    repaired = 0
+    for tar_path in sorted(glob.glob(os.path.join(shard_dir, "*.tar"))):
+        records = read_journal(_index_path(tar_path))
+        end = max((_record_end(r) for r in records), default=0)
+        with open(tar_path, 'r+b') as f:
+            f.seek(end)
+            if f.read() == _END_OF_ARCHIVE:
+                continue
+            f.seek(end)
+            f.truncate()
+            f.write(_END_OF_ARCHIVE)
+        with open(_index_path(tar_path), 'w') as f:
+            f.writelines(json.dumps(r) + "\n" for r in records)  # drops a torn last line
+        repaired += 1
+        print(f"Shard {tar_path}: truncated to its last commit ({len(records)} samples)")
+    return repaired
+
+
+class ShardWriter:
+    """Thread-safe appender of samples ({extension: bytes}) to size-capped tar shards."""
+
+    def __init__(self, shard_dir, max_bytes=SHARD_BYTES, prefix="shard"):
+        self.shard_dir = shard_dir
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.tar = None
+        self.tar_path = None
+        self.committed = 0
+        self.pending = []
+        os.makedirs(shard_dir, exist_ok=True)
+
+    def _open(self):
+        n = len(glob.glob(os.path.join(self.shard_dir, f"{self.prefix}-*.tar")))
+        while True:
+            path = os.path.join(self.shard_dir, f"{self.prefix}-{n:06d}.tar")
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_RDWR, 0o644)  # claims the number
+                break
+            except FileExistsError:
+                n += 1
+        self.tar = os.fdopen(fd, 'r+b')
+        self.tar_path = path
+        self.tar.write(_END_OF_ARCHIVE)  # empty shard is a valid tar
+        self.tar.seek(0)
+        self.committed = 0
+
+    def add(self, key, files, meta=None):
+        """Append one sample; members are named <key>.<extension>. Durable after the next commit()."""
+        with self.lock:
+            if self.tar is None:
+                self._open()
+            record = {"key": key, "files": {}, **(meta or {})}
+            for ext, data in files.items():
+                info = tarfile.TarInfo(f"{key}.{ext}")
+                info.size = len(data)
+                info.mtime = int(time.time())
+                info.mode = 0o644
+                header = info.tobuf(format=tarfile.GNU_FORMAT)
+                offset = self.tar.tell() + len(header)
+                self.tar.write(header)
+                self.tar.write(data)
+                self.tar.write(b"\0" * (-len(data) % _BLOCK))
+                record["files"][ext] = [offset, len(data)]
+            self.pending.append(record)
+
+    def delete(self, keys):
+        """Tombstone samples of earlier commits (any shard); an add() of the same key after this wins."""
+        with self.lock:
+            if self.tar is None:
+                self._open()  # commit() needs an open shard to attach the index lines to
+            self.pending.extend({"key": key, "deleted": True} for key in keys)
+
+    def commit(self):
+        """Make every added sample durable; rolls over to a new shard once max_bytes is reached."""
+        with self.lock:
+            if self.tar is None or not self.pending:
+                return
+            end = self.tar.tell()
+            self.tar.write(_END_OF_ARCHIVE)
+            self.tar.flush()
+            os.fsync(self.tar.fileno())
+            self.tar.seek(end)
+            with open(_index_path(self.tar_path), 'a') as f:
+                f.writelines(json.dumps(r) + "\n" for r in self.pending)
+                f.flush()
+                os.fsync(f.fileno())
+            self.pending = []
+            self.committed = end
+            if end >= self.max_bytes:
+                self.tar.close()
+                self.tar = None
+
+    def rollback(self):
+        """Drop the samples added since the last commit (e.g. a video that failed halfway)."""
+        with self.lock:
+            if self.tar is None:
+                return
+            self.tar.seek(self.committed)
+            self.tar.truncate()
+            self.tar.write(_END_OF_ARCHIVE)
+            self.tar.seek(self.committed)
+            self.pending = []
+
+    def close(self):
+        self.commit()
+        with self.lock:
+            if self.tar is not None:
+                self.tar.close()
+                self.tar = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class ShardReader:
+    """Random access to the samples of a shard directory through the index files (os.pread, no extraction)."""
+
+    def __init__(self, shard_dir):
+        self.shard_dir = shard_dir
+        self.entries = {}
+        for tar_path in sorted(glob.glob(os.path.join(shard_dir, "*.tar"))):
+            for record in read_journal(_index_path(tar_path)):
+                if record.get("deleted"):
+                    self.entries.pop(record["key"], None)
+                else:
+                    self.entries[record["key"]] = (tar_path, record)
+        self.keys = sorted(self.entries)
+        self._fds = {}
+
+    def __getstate__(self):
+        # Descriptors are reopened lazily in the receiving process (DataLoader workers)
+        return {**self.__dict__, "_fds": {}}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def _fd(self, tar_path):
+        fd = self._fds.get(tar_path)
+        if fd is None:
+            fd = self._fds[tar_path] = os.open(tar_path, os.O_RDONLY)
+        return fd
+
+    def meta(self, key):
+        return self.entries[key][1]
+
+    def read(self, key, ext):
+        tar_path, record = self.entries[key]
+        offset, size = record["files"][ext]
+        return os.pread(self._fd(tar_path), size, offset)
+
+    def image(self, key, flags=cv2.IMREAD_COLOR):
+        return cv2.imdecode(np.frombuffer(self.read(key, "jpg"), np.uint8), flags)
+
+    def labels(self, key):
+        """Label lines of the sample's .txt ("cls x y w h [conf]")."""
+        return self.read(key, "txt").decode().splitlines()
+
+    def close(self):
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds = {}
+
+
+def yolo_labels(lines, min_conf=0.0):
+    """(cls (n, 1), xywhn (n, 4)) arrays from label lines, dropping boxes whose conf column is below min_conf."""
+    rows = [line.split() for line in lines if line.strip()]
+    rows = [r for r in rows if len(r) < 6 or float(r[5]) >= min_conf]
+    cls = np.array([[float(r[0])] for r in rows], dtype=np.float32).reshape(-1, 1)
+    boxes = np.array([[float(v) for v in r[1:5]] for r in rows], dtype=np.float32).reshape(-1, 4)
+    return cls, boxes
+
+
+def yolo_dataset_class(min_conf=0.0):
+    """ultralytics YOLODataset subclass whose img_path is a shard directory (ultralytics imported lazily)."""
+    try:
+        from ultralytics.data.dataset import YOLODataset
+    except ImportError:
+        raise RuntimeError("Training from shards needs ultralytics (pip install ultralytics)")
+
+    class ShardYOLODataset(YOLODataset):
+        def get_img_files(self, img_path):
+            # Virtual paths <shard_dir>/<key>.jpg: the file name is the sample key
+            self.reader = ShardReader(img_path)
+            keys = self.reader.keys
+            if self.fraction < 1:
+                keys = keys[:round(len(keys) * self.fraction)]
+            if not keys:
+                raise FileNotFoundError(f"{self.prefix}No samples in shard directory {img_path}")
+            return [os.path.join(img_path, f"{key}.jpg") for key in keys]
+
+        def get_labels(self):
+            labels = []
+            for im_file in self.im_files:
+                key = os.path.basename(im_file)[:-len(".jpg")]
+                cls, bboxes = yolo_labels(self.reader.labels(key), min_conf)
+                labels.append({"im_file": im_file, "shape": tuple(self.reader.meta(key)["shape"]),
+                               "cls": cls, "bboxes": bboxes, "segments": [], "keypoints": None,
+                               "normalized": True, "bbox_format": "xywh"})
+            return labels
+
+        def load_image(self, i, rect_mode=True):
+            # BaseDataset.load_image with the image decoded from its shard instead of imread
+            if self.ims[i] is not None:
+                return self.ims[i], self.im_hw0[i], self.im_hw[i]
+            key = os.path.basename(self.im_files[i])[:-len(".jpg")]
+            im = self.reader.image(key)
+            if im is None:
+                raise FileNotFoundError(f"Image not decodable from shard: {key}")
+            h0, w0 = im.shape[:2]
+            if rect_mode:
+                r = self.imgsz / max(h0, w0)
+                if r != 1:
+                    w, h = (min(math.ceil(w0 * r), self.imgsz), min(math.ceil(h0 * r), self.imgsz))
+                    im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+            elif not (h0 == w0 == self.imgsz):
+                im = cv2.resize(im, (self.imgsz, self.imgsz), interpolation=cv2.INTER_LINEAR)
+            if self.augment:
+                self.ims[i], self.im_hw0[i], self.im_hw[i] = im, (h0, w0), im.shape[:2]
+                self.buffer.append(i)
+                if 1 < len(self.buffer) >= self.max_buffer_length:
+                    j = self.buffer.pop(0)
+                    if self.cache != "ram":
+                        self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+            return im, (h0, w0), im.shape[:2]
+
+    return ShardYOLODataset
+
+
+def yolo_trainer_class(min_conf=0.0):
+    """DetectionTrainer subclass building its train / val datasets from shard directories."""
+    try:
+        from ultralytics.models.yolo.detect import DetectionTrainer
+        from ultralytics.utils import colorstr
+    except ImportError:
+        raise RuntimeError("Training from shards needs ultralytics (pip install ultralytics)")
+    dataset_class = yolo_dataset_class(min_conf)
+
+    class ShardDetectionTrainer(DetectionTrainer):
+        def build_dataset(self, img_path, mode="train", batch=None):
+            # Same arguments as ultralytics' build_yolo_dataset; the disk cache would need real image files
+            cfg = self.args
+            stride = max(int(self.model.stride.max() if self.model else 0), 32)
+            return dataset_class(
+                img_path=img_path, imgsz=cfg.imgsz, batch_size=batch, augment=mode == "train", hyp=cfg,
+                rect=cfg.rect or mode == "val", cache="ram" if cfg.cache == "ram" else None,
+                single_cls=cfg.single_cls or False, stride=stride, pad=0.0 if mode == "train" else 0.5,
+                prefix=colorstr(f"{mode}: "), task=cfg.task, classes=cfg.classes, data=self.data,
+                fraction=cfg.fraction if mode == "train" else 1.0)
+
+    return ShardDetectionTrainer
+
+
+def pack(input_dir, shard_dir, max_bytes=SHARD_BYTES, commit_every=100):
+    """Copy a flat <stem>.jpg + <stem>.txt directory into shards; returns the number of samples."""
+    done = set()
+    if os.path.isdir(shard_dir):
+        # Resuming an interrupted pack
+        repair_shards(shard_dir)
+        done = set(ShardReader(shard_dir).keys)
+    stems = sorted(name[:-len(".jpg")] for name in os.listdir(input_dir) if name.endswith(".jpg"))
+    packed = 0
+    with ShardWriter(shard_dir, max_bytes) as writer:
+        for stem in stems:
+            if stem in done:
+                continue
+            with open(os.path.join(input_dir, stem + ".jpg"), 'rb') as f:
+                jpg = f.read()
+            label_path = os.path.join(input_dir, stem + ".txt")
+            txt = b""
+            if os.path.exists(label_path):
+                with open(label_path, 'rb') as f:
+                    txt = f.read()
+            im = cv2.imdecode(np.frombuffer(jpg, np.uint8), cv2.IMREAD_GRAYSCALE)
+            if im is None:
+                print(f"Skipping undecodable {stem}.jpg")
+                continue
+            writer.add(stem, {"jpg": jpg, "txt": txt}, {"shape": list(im.shape)})
+            packed += 1
+            if packed % commit_every == 0:
+                writer.commit()
+                print(f"Packed {packed}/{len(stems)}")
+    return packed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tar shards of training samples with offset indexes")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("pack", help="Copy a flat .jpg/.txt directory into shards (resumable)")
+    p.add_argument("--input_dir", required=True)
+    p.add_argument("--shard_dir", required=True)
+    p.add_argument("--shard_mb", type=int, default=SHARD_BYTES >> 20)
+    p = sub.add_parser("info", help="Shard and sample counts")
+    p.add_argument("--shard_dir", required=True)
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        packed = pack(args.input_dir, args.shard_dir, args.shard_mb << 20)
+        print(f"Packed {packed} samples into {args.shard_dir}")
+    else:
+        reader = ShardReader(args.shard_dir)
+        shards = glob.glob(os.path.join(args.shard_dir, "*.tar"))
+        size = sum(os.path.getsize(p) for p in shards)
+        print(f"{len(shards)} shards, {size / (1 << 30):.2f} GB, {len(reader)} samples")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,8 @@
-import cv2
 import numpy as np
 import json
+import math
 import time
 from pathlib import Path
-import argparse
 import sys
 import os
 
@@ -21,35 +20,20 @@ except ImportError:
     print("Warning: Could not import YOLOv11VehicleDetector. Assuming mock or test environment.")
     # You might want a fallback here if this is critical
 
-from utils.model_loader import download_model_if_needed
+from inference_backends import load_backend
+from stage_profiler import make_profiler
+from frame_decoder import open_frame_source, to_source_coords
 
 # Model Constant
 CURRENT_YOLO_MODEL_PATH = "yolo_eagle_japan_v1_2025_06_20"
 
 class FollowingDistanceDetector:
-    def __init__(self, model_name=None):
-        default_classes = ['car', 'truck', 'bus', 'motorcycle']
-        
-        # 1. Load Model
-        if model_name is None:
-            print(f"Downloading YOLO model: {CURRENT_YOLO_MODEL_PATH}")
-            try:
-                model_path = download_model_if_needed(CURRENT_YOLO_MODEL_PATH)
-                print(f"Model downloaded to: {model_path}")
-                model_name = model_path
-                target_classes_names = ['car']
-            except Exception as e:
-                print(f"Failed to download model: {e}")
-                # Fallback for local testing or pre-downloaded
-                model_name = "yolo11x.pt" 
-                target_classes_names = default_classes
-        else:
-            target_classes_names = default_classes
-            
-        self.vehicle_detector = YOLOv11VehicleDetector(
-            model_name=model_name, 
-            target_classes_names=target_classes_names
-        )
+    def __init__(self, model_name=None, backend=None, precision=None):
+        # 1. Load Model (skipped when a pre-built backend object is passed, e.g. the benchmark stub)
+        prebuilt_backend = backend is not None and not isinstance(backend, str)
+        # backend="none": lane / distance geometry only, no model (e.g. hard-negative mining)
+        geometry_only = backend == "none"
+        self.vehicle_detector = None if prebuilt_backend or geometry_only else self._load_vehicle_detector(model_name)
         
         # 2. Default Parameters
         self.params = {
@@ -63,7 +47,12 @@ class FollowingDistanceDetector:
             "LANE_BOTTOM_W": 0.4, "LANE_TOP_W": 0.1, "LANE_START_Y": 0.55,
             "LANE_OFFSET_X": 0.02,
             "WIDTH_CONTAINMENT_RATIO": 0.9,
-            "FRAME_SKIP": 2
+            "FRAME_SKIP": 2,
+            "INFERENCE_BACKEND": "torch",  # torch / onnx / openvino
+            "INFERENCE_PRECISION": "fp32",  # fp32 / int8_dynamic / int8_static (onnx only)
+            "DECODE_WIDTH": 0,  # >0: decode downscaled to this width via ffmpeg (e.g. 640)
+            "DECODE_PROCESS": False,  # True: decode in a separate process via a shared-memory frame ring
+            "WINDOW_WARMUP_SEC": 2.0  # windowed analysis: seek this far before each window so tracks / EMA settle
         }
 
         # 3. OVERRIDE FROM ENV VAR (For Hyperparameter Tuning)
@@ -76,32 +65,75 @@ class FollowingDistanceDetector:
             except json.JSONDecodeError as e:
                 print(f"Error parsing config env var: {e}")
 
-    def estimate_distance_engine(self, w_px_obj, W_px_total, last_d, last_v, dt):
-        """Geometry + EMA"""
-        hfov_rad = np.radians(self.params["HFOV_DEG"])
-        h_rel = self.params["H_CAM"] - self.params["H_TARGET_REF"]
+        # 4. Inference Backend (explicit argument wins over config)
+        if geometry_only:
+            self.inference = None
+            return
+        if prebuilt_backend:
+            self.inference = backend
+            self.params["INFERENCE_BACKEND"] = getattr(backend, "name", "custom")
+            return
+        if backend is not None:
+            self.params["INFERENCE_BACKEND"] = backend
+        if precision is not None:
+            self.params["INFERENCE_PRECISION"] = precision
+        self.inference = load_backend(
+            self.params["INFERENCE_BACKEND"], self.vehicle_detector.model,
+            precision=self.params["INFERENCE_PRECISION"]
+        )
+
+    def _load_vehicle_detector(self, model_name):
+        default_classes = ['car', 'truck', 'bus', 'motorcycle']
+        
+        if model_name is None:
+            print(f"Downloading YOLO model: {CURRENT_YOLO_MODEL_PATH}")
+            try:
+                # Imported here so the stub / geometry-only backends work without the services tree
+                from utils.model_loader import download_model_if_needed
+                model_path = download_model_if_needed(CURRENT_YOLO_MODEL_PATH)
+                print(f"Model downloaded to: {model_path}")
+                model_name = model_path
+                target_classes_names = ['car']
+            except Exception as e:
+                print(f"Failed to download model: {e}")
+                # Fallback for local testing or pre-downloaded
+                model_name = "yolo11x.pt" 
+                target_classes_names = default_classes
+        else:
+            target_classes_names = default_classes
+            
+        return YOLOv11VehicleDetector(
+            model_name=model_name, 
+            target_classes_names=target_classes_names
+        )
+
+    def estimate_distance_engine(self, w_px_obj, W_px_total, last_d, last_v, dt, params=None):
+        """Geometry + EMA (params: per-video copy from begin_stream, defaults to self.params)"""
+        p = params or self.params
+        hfov_rad = np.radians(p["HFOV_DEG"])
+        h_rel = p["H_CAM"] - p["H_TARGET_REF"]
         
         denominator = 2 * w_px_obj * np.tan(hfov_rad / 2)
         if denominator == 0: return 0, 0
-        L = (self.params["W_REAL"] * W_px_total) / denominator
+        L = (p["W_REAL"] * W_px_total) / denominator
         D_raw = np.sqrt(L**2 - h_rel**2) if L > h_rel else L
         
         # Distance EMA
-        alpha_d = self.params["EMA_ALPHA"]
+        alpha_d = p["EMA_ALPHA"]
         D_final = (last_d * (1 - alpha_d)) + (D_raw * alpha_d) if last_d is not None else D_raw
         
         # Speed EMA (simple)
         rel_speed_filtered = 0
         if last_d is not None and dt > 0:
             raw_v = (last_d - D_final) / dt
-            alpha_v = self.params["EMA_ALPHA_V"]
+            alpha_v = p["EMA_ALPHA_V"]
             rel_speed_filtered = (last_v * (1 - alpha_v)) + (raw_v * alpha_v)
                 
         return D_final, rel_speed_filtered
 
-    def is_in_lane_flexible(self, x_center, y_bottom, bbox_w, frame_width, frame_height):
+    def is_in_lane_flexible(self, x_center, y_bottom, bbox_w, frame_width, frame_height, params=None):
         """Lane Containment Check"""
-        p = self.params
+        p = params or self.params
         top_w = frame_width * p["LANE_TOP_W"]
         bottom_w = frame_width * p["LANE_BOTTOM_W"]
         start_y = frame_height * p["LANE_START_Y"]
@@ -119,98 +151,201 @@ class FollowingDistanceDetector:
         overlap_w = max(0, min(veh_x2, lane_x2) - max(veh_x1, lane_x1))
         return (overlap_w / bbox_w) >= p["WIDTH_CONTAINMENT_RATIO"]
 
-    def analyze_video(self, video_path, output_path=None, annotate=False):
+    def begin_stream(self, video_path, profile=False, seekable=False):
         """
-        Analyze a single video.
+        Open a video and return its stream state (source, per-video params, tracker, track_data).
+        Nothing per-video is stored on self, so any number of streams can share one detector
+        and one loaded model (see multi_stream.MultiStreamExecutor).
+        Raises ValueError when the video cannot be opened.
         """
-        cap = cv2.VideoCapture(str(video_path))
-        if not cap.isOpened():
-            print(f"Error opening video: {video_path}")
-            return {"status": "error", "logs": []}
+        source = open_frame_source(video_path, self.params["DECODE_WIDTH"], self.params["FRAME_SKIP"],
+                                   decode_process=self.params["DECODE_PROCESS"], seekable=seekable)
+        return self.init_stream(video_path, source, tracker=self.inference.open_stream(video_path), profile=profile)
 
-        width, height = int(cap.get(3)), int(cap.get(4))
-        fps = cap.get(cv2.CAP_PROP_FPS) or 10.0
+    def init_stream(self, video_path, source, tracker=None, profile=False):
+        """
+        Stream state around an already opened frame source (the caller owns and releases it).
+        tracker is None when someone else runs inference and passes boxes to update_stream
+        (see fanout.FanOutRunner).
+        """
+        params = dict(self.params)
 
-        # Adjust HFOV based on Aspect Ratio
+        # Geometry of the original clip; boxes are mapped back to it when decoding downscaled
+        width, height, fps = source.width, source.height, source.fps
+
+        # Adjust HFOV based on Aspect Ratio (per video; self.params is left untouched)
         aspect_ratio = width / height
-        self.params["HFOV_DEG"] = 100 if aspect_ratio > 1.5 else 85
-        
-        track_data = {}
-        danger_confirmed = False
-        positive_confirmed = False
-        danger_limit_count = self.params["DANGER_PERSISTENCE_SEC"] / (self.params["FRAME_SKIP"] / fps)
-
-        following_distance_logs = []
-
-        frame_count = 0
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret: break
-            frame_count += 1
+        params["HFOV_DEG"] = 100 if aspect_ratio > 1.5 else 85
+
+        return {
+            "video_path": video_path,
+            "source": source,
+            "params": params,
+            "width": width, "height": height, "fps": fps,
+            "tracker": tracker,
+            "profiler": make_profiler(profile),
+            "track_data": {},
+            "danger_confirmed": False,
+            "positive_confirmed": False,
+            "danger_limit_count": params["DANGER_PERSISTENCE_SEC"] / (params["FRAME_SKIP"] / fps),
+            "following_distance_logs": [],
+            "events": [],  # confirmed danger / positive moments (event_clips windows)
+            "frame_count": 0,
+        }
+
+    def seek_stream(self, stream, frame_index):
+        """Continue the stream at frame_index (0-based) with fresh tracker and track state."""
+        stream["source"].seek(frame_index)
+        stream["frame_count"] = frame_index
+        stream["tracker"] = self.inference.open_stream(stream["video_path"], start_frame=frame_index)
+        stream["track_data"] = {}
+
+    def next_frame(self, stream):
+        """Advance past skipped frames and return the next frame to infer on (None at end of video)."""
+        source, prof = stream["source"], stream["profiler"]
+        frame_skip = stream["params"]["FRAME_SKIP"]
+        while True:
+            stream["frame_count"] += 1
             
-            # Skip frames
-            if frame_count % self.params["FRAME_SKIP"] != 0:
+            # Skip frames (advance the decoder without retrieving them)
+            if stream["frame_count"] % frame_skip != 0:
+                with prof.stage("decode"):
+                    ret = source.skip()
+                if not ret: return None
+                prof.count("frames_read")
                 continue
                 
-            current_t = frame_count / fps
-            dt = self.params["FRAME_SKIP"] / fps
-            
-            # YOLO Tracking
-            results = self.vehicle_detector.model.track(frame, persist=True, conf=0.5, iou=0.3, verbose=False, imgsz=640)
-            
-            if results[0].boxes.id is not None:
-                boxes = results[0].boxes.xywh.cpu().numpy()
-                track_ids = results[0].boxes.id.int().cpu().tolist()
-                
-                for box, tid in zip(boxes, track_ids):
-                    xc, yc, w, h = box
-                    if self.is_in_lane_flexible(xc, yc + h/2, w, width, height):
-                        if tid not in track_data:
-                            track_data[tid] = {"last_d": None, "last_v": 0, "min_d": 999.0, "danger_count": 0, "entered_warn": False}
-                        
-                        data = track_data[tid]
-                        dist, rel_v = self.estimate_distance_engine(w, width, data["last_d"], data["last_v"], dt)
-                        data["last_d"], data["last_v"] = dist, rel_v
-                        
-                        # Danger Logic
-                        if dist < self.params["DIST_DANGER_M"]:
-                            data["danger_count"] += 1
-                            if data["danger_count"] >= danger_limit_count:
-                                danger_confirmed = True
-                            
-                            current_second = int(current_t)
-                            while len(following_distance_logs) <= current_second:
-                                following_distance_logs.append({"isDetected": False})
-                            following_distance_logs[current_second] = {"isDetected": True}
-                        else:
-                            data["danger_count"] = 0
-                        
-                        # Warning Logic
-                        if dist < self.params["DIST_WARN_M"]:
-                            data["entered_warn"] = True
-                            data["min_d"] = min(data["min_d"], dist)
+            with prof.stage("decode"):
+                ret, frame = source.read()
+            if not ret: return None
+            prof.count("frames_read")
+            return frame
+
+    def update_stream(self, stream, boxes, track_ids):
+        """
+        Lane / distance / danger logic for the frame at stream["frame_count"].
+        boxes are xywh in original-resolution pixels (see frame_decoder.to_source_coords).
+        """
+        p, prof = stream["params"], stream["profiler"]
+        width, height, fps = stream["width"], stream["height"], stream["fps"]
+        track_data = stream["track_data"]
+        following_distance_logs = stream["following_distance_logs"]
+
+        current_t = stream["frame_count"] / fps
+        dt = p["FRAME_SKIP"] / fps
+
+        prof.count("frames_inferred")
+        prof.observe("boxes_per_frame", len(track_ids) if track_ids is not None else 0)
+        
+        lane_start = time.perf_counter()
+        if track_ids is not None:
+            for box, tid in zip(boxes, track_ids):
+                xc, yc, w, h = box
+                if self.is_in_lane_flexible(xc, yc + h/2, w, width, height, params=p):
+                    if tid not in track_data:
+                        track_data[tid] = {"last_d": None, "last_v": 0, "min_d": 999.0, "danger_count": 0, "entered_warn": False}
+                    
+                    data = track_data[tid]
+                    dist, rel_v = self.estimate_distance_engine(w, width, data["last_d"], data["last_v"], dt, params=p)
+                    data["last_d"], data["last_v"] = dist, rel_v
+                    
+                    # Danger Logic
+                    if dist < p["DIST_DANGER_M"]:
+                        data["danger_count"] += 1
+                        if data["danger_count"] >= stream["danger_limit_count"]:
+                            stream["danger_confirmed"] = True
+                            if data["danger_count"] - 1 < stream["danger_limit_count"]:
+                                stream["events"].append({"type": "danger", "time": round(current_t, 2), "track_id": int(tid)})
                         
-                        if data["entered_warn"]:
-                             if (dist - data["min_d"]) >= self.params["RECOVERY_THRESHOLD_M"]:
-                                positive_confirmed = True
-
-            else:
-                # Cleanup stale tracks
-                for tid in list(track_data.keys()):
-                    track_data[tid]["stale_frames"] = track_data[tid].get("stale_frames", 0) + 1
-                    if track_data[tid]["stale_frames"] > 5:
-                        del track_data[tid]
-
-        cap.release()
+                        current_second = int(current_t)
+                        while len(following_distance_logs) <= current_second:
+                            following_distance_logs.append({"isDetected": False})
+                        following_distance_logs[current_second] = {"isDetected": True}
+                    else:
+                        data["danger_count"] = 0
+                    
+                    # Warning Logic
+                    if dist < p["DIST_WARN_M"]:
+                        data["entered_warn"] = True
+                        data["min_d"] = min(data["min_d"], dist)
+                    
+                    if data["entered_warn"]:
+                         if (dist - data["min_d"]) >= p["RECOVERY_THRESHOLD_M"]:
+                            stream["positive_confirmed"] = True
+                            if not data.get("pos_done"):
+                                data["pos_done"] = True
+                                stream["events"].append({"type": "positive", "time": round(current_t, 2), "track_id": int(tid)})
+
+        else:
+            # Cleanup stale tracks
+            for tid in list(track_data.keys()):
+                track_data[tid]["stale_frames"] = track_data[tid].get("stale_frames", 0) + 1
+                if track_data[tid]["stale_frames"] > 5:
+                    del track_data[tid]
+        prof.add("lane_distance", time.perf_counter() - lane_start)
+        prof.observe("tracks_alive", len(track_data))
+
+    def finish_stream(self, stream):
+        """Build the analyze_video result (the frame source is released by its owner)."""
+        prof = stream["profiler"]
+        following_distance_logs = stream["following_distance_logs"]
         
-        final_status = "danger" if danger_confirmed else ("positive" if positive_confirmed else "safe")
-        return {
+        final_status = "danger" if stream["danger_confirmed"] else ("positive" if stream["positive_confirmed"] else "safe")
+        result = {
             "status": final_status,
-            "fps": fps,
+            "fps": stream["fps"],
             "logs": {
                 "followingDistance": following_distance_logs
             },
-            "video_duration_seconds": len(following_distance_logs)
+            "events": stream["events"],
+            # Container frame count (frames consumed if unknown); logs only reach the last flagged second
+            "video_duration_seconds": round((stream["source"].frame_count or stream["frame_count"]) / stream["fps"], 2)
         }
+        if prof.enabled:
+            result["profile"] = prof.to_dict()
+        return result
+
+    def analyze_video(self, video_path, output_path=None, annotate=False, profile=False, windows=None):
+        """
+        Analyze a single video. Safe to call concurrently (all per-video state lives in the stream).
+        profile=True (or a StageProfiler) adds per-stage timings under result["profile"].
+        windows=[(start_sec, end_sec), ...] analyses only those ranges, seeking to each one
+        WINDOW_WARMUP_SEC early (see reanalyze.py); logs and events then cover just those seconds
+        and their warm-up. Windows whose warm-up overlaps are analysed as one range, so no frame
+        (and no event) is seen twice.
+        """
+        try:
+            stream = self.begin_stream(video_path, profile=profile, seekable=windows is not None)
+        except ValueError:
+            print(f"Error opening video: {video_path}")
+            return {"status": "error", "logs": []}
+
+        fps = stream["fps"]
+        if windows is None:
+            segments = [(0, None)]
+        else:
+            warmup = stream["params"]["WINDOW_WARMUP_SEC"]
+            segments = []
+            for first, end in sorted((max(0, int((start - warmup) * fps)), int(math.ceil(end * fps)))
+                                     for start, end in windows):
+                if segments and first <= segments[-1][1]:
+                    # Warm-up reaches back into the previous segment: extend it, never analyse a frame twice
+                    segments[-1] = (segments[-1][0], max(segments[-1][1], end))
+                else:
+                    segments.append((first, end))
+
+        try:
+            for first_frame, end_frame in segments:
+                if windows is not None:
+                    self.seek_stream(stream, first_frame)
+                while end_frame is None or stream["frame_count"] < end_frame:
+                    frame = self.next_frame(stream)
+                    if frame is None: break
+                    # YOLO Tracking (backend selected by INFERENCE_BACKEND)
+                    boxes, track_ids = self.inference.track_batch([frame], [stream["tracker"]], profiler=stream["profiler"])[0]
+                    self.update_stream(stream, to_source_coords(boxes, stream["source"]), track_ids)
+        finally:
+            stream["source"].release()
+        return self.finish_stream(stream)
 
 # ... (Main block remains similar, but execute logic assumes usage via test_following_distance.py usually)
@@ -9,6 +9,7 @@ import sys
 import os
 import shutil
 import tempfile
+import math
 
 # パス設定
 current_dir = Path(__file__).parent
@@ -23,6 +24,10 @@ except ImportError:
     sys.exit(1)
 
 from utils.model_loader import download_model_if_needed
+from inference_backends import load_backend
+from stage_profiler import make_profiler
+from frame_decoder import open_frame_source, to_source_coords
+from event_clips import clip_path, event_windows, extract_clips
 
 # モデルパス定数
 CURRENT_YOLO_MODEL_PATH = "yolo_eagle_japan_v1_2025_06_20"
@@ -32,23 +37,10 @@ class FollowingDistanceDetector:
     Advanced Following Distance Detection System - Production Version (v12.1 Logic)
     """
     
-    def __init__(self, model_name=None):
-        default_classes = ['car', 'truck', 'bus', 'motorcycle']
-        # 1. モデルのロード
-        if model_name is None:
-            print(f"Downloading YOLO model from GCS: {CURRENT_YOLO_MODEL_PATH}")
-            model_path = download_model_if_needed(CURRENT_YOLO_MODEL_PATH)
-            print(f"YOLO model downloaded to: {model_path}")
-            # Use the absolute path directly so the wrapper can load it without relying on a specific directory
-            model_name = model_path
-            target_classes_names = ['car']
-        else:
-            target_classes_names = default_classes
-        
-        self.vehicle_detector = YOLOv11VehicleDetector(
-            model_name=model_name, 
-            target_classes_names=target_classes_names
-        )
+    def __init__(self, model_name=None, backend=None, precision=None):
+        # 1. モデルのロード (構築済みバックエンドが渡された場合はスキップ: ベンチマーク用スタブ等)
+        prebuilt_backend = backend is not None and not isinstance(backend, str)
+        self.vehicle_detector = None if prebuilt_backend else self._load_vehicle_detector(model_name)
         
         # 2. v12.1 最終パラメータ設定 (MODIFIED FOR THRESHOLD EXPERIMENT)
         self.params = {
@@ -63,35 +55,73 @@ class FollowingDistanceDetector:
             "LANE_BOTTOM_W": 0.4, "LANE_TOP_W": 0.1, "LANE_START_Y": 0.55,
             "LANE_OFFSET_X": 0.02,
             "WIDTH_CONTAINMENT_RATIO": 0.9,
-            "FRAME_SKIP": 2
+            "FRAME_SKIP": 2,
+            "INFERENCE_BACKEND": "torch",  # torch / onnx / openvino
+            "INFERENCE_PRECISION": "fp32",  # fp32 / int8_dynamic / int8_static (onnx only)
+            "DECODE_WIDTH": 0,  # >0: ffmpeg で指定幅に縮小デコード (例: 640)。注釈出力時は無効
+            "DECODE_PROCESS": False,  # True: 別プロセスでデコードし共有メモリのリングで受け渡す
+            "CLIP_PADDING_SEC": 2.0,  # イベントクリップの前後余白 (秒)
+            "WINDOW_WARMUP_SEC": 2.0  # 区間解析でシーク後、書き出し前にトラッカー/EMA を慣らす時間
         }
 
-    def estimate_distance_engine(self, w_px_obj, W_px_total, last_d, last_v, dt):
-        """幾何計算 + EMAフィルタリング"""
-        hfov_rad = np.radians(self.params["HFOV_DEG"])
-        h_rel = self.params["H_CAM"] - self.params["H_TARGET_REF"]
+        # 3. 推論バックエンド (torch / onnx / openvino, INT8 は onnx のみ)
+        if prebuilt_backend:
+            self.inference = backend
+            self.params["INFERENCE_BACKEND"] = getattr(backend, "name", "custom")
+            return
+        if backend is not None:
+            self.params["INFERENCE_BACKEND"] = backend
+        if precision is not None:
+            self.params["INFERENCE_PRECISION"] = precision
+        self.inference = load_backend(
+            self.params["INFERENCE_BACKEND"], self.vehicle_detector.model,
+            precision=self.params["INFERENCE_PRECISION"]
+        )
+
+    def _load_vehicle_detector(self, model_name):
+        default_classes = ['car', 'truck', 'bus', 'motorcycle']
+        if model_name is None:
+            print(f"Downloading YOLO model from GCS: {CURRENT_YOLO_MODEL_PATH}")
+            model_path = download_model_if_needed(CURRENT_YOLO_MODEL_PATH)
+            print(f"YOLO model downloaded to: {model_path}")
+            # Use the absolute path directly so the wrapper can load it without relying on a specific directory
+            model_name = model_path
+            target_classes_names = ['car']
+        else:
+            target_classes_names = default_classes
+        
+        return YOLOv11VehicleDetector(
+            model_name=model_name, 
+            target_classes_names=target_classes_names
+        )
+
+    def estimate_distance_engine(self, w_px_obj, W_px_total, last_d, last_v, dt, params=None):
+        """幾何計算 + EMAフィルタリング (params: 動画ごとのコピー, 省略時は self.params)"""
+        p = params or self.params
+        hfov_rad = np.radians(p["HFOV_DEG"])
+        h_rel = p["H_CAM"] - p["H_TARGET_REF"]
         
         denominator = 2 * w_px_obj * np.tan(hfov_rad / 2)
         if denominator == 0: return 0, 0
-        L = (self.params["W_REAL"] * W_px_total) / denominator
+        L = (p["W_REAL"] * W_px_total) / denominator
         D_raw = np.sqrt(L**2 - h_rel**2) if L > h_rel else L
         
         # 距離EMA
-        alpha_d = self.params["EMA_ALPHA"]
+        alpha_d = p["EMA_ALPHA"]
         D_final = (last_d * (1 - alpha_d)) + (D_raw * alpha_d) if last_d is not None else D_raw
         
         # 速度EMA
         rel_speed_filtered = 0
         if last_d is not None and dt > 0:
             raw_v = (last_d - D_final) / dt
-            alpha_v = self.params["EMA_ALPHA_V"]
+            alpha_v = p["EMA_ALPHA_V"]
             rel_speed_filtered = (last_v * (1 - alpha_v)) + (raw_v * alpha_v)
                 
         return D_final, rel_speed_filtered
 
-    def is_in_lane_flexible(self, x_center, y_bottom, bbox_w, frame_width, frame_height):
+    def is_in_lane_flexible(self, x_center, y_bottom, bbox_w, frame_width, frame_height, params=None):
         """90%幅収容ルールに基づく自車線判定"""
-        p = self.params
+        p = params or self.params
         top_w = frame_width * p["LANE_TOP_W"]
         bottom_w = frame_width * p["LANE_BOTTOM_W"]
         start_y = frame_height * p["LANE_START_Y"]
@@ -109,128 +139,194 @@ class FollowingDistanceDetector:
         overlap_w = max(0, min(veh_x2, lane_x2) - max(veh_x1, lane_x1))
         return (overlap_w / bbox_w) >= p["WIDTH_CONTAINMENT_RATIO"]
 
-    def analyze_video(self, video_path, output_path=None, annotate=False):
+    def analyze_video(self, video_path, output_path=None, annotate=False, profile=False, windows=None):
         """
         Core analysis method: Detects Danger, Positive, or Safe status.
+        profile=True (or a StageProfiler) adds per-stage timings under result["profile"].
+        windows=[(start_sec, end_sec), ...] (see event_clips.event_windows) analyses only those
+        ranges, seeking to each one WINDOW_WARMUP_SEC early so tracks and the distance EMA settle.
+        With annotate, output_path is then a directory and each window becomes its own clip
+        (listed in result["clips"]); frames outside the windows are never encoded.
         """
-        cap = cv2.VideoCapture(str(video_path))
-        if not cap.isOpened():
-            raise ValueError(f"Unable to open video: {video_path}")
+        prof = make_profiler(profile)
+        # 動画ごとのパラメータのコピー (self.params は変更しない: 並行呼び出し対応)
+        params = dict(self.params)
+        # 注釈付き出力はフル解像度のフレームが必要なため縮小デコードしない
+        write_annotated = bool(annotate and output_path)
+        source = open_frame_source(video_path, params["DECODE_WIDTH"], params["FRAME_SKIP"],
+                                   full_resolution=write_annotated, decode_process=params["DECODE_PROCESS"],
+                                   seekable=windows is not None)
 
-        width, height = int(cap.get(3)), int(cap.get(4))
-        fps = cap.get(cv2.CAP_PROP_FPS) or 10.0
+        # 元動画の解像度 (縮小デコード時もボックスはこの座標系に戻す)
+        width, height, fps = source.width, source.height, source.fps
 
         # Adjust HFOV_DEG based on video aspect ratio
         aspect_ratio = width / height
         # Use 100 for 16:9 videos (aspect ratio > 1.5), 85 for 4:3 videos
-        self.params["HFOV_DEG"] = 100 if aspect_ratio > 1.5 else 85
-        
-        out = None
-        if annotate and output_path:
-            out = cv2.VideoWriter(str(output_path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        params["HFOV_DEG"] = 100 if aspect_ratio > 1.5 else 85
+
+        # 解析区間: (開始フレーム, 終了フレーム, 書き出し開始フレーム, 出力パス)
+        if windows is None:
+            segments = [(0, None, 0, str(output_path) if write_annotated else None)]
+        else:
+            segments = []
+            for i, (win_start, win_end) in enumerate(windows):
+                first_frame = max(0, int((win_start - params["WINDOW_WARMUP_SEC"]) * fps))
+                clip = clip_path(output_path, video_path, i, win_start, win_end) if write_annotated else None
+                segments.append((first_frame, int(math.ceil(win_end * fps)), int(win_start * fps), clip))
+            if write_annotated:
+                os.makedirs(output_path, exist_ok=True)
             
-        track_data = {}
         danger_confirmed = False
         positive_confirmed = False
-        danger_limit_count = self.params["DANGER_PERSISTENCE_SEC"] / (self.params["FRAME_SKIP"] / fps)
+        danger_limit_count = params["DANGER_PERSISTENCE_SEC"] / (params["FRAME_SKIP"] / fps)
 
         # Initialize logs array dynamically as we process frames
         # Each entry is an object for downstream consistency
         following_distance_logs = []
+        events = []  # 確定した danger / positive の時刻 (event_clips の切り出し区間)
+        clips = []
 
-        frame_count = 0
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret: break
-            frame_count += 1
-            
-            # フレームスキップ (v12.1: 2)
-            if frame_count % self.params["FRAME_SKIP"] != 0:
-                if out: out.write(frame)
-                continue
+        for first_frame, end_frame, write_from, clip in segments:
+            if first_frame:
+                source.seek(first_frame)
+            # 区間ごとに独立したトラッカー状態
+            tracker = self.inference.open_stream(video_path, start_frame=first_frame)
+            track_data = {}
+            out = None
+            if clip:
+                out = cv2.VideoWriter(clip, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+                clips.append(clip)
+
+            frame_count = first_frame
+            while end_frame is None or frame_count < end_frame:
+                frame_count += 1
+                # ウォームアップ中は書き出さない
+                writing = out is not None and frame_count > write_from
                 
-            current_t = frame_count / fps
-            dt = self.params["FRAME_SKIP"] / fps
-            
-            # トラッキング実行 (高速化設定: half=True)
-            results = self.vehicle_detector.model.track(frame, persist=True, conf=0.5, iou=0.3, verbose=False, imgsz=640)
-            
-            if results[0].boxes.id is not None:
-                boxes = results[0].boxes.xywh.cpu().numpy()
-                track_ids = results[0].boxes.id.int().cpu().tolist()
+                # フレームスキップ (v12.1: 2) 注釈なしの場合はデコードのみ (retrieve しない)
+                if frame_count % params["FRAME_SKIP"] != 0:
+                    if writing:
+                        with prof.stage("decode"):
+                            ret, frame = source.read()
+                        if not ret: break
+                        with prof.stage("annotate_write"):
+                            out.write(frame)
+                    else:
+                        with prof.stage("decode"):
+                            ret = source.skip()
+                        if not ret: break
+                    prof.count("frames_read")
+                    continue
+                    
+                with prof.stage("decode"):
+                    ret, frame = source.read()
+                if not ret: break
+                prof.count("frames_read")
+                
+                current_t = frame_count / fps
+                dt = params["FRAME_SKIP"] / fps
                 
-                for box, tid in zip(boxes, track_ids):
-                    xc, yc, w, h = box
-                    if self.is_in_lane_flexible(xc, yc + h/2, w, width, height):
-                        if tid not in track_data:
-                            track_data[tid] = {"last_d": None, "last_v": 0, "min_d": 999.0, "danger_count": 0, "entered_warn": False, "pos_done": False}
-                        
-                        data = track_data[tid]
-                        dist, rel_v = self.estimate_distance_engine(w, width, data["last_d"], data["last_v"], dt)
-                        data["last_d"], data["last_v"] = dist, rel_v
-                        
-                        # Danger判定 (0.6s 継続)
-                        if dist < self.params["DIST_DANGER_M"]:
-                            data["danger_count"] += 1
-                            if data["danger_count"] >= danger_limit_count:
-                                danger_confirmed = True
-                            # Track violation for logs - mark current second as having violation
-                            current_second = int(current_t)
-                            # Extend logs array if needed to accommodate current second
-                            while len(following_distance_logs) <= current_second:
-                                following_distance_logs.append({"isDetected": False})
-                            following_distance_logs[current_second] = {"isDetected": True}
-                        else:
-                            data["danger_count"] = 0
-                        
-                        # Positive判定 (リカバリー5m)
-                        if dist < self.params["DIST_WARN_M"]:
-                            data["entered_warn"] = True
-                            data["min_d"] = min(data["min_d"], dist)
-                        
-                        if data["entered_warn"]:
-                            if (dist - data["min_d"]) >= self.params["RECOVERY_THRESHOLD_M"]:
-                                positive_confirmed = True
-                                data["pos_done"] = True
+                # トラッキング実行 (バックエンド: INFERENCE_BACKEND)
+                boxes, track_ids = self.inference.track_batch([frame], [tracker], profiler=prof)[0]
+                boxes = to_source_coords(boxes, source)
+                prof.count("frames_inferred")
+                prof.observe("boxes_per_frame", len(track_ids) if track_ids is not None else 0)
+                
+                lane_start = time.perf_counter()
+                if track_ids is not None:
+                    for box, tid in zip(boxes, track_ids):
+                        xc, yc, w, h = box
+                        if self.is_in_lane_flexible(xc, yc + h/2, w, width, height, params=params):
+                            if tid not in track_data:
+                                track_data[tid] = {"last_d": None, "last_v": 0, "min_d": 999.0, "danger_count": 0, "entered_warn": False, "pos_done": False}
+                            
+                            data = track_data[tid]
+                            dist, rel_v = self.estimate_distance_engine(w, width, data["last_d"], data["last_v"], dt, params=params)
+                            data["last_d"], data["last_v"] = dist, rel_v
+                            
+                            # Danger判定 (0.6s 継続)
+                            if dist < params["DIST_DANGER_M"]:
+                                data["danger_count"] += 1
+                                if data["danger_count"] >= danger_limit_count:
+                                    danger_confirmed = True
+                                    if data["danger_count"] - 1 < danger_limit_count:
+                                        events.append({"type": "danger", "time": round(current_t, 2), "track_id": int(tid)})
+                                # Track violation for logs - mark current second as having violation
+                                current_second = int(current_t)
+                                # Extend logs array if needed to accommodate current second
+                                while len(following_distance_logs) <= current_second:
+                                    following_distance_logs.append({"isDetected": False})
+                                following_distance_logs[current_second] = {"isDetected": True}
+                            else:
+                                data["danger_count"] = 0
+                            
+                            # Positive判定 (リカバリー5m)
+                            if dist < params["DIST_WARN_M"]:
+                                data["entered_warn"] = True
+                                data["min_d"] = min(data["min_d"], dist)
+                            
+                            if data["entered_warn"]:
+                                if (dist - data["min_d"]) >= params["RECOVERY_THRESHOLD_M"]:
+                                    positive_confirmed = True
+                                    if not data["pos_done"]:
+                                        events.append({"type": "positive", "time": round(current_t, 2), "track_id": int(tid)})
+                                    data["pos_done"] = True
 
-                        if out:
-                            status, color = "SAFE", (0, 255, 0)
-                            if dist < self.params["DIST_DANGER_M"]: status, color = "DANGER", (0, 0, 255)
-                            elif dist < self.params["DIST_WARN_M"]: status, color = "WARNING", (0, 165, 255)
-                            if data["pos_done"]: status, color = "RECOVERED", (255, 255, 0)
-                            cv2.rectangle(frame, (int(xc-w/2), int(yc-h/2)), (int(xc+w/2), int(yc+h/2)), color, 2)
-                            cv2.putText(frame, f"{dist:.1f}m - {status}", (int(xc-w/2), int(yc-h/2)-10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
-            else:
-                # Mark tracks as stale but preserve for potential recovery
-                for tid in list(track_data.keys()):
-                    track_data[tid]["stale_frames"] = track_data[tid].get("stale_frames", 0) + 1
-                    if track_data[tid]["stale_frames"] > 5:  # ~0.3s grace at 30fps with skip=2
-                        del track_data[tid]
-            if out:
-                # ガイドライン描画
-                c_x = (width/2) + (width * self.params["LANE_OFFSET_X"])
-                tw, bw, sy = width * self.params["LANE_TOP_W"], width * self.params["LANE_BOTTOM_W"], height * self.params["LANE_START_Y"]
-                pts = np.array([[(c_x-tw/2, sy), (c_x+tw/2, sy), (c_x+bw/2, height), (c_x-bw/2, height)]], dtype=np.int32)
-                cv2.polylines(frame, pts, True, (200, 200, 200), 1)
-                out.write(frame)
+                            if writing:
+                                status, color = "SAFE", (0, 255, 0)
+                                if dist < params["DIST_DANGER_M"]: status, color = "DANGER", (0, 0, 255)
+                                elif dist < params["DIST_WARN_M"]: status, color = "WARNING", (0, 165, 255)
+                                if data["pos_done"]: status, color = "RECOVERED", (255, 255, 0)
+                                cv2.rectangle(frame, (int(xc-w/2), int(yc-h/2)), (int(xc+w/2), int(yc+h/2)), color, 2)
+                                cv2.putText(frame, f"{dist:.1f}m - {status}", (int(xc-w/2), int(yc-h/2)-10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+                else:
+                    # Mark tracks as stale but preserve for potential recovery
+                    for tid in list(track_data.keys()):
+                        track_data[tid]["stale_frames"] = track_data[tid].get("stale_frames", 0) + 1
+                        if track_data[tid]["stale_frames"] > 5:  # ~0.3s grace at 30fps with skip=2
+                            del track_data[tid]
+                prof.add("lane_distance", time.perf_counter() - lane_start)
+                prof.observe("tracks_alive", len(track_data))
+                if writing:
+                    with prof.stage("annotate_write"):
+                        # ガイドライン描画
+                        c_x = (width/2) + (width * params["LANE_OFFSET_X"])
+                        tw, bw, sy = width * params["LANE_TOP_W"], width * params["LANE_BOTTOM_W"], height * params["LANE_START_Y"]
+                        pts = np.array([[(c_x-tw/2, sy), (c_x+tw/2, sy), (c_x+bw/2, height), (c_x-bw/2, height)]], dtype=np.int32)
+                        cv2.polylines(frame, pts, True, (200, 200, 200), 1)
+                        out.write(frame)
+
+            if out: out.release()
 
-        cap.release()
-        if out: out.release()
+        source.release()
         
         final_status = "danger" if danger_confirmed else ("positive" if positive_confirmed else "safe")
-        return {
+        result = {
             "status": final_status,
             "fps": fps,
             "logs": {
                 "followingDistance": following_distance_logs
             },
+            "events": events,
             "video_duration_seconds": len(following_distance_logs)
         }
+        if windows is not None and write_annotated:
+            result["clips"] = clips
+        if prof.enabled:
+            result["profile"] = prof.to_dict()
+        return result
 
-    def execute(self, file_name, camera_direction, daylight_period, video_id, company_id, annotate=False, test=False):
+    def execute(self, file_name, camera_direction, daylight_period, video_id, company_id, annotate=False, test=False, profile=False,
+                clips=False):
         """
         Main execution method for following distance detection.
+        profile=True adds download / analysis / API post timings under response["profile"].
+        clips=True writes review clips around confirmed events (CLIP_PADDING_SEC) instead of a full
+        annotated video: stream copies, or with annotate only the event windows are re-encoded.
+        Clip paths are returned under response["clips"].
         """
+        prof = make_profiler(profile)
         from utils.common_utils import generate_and_download_video_clip, create_dashcam_video_path
         from services.api_client import ApiClient
         
@@ -241,24 +337,39 @@ class FollowingDistanceDetector:
             if test:
                 local_video_path = f"./tmp/{file_name}"
                 output_video_path = None 
-                if annotate: 
+                if annotate and not clips: 
                     os.makedirs("./results", exist_ok=True) 
                     fd, output_video_path = tempfile.mkstemp(prefix="result_", dir="./results", suffix=f"_{file_name}") 
                     os.close(fd)
             else:
                 video_path_gcs = create_dashcam_video_path(company_id, video_id, file_name)
-                local_video_path = generate_and_download_video_clip(video_path_gcs)
+                with prof.stage("download"):
+                    local_video_path = generate_and_download_video_clip(video_path_gcs)
                 output_video_path = None 
-                if annotate: 
+                if annotate and not clips: 
                     fd, output_video_path = tempfile.mkstemp(prefix=f"result_{video_id}_", dir="/tmp", suffix=f"_{file_name}") 
                     os.close(fd)
             
             # Step 2: 動画の解析
-            analysis_results = self.analyze_video(local_video_path, output_video_path, annotate=annotate)
+            analysis_results = self.analyze_video(local_video_path, output_video_path, annotate=annotate and not clips, profile=prof)
             
             final_status = analysis_results["status"]
             print(f"Analysis completed: Status={final_status.upper()}")
 
+            # Step 2b: イベント前後のみのレビュー用クリップ (全編の再エンコードはしない)
+            clip_paths = None
+            if clips:
+                windows = event_windows(analysis_results, self.params["CLIP_PADDING_SEC"])
+                clip_dir = os.path.join("./results", "clips") if test else tempfile.mkdtemp(prefix=f"clips_{video_id}_", dir="/tmp")
+                with prof.stage("clips"):
+                    if not windows:
+                        clip_paths = []
+                    elif annotate:
+                        clip_paths = self.analyze_video(local_video_path, clip_dir, annotate=True, windows=windows)["clips"]
+                    else:
+                        clip_paths = extract_clips(local_video_path, windows, clip_dir)
+                print(f"Event clips: {len(clip_paths)} ({windows})")
+
             # Step 3: 結果のフォーマット
             response = {
                 "result": {
@@ -269,21 +380,31 @@ class FollowingDistanceDetector:
             }
             
             if test:
+                if clip_paths is not None:
+                    response["clips"] = clip_paths
+                if prof.enabled:
+                    response["profile"] = prof.to_dict()
                 return response
             
             # Step 4: APIへの送信
             api_client = ApiClient()
-            api_client.post(
-                "/v1/internal/analyze_result_logs",
-                json_data={
-                    "result": response,
-                    "videoId": video_id,
-                    "aiModelName": f"following_distance_v12.1_{CURRENT_YOLO_MODEL_PATH}",
-                },
-            )
+            with prof.stage("api_post"):
+                api_client.post(
+                    "/v1/internal/analyze_result_logs",
+                    json_data={
+                        "result": response,
+                        "videoId": video_id,
+                        "aiModelName": f"following_distance_v12.1_{CURRENT_YOLO_MODEL_PATH}",
+                    },
+                )
             
             # もしDangerなら動画を特定の場所に保存/アップロードする等の処理をここに追加可能
             
+            # クリップとプロファイルは API 送信後に付与 (送信ペイロードには含めない)
+            if clip_paths is not None:
+                response["clips"] = clip_paths
+            if prof.enabled:
+                response["profile"] = prof.to_dict()
             return response
             
         except Exception as e:
@@ -312,9 +433,22 @@ def main():
                        help='YOLO11 model file name')
     parser.add_argument('--skip', type=int, default=2, help='Process every nth frame')
     parser.add_argument('--test', action='store_true', help='Run in test mode')
+    parser.add_argument('--profile', action='store_true', help='Include per-stage timings in the result')
+    parser.add_argument('--backend', type=str, default=None, choices=['torch', 'onnx', 'openvino'],
+                       help='Inference backend (default: torch)')
+    parser.add_argument('--precision', type=str, default=None, choices=['fp32', 'int8_dynamic', 'int8_static'],
+                       help='Inference precision (INT8 requires --backend onnx)')
+    parser.add_argument('--decode_width', type=int, default=0,
+                       help='Decode downscaled to this width via ffmpeg (ignored with --annotate)')
+    parser.add_argument('--clips', action='store_true',
+                       help='Write clips around confirmed events instead of a full annotated video')
+    parser.add_argument('--clip_padding', type=float, default=None, help='Seconds before/after each event clip')
     args = parser.parse_args()
     
-    detector = FollowingDistanceDetector(model_name=args.model)
+    detector = FollowingDistanceDetector(model_name=args.model, backend=args.backend, precision=args.precision)
+    detector.params["DECODE_WIDTH"] = args.decode_width
+    if args.clip_padding is not None:
+        detector.params["CLIP_PADDING_SEC"] = args.clip_padding
     # テスト実行例
     result = detector.execute(
         file_name=os.path.basename(args.video_path),
@@ -323,7 +457,9 @@ def main():
         video_id="test_id",
         company_id="test_company",
         annotate=args.annotate,
-        test=True
+        test=True,
+        profile=args.profile,
+        clips=args.clips
     )
     print(json.dumps(result, indent=2))
 
@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+
+# Review clips around confirmed following-distance events instead of full videos.
+#
+# event_windows() turns an analyze_video result into padded, merged time
+# windows: each confirmed danger event widened to its run of danger seconds in
+# logs.followingDistance, and each positive (recovery) event, +- padding.
+# extract_clips() cuts those windows with an ffmpeg stream copy (no re-encode);
+# for overlays, detector_threshold.analyze_video(..., annotate=True, windows=...)
+# re-encodes only the windows.
+#
+# Stream-copied clips start on the keyframe at or before the window start, so
+# they can begin up to one GOP early.
+
+
+def merge_windows(windows, gap_sec=0.0):
+    """Sort and merge (start, end) windows that overlap or are within gap_sec."""
+    merged = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1] + gap_sec:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _pad_windows(spans, padding_sec, duration=None):
+    windows = []
+    for start, end in spans:
+        start = max(0.0, start - padding_sec)
+        end = end + padding_sec if duration is None else min(duration, end + padding_sec)
+        if end > start:
+            windows.append((round(start, 2), round(end, 2)))
+    return merge_windows(windows)
+
+
+def _danger_runs(logs):
+    """(first_second, last_second) for each run of isDetected seconds."""
+    runs = []
+    for sec, entry in enumerate(logs):
+        if not entry.get("isDetected"):
+            continue
+        if runs and runs[-1][1] == sec - 1:
+            runs[-1][1] = sec
+        else:
+            runs.append([sec, sec])
+    return runs
+
+
+def event_windows(result, padding_sec=2.0, duration=None):
+    """Padded, merged [(start_sec, end_sec), ...] around the confirmed events of one result."""
+    logs = result.get("logs", {}).get("followingDistance", [])
+    runs = _danger_runs(logs)
+    spans = []
+    if "events" in result:
+        for event in result["events"]:
+            start = end = event["time"]
+            if event["type"] == "danger":
+                sec = int(event["time"])
+                for first, last in runs:
+                    if first <= sec <= last:
+                        start, end = min(start, first), max(end, last + 1)
+                        break
+            spans.append((start, end))
+    elif result.get("status") == "danger":
+        # Results from before events were recorded: use the danger seconds themselves
+        spans = [(first, last + 1) for first, last in runs]
+    return _pad_windows(spans, padding_sec, duration)
+
+
+def flagged_windows(result, padding_sec=1.0, duration=None):
+    """Padded, merged windows around every flagged second and every event (used by reanalyze.py)."""
+    logs = result.get("logs", {}).get("followingDistance", [])
+    spans = [(first, last + 1) for first, last in _danger_runs(logs)]
+    spans += [(event["time"], event["time"]) for event in result.get("events", [])]
+    return _pad_windows(spans, padding_sec, duration)
+
+
+def clip_path(output_dir, video_path, index, start, end):
+    stem = os.path.splitext(os.path.basename(str(video_path)))[0]
+    return os.path.join(output_dir, f"{stem}_event{index:02d}_{start:.1f}-{end:.1f}s.mp4")
+
+
+def extract_clips(video_path, windows, output_dir):
+    """Stream-copy each window to its own clip; returns the clip paths written."""
+    if not shutil.which("ffmpeg"):
+        raise RuntimeError("ffmpeg is required for event clip extraction")
+    os.makedirs(output_dir, exist_ok=True)
+    clips = []
+    for i, (start, end) in enumerate(windows):
+        path = clip_path(output_dir, video_path, i, start, end)
+        cmd = [
+            "ffmpeg", "-v", "error", "-nostdin", "-y",
+            "-ss", f"{start:.3f}", "-i", str(video_path), "-t", f"{end - start:.3f}",
+            "-map", "0", "-c", "copy", "-avoid_negative_ts", "make_zero", path,
+        ]
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            print(f"Warning: clip {path} failed: {proc.stderr.strip()}")
+            continue
+        clips.append(path)
+    return clips
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cut review clips around confirmed events (stream copy)")
+    parser.add_argument("video_path")
+    parser.add_argument("result_json", help="analyze_video / execute result (needs logs, ideally events)")
+    parser.add_argument("--output_dir", default="./results/clips")
+    parser.add_argument("--padding", type=float, default=2.0, help="Seconds before/after each event")
+    args = parser.parse_args()
+
+    with open(args.result_json, 'r') as f:
+        result = json.load(f)
+    windows = event_windows(result, args.padding)
+    if not windows:
+        print("No confirmed events; nothing to extract.")
+        return
+    for path in extract_clips(args.video_path, windows, args.output_dir):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+
+from stage_profiler import export_summary, summarize_profiles, write_jsonl
+
+# Experiment suite outputs, rebuilt from journal records. Shared by
+# run_experiment_suite.py (single task / one shard) and
+# merge_experiment_shards.py (all shards), so both write the same
+# result_<exp>.json / master_experiment_summary.json format.
+
+JOURNAL_NAME = "experiment_journal.jsonl"
+
+
+def params_key(params):
+    """Short stable hash of an experiment's params (journal entries are only reused for identical params)."""
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def write_experiment_outputs(output_dir, exp_id, params, results_by_video, video_names, profile=False):
+    """Write result_<exp_id>.json (and profile files) for one experiment; returns its summary entry.
+
+    results_by_video: {video filename: analyze_video result}; video_names gives the output order.
+    """
+    exp_results = {
+        "danger": [],
+        "safe": [],
+        "positive": []
+    }
+    profiles = []
+
+    for filename in video_names:
+        result = results_by_video.get(filename)
+        if result is None:
+            continue
+        status = result["status"]
+        if profile:
+            profiles.append({"video": filename, "profile": result.get("profile")})
+
+        if status == "danger":
+            exp_results["danger"].append(filename)
+        elif status == "positive":
+            exp_results["positive"].append(filename)
+        else:
+            exp_results["safe"].append(filename)
+
+    # Save summary for this experiment
+    summary_entry = {
+        "params": params,
+        "counts": {
+            "danger": len(exp_results["danger"]),
+            "positive": len(exp_results["positive"]),
+            "safe": len(exp_results["safe"])
+        },
+        # "details": exp_results # Too big to dump all details for 24 experiments in one file?
+    }
+
+    # Save individual experiment result to disk
+    with open(os.path.join(output_dir, f"result_{exp_id}.json"), 'w') as f:
+         json.dump({"summary": summary_entry, "details": exp_results}, f, indent=2)
+
+    if profile:
+        # Rebuilt from scratch on every (resumed) run; write_jsonl appends
+        profile_path = os.path.join(output_dir, f"profile_{exp_id}.jsonl")
+        if os.path.exists(profile_path):
+            os.remove(profile_path)
+        write_jsonl(profiles, profile_path)
+        profile_summary = summarize_profiles(p["profile"] for p in profiles)
+        export_summary(profile_summary, os.path.join(output_dir, f"profile_summary_{exp_id}.json"))
+        export_summary(profile_summary, os.path.join(output_dir, f"profile_summary_{exp_id}.prom"))
+    return summary_entry
+
+
+def write_master_summary(output_dir, results_summary):
+    with open(os.path.join(output_dir, "master_experiment_summary.json"), 'w') as f:
+        json.dump(results_summary, f, indent=2)
@@ -0,0 +1,174 @@
+import argparse
+import importlib
+import json
+import math
+import sys
+
+from frame_decoder import open_frame_source, to_source_coords
+from stage_profiler import make_profiler
+
+# Single-decode fan-out: each video is decoded once and the vehicle model runs
+# once per kept frame; the frame and its tracked boxes are then handed to every
+# registered analyzer, each with its own post-processing state.
+#
+#   runner = FanOutRunner(detector.inference, [FollowingDistanceAnalyzer(detector), TrackLogAnalyzer()])
+#   results = runner.analyze_video(video_path)   # {"following_distance": {...}, "track_log": {...}}
+#
+# Analyzer interface:
+#   name, frame_skip            result key / which frames it wants (frame_count % frame_skip == 0)
+#   begin(video_path, source, profiler)
+#   update(frame_count, frame, boxes, track_ids)   boxes: xywh in original-resolution pixels
+#   finish() -> result
+#
+# The runner decodes at the gcd of the analyzers' frame_skip and infers once on
+# each of those frames, so an analyzer with a larger skip sees the tracks of
+# the shared pass rather than running its own model.
+
+ANALYZERS = {}
+
+
+def register_analyzer(name, factory):
+    """factory(detector) -> analyzer; used by --analyzers on the command line."""
+    ANALYZERS[name] = factory
+
+
+class FollowingDistanceAnalyzer:
+    """FollowingDistanceDetector post-processing (lane / distance / danger) on shared detections."""
+
+    name = "following_distance"
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.frame_skip = detector.params["FRAME_SKIP"]
+
+    def begin(self, video_path, source, profiler):
+        self._stream = self.detector.init_stream(video_path, source, profile=profiler)
+
+    def update(self, frame_count, frame, boxes, track_ids):
+        self._stream["frame_count"] = frame_count
+        self.detector.update_stream(self._stream, boxes, track_ids)
+
+    def finish(self):
+        result = self.detector.finish_stream(self._stream)
+        result.pop("profile", None)  # reported once for the whole fan-out pass
+        return result
+
+
+class TrackLogAnalyzer:
+    """Per-second vehicle track boxes, the input for lane-cut style post-processing."""
+
+    name = "track_log"
+
+    def __init__(self, detector=None, frame_skip=None):
+        # Default to the detector's stride so the shared pass infers no extra frames
+        if frame_skip is None:
+            frame_skip = detector.params["FRAME_SKIP"] if detector is not None else 1
+        self.frame_skip = frame_skip
+
+    def begin(self, video_path, source, profiler):
+        self.fps = source.fps
+        self.seconds = []
+
+    def update(self, frame_count, frame, boxes, track_ids):
+        second = int(frame_count / self.fps)
+        while len(self.seconds) <= second:
+            self.seconds.append({})
+        if track_ids is None:
+            return
+        tracks = self.seconds[second]
+        for box, tid in zip(boxes, track_ids):
+            # Last box of each track in that second
+            tracks[str(tid)] = [round(float(v), 1) for v in box]
+
+    def finish(self):
+        return {"fps": self.fps, "vehicleTracks": self.seconds}
+
+
+register_analyzer(FollowingDistanceAnalyzer.name, FollowingDistanceAnalyzer)
+register_analyzer(TrackLogAnalyzer.name, TrackLogAnalyzer)
+
+
+class FanOutRunner:
+    def __init__(self, inference, analyzers, decode_width=0):
+        if not analyzers:
+            raise ValueError("FanOutRunner needs at least one analyzer")
+        self.inference = inference
+        self.analyzers = analyzers
+        self.decode_width = decode_width
+        self.frame_skip = 0
+        for analyzer in analyzers:
+            self.frame_skip = math.gcd(self.frame_skip, analyzer.frame_skip)
+
+    def analyze_video(self, video_path, profile=False):
+        """Decode and infer once; returns {analyzer.name: result} (plus "profile" when profiling)."""
+        prof = make_profiler(profile)
+        source = open_frame_source(video_path, self.decode_width, self.frame_skip)
+        try:
+            tracker = self.inference.open_stream(video_path)
+            for analyzer in self.analyzers:
+                analyzer.begin(video_path, source, prof)
+
+            frame_count = 0
+            while True:
+                frame_count += 1
+                if frame_count % self.frame_skip != 0:
+                    with prof.stage("decode"):
+                        ret = source.skip()
+                    if not ret: break
+                    prof.count("frames_read")
+                    continue
+
+                with prof.stage("decode"):
+                    ret, frame = source.read()
+                if not ret: break
+                prof.count("frames_read")
+
+                boxes, track_ids = self.inference.track_batch([frame], [tracker], profiler=prof)[0]
+                boxes = to_source_coords(boxes, source)
+                for analyzer in self.analyzers:
+                    if frame_count % analyzer.frame_skip == 0:
+                        with prof.stage(analyzer.name):
+                            analyzer.update(frame_count, frame, boxes, track_ids)
+        finally:
+            source.release()
+
+        results = {analyzer.name: analyzer.finish() for analyzer in self.analyzers}
+        if prof.enabled:
+            results["profile"] = prof.to_dict()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode once, run several analyzers on the shared detections")
+    parser.add_argument("video_paths", nargs="+")
+    parser.add_argument("--analyzers", nargs="+", default=sorted(ANALYZERS), choices=sorted(ANALYZERS))
+    parser.add_argument("--detector_module", default="detector_dynamic", help="Module providing FollowingDistanceDetector")
+    parser.add_argument("--model", "-m", default=None)
+    parser.add_argument("--backend", default=None, choices=["torch", "onnx", "openvino"])
+    parser.add_argument("--decode_width", type=int, default=0)
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--output", default=None, help="Write {video: results} JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    module = importlib.import_module(args.detector_module)
+    detector = module.FollowingDistanceDetector(model_name=args.model, backend=args.backend)
+    analyzers = [ANALYZERS[name](detector) for name in args.analyzers]
+    runner = FanOutRunner(detector.inference, analyzers, decode_width=args.decode_width)
+
+    results = {}
+    for video_path in args.video_paths:
+        try:
+            results[video_path] = runner.analyze_video(video_path, profile=args.profile)
+        except ValueError as e:
+            print(f"Error opening video: {video_path} ({e})", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.output}")
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
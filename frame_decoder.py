@@ -0,0 +1,170 @@
+import shutil
+import subprocess
+
+import cv2
+import numpy as np
+
+# Frame sources for analyze_video.
+#
+# All sources expose the original clip geometry (width, height, fps,
+# frame_count as reported by the container, 0 if unknown) plus the
+# geometry of the frames they hand out (frame_width, frame_height) and the
+# factors to map boxes back to original pixels (scale_x, scale_y).
+#   read() -> (ret, frame)   decode and return the next frame
+#   skip() -> bool           advance past a frame without returning it
+#   read_into(out) -> bool   decode the next frame straight into a caller buffer
+#   seek(frame_index)        continue from frame_index (0-based); not on frame_ring sources
+#
+# OpenCVFrameSource decodes at full resolution (needed for annotated output),
+# skipping frames with grab() so they are never colour-converted or copied.
+# FFmpegFrameSource scales inside the decoder and pipes small BGR frames, and
+# can drop the skipped frames inside ffmpeg as well. Kept frames are those with
+# 0-based index n % frame_skip == offset (the detectors use offset = skip - 1).
+
+
+def probe_video(video_path):
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise ValueError(f"Unable to open video: {video_path}")
+    width, height = int(cap.get(3)), int(cap.get(4))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 10.0
+    frame_count = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    cap.release()
+    return width, height, fps, frame_count
+
+
+def decoded_size(width, height, decode_width):
+    """(frame_width, frame_height) for a clip decoded at decode_width (even, aspect preserved)."""
+    if not decode_width:
+        return width, height
+    frame_width = min(int(decode_width), width) // 2 * 2
+    frame_height = max(2, int(round(height * frame_width / width / 2)) * 2)
+    return frame_width, frame_height
+
+
+class OpenCVFrameSource:
+    def __init__(self, video_path):
+        self.cap = cv2.VideoCapture(str(video_path))
+        if not self.cap.isOpened():
+            raise ValueError(f"Unable to open video: {video_path}")
+        self.width, self.height = int(self.cap.get(3)), int(self.cap.get(4))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 10.0
+        self.frame_count = max(0, int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        self.frame_width, self.frame_height = self.width, self.height
+        self.scale_x = self.scale_y = 1.0
+
+    def read(self):
+        return self.cap.read()
+
+    def skip(self):
+        return self.cap.grab()
+
+    def seek(self, frame_index):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+
+    def read_into(self, out):
+        ret, frame = self.cap.read(out)
+        if ret and frame.ctypes.data != out.ctypes.data:
+            out[...] = frame
+        return ret
+
+    def release(self):
+        self.cap.release()
+
+
+class FFmpegFrameSource:
+    def __init__(self, video_path, decode_width, frame_skip=1, offset=None):
+        self.width, self.height, self.fps, self.frame_count = probe_video(video_path)
+        self.frame_width, self.frame_height = decoded_size(self.width, self.height, decode_width)
+        self.scale_x = self.width / self.frame_width
+        self.scale_y = self.height / self.frame_height
+        self.frame_skip = max(1, int(frame_skip))
+        self.offset = self.frame_skip - 1 if offset is None else offset
+        self._frame_bytes = self.frame_width * self.frame_height * 3
+        self.video_path = str(video_path)
+        self._start(0)
+
+    def _start(self, start_frame):
+        self._position = start_frame  # frames consumed by the caller (read + skip)
+        # select's n restarts at 0 after a seek; keep the absolute n % frame_skip == offset pattern
+        offset = (self.offset - start_frame) % self.frame_skip
+        filters = []
+        if self.frame_skip > 1:
+            filters.append(f"select='eq(mod(n\\,{self.frame_skip})\\,{offset})'")
+        filters.append(f"scale={self.frame_width}:{self.frame_height}:flags=bilinear")
+        seek = ["-ss", f"{max(start_frame - 0.5, 0) / self.fps:.4f}"] if start_frame else []
+        cmd = [
+            "ffmpeg", "-v", "error", "-nostdin", *seek, "-i", self.video_path,
+            "-an", "-sn", "-vf", ",".join(filters), "-vsync", "0",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1",
+        ]
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                     bufsize=self._frame_bytes * 2)
+
+    def seek(self, frame_index):
+        """Restart the pipe at frame_index (input seek, decodes from the preceding keyframe)."""
+        self.release()
+        self._start(frame_index)
+
+    def _fill(self, view):
+        got = 0
+        while got < self._frame_bytes:
+            n = self.proc.stdout.readinto(view[got:])
+            if not n:
+                return False
+            got += n
+        return True
+
+    def _read_raw(self):
+        buf = bytearray(self._frame_bytes)
+        if not self._fill(memoryview(buf)):
+            return None
+        return np.frombuffer(buf, dtype=np.uint8).reshape(self.frame_height, self.frame_width, 3)
+
+    def read_into(self, out):
+        """Read the next piped frame directly into `out` (C-contiguous, frame_height x frame_width x 3)."""
+        self._position += 1
+        return self._fill(memoryview(out).cast("B"))
+
+    def read(self):
+        self._position += 1
+        frame = self._read_raw()
+        return (frame is not None), frame
+
+    def skip(self):
+        self._position += 1
+        if self.frame_skip > 1 and (self._position - 1) % self.frame_skip != self.offset:
+            return True  # already dropped by the select filter
+        return self._read_raw() is not None
+
+    def release(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.stdout.close()
+        self.proc.wait()
+
+
+def open_frame_source(video_path, decode_width=0, frame_skip=1, full_resolution=False, decode_process=False,
+                      seekable=False):
+    """Pick a frame source: downscaled ffmpeg pipe when decode_width is set, else OpenCV.
+
+    decode_process=True decodes in a separate process through a shared-memory
+    ring (frame_ring.RingFrameSource); it is ignored for full-resolution output
+    and when the caller needs seek() (seekable=True).
+    """
+    if decode_process and not full_resolution and not seekable:
+        from frame_ring import RingFrameSource
+
+        return RingFrameSource(video_path, decode_width=decode_width, frame_skip=frame_skip)
+    if decode_width and not full_resolution:
+        if shutil.which("ffmpeg"):
+            return FFmpegFrameSource(video_path, decode_width, frame_skip)
+        print("Warning: ffmpeg not found; decoding at full resolution with OpenCV")
+    return OpenCVFrameSource(video_path)
+
+
+def to_source_coords(boxes, source):
+    """Map xywh boxes from decoded-frame pixels back to original-resolution pixels."""
+    if boxes is None or (source.scale_x == 1.0 and source.scale_y == 1.0):
+        return boxes
+    return boxes * np.array([source.scale_x, source.scale_y, source.scale_x, source.scale_y], dtype=np.float32)
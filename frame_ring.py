@@ -0,0 +1,221 @@
+import multiprocessing
+import queue
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from frame_decoder import FFmpegFrameSource, OpenCVFrameSource, decoded_size, probe_video
+
+# Shared-memory ring of preallocated frame slots between a decoder process and
+# inference consumers. Only slot indices travel through the queues:
+#
+#   producer: slot = ring.acquire(); decode into ring.slot(slot); ring.publish(slot, frame_index)
+#   consumer: for slot, frame_index in ring.consume(producer=proc): use ring.slot(slot); ring.release(slot)
+#
+# The creating process owns the segment and unlinks it on close(), on garbage
+# collection / interpreter exit (weakref.finalize), and - if it is killed - via
+# multiprocessing's resource tracker, which unlinks segments whose owner died.
+# Attaching processes never unlink.
+
+_POLL_SEC = 1.0
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # Older Pythons register on attach as well; our children are spawned from the
+        # owner and share its resource tracker, so this is a no-op re-registration
+        return shared_memory.SharedMemory(name=name)
+
+
+def _release_segment(shm, owner):
+    try:
+        shm.close()
+    except BufferError:
+        pass  # a NumPy view is still alive; the mapping goes away with the process
+    if owner:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class FrameRing:
+    def __init__(self, num_slots, frame_shape, ctx=None):
+        ctx = ctx or multiprocessing.get_context("spawn")
+        self.num_slots = num_slots
+        self.frame_shape = tuple(frame_shape)
+        slot_bytes = int(np.prod(self.frame_shape))
+        self._shm = shared_memory.SharedMemory(create=True, size=slot_bytes * num_slots)
+        self._owner = True
+        self.free = ctx.Queue()
+        self.ready = ctx.Queue()
+        for i in range(num_slots):
+            self.free.put(i)
+        self._init_views()
+        self._finalizer = weakref.finalize(self, _release_segment, self._shm, True)
+
+    def _init_views(self):
+        self._frames = np.ndarray((self.num_slots,) + self.frame_shape, dtype=np.uint8, buffer=self._shm.buf)
+
+    def __getstate__(self):
+        # Sent to child processes at start(); they attach by name
+        return {"name": self._shm.name, "num_slots": self.num_slots, "frame_shape": self.frame_shape,
+                "free": self.free, "ready": self.ready}
+
+    def __setstate__(self, state):
+        self.num_slots = state["num_slots"]
+        self.frame_shape = state["frame_shape"]
+        self.free, self.ready = state["free"], state["ready"]
+        self._shm = _attach(state["name"])
+        self._owner = False
+        self._init_views()
+        self._finalizer = weakref.finalize(self, _release_segment, self._shm, False)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def slot(self, index):
+        """Writable NumPy view of one slot (no copy)."""
+        return self._frames[index]
+
+    # --- producer side ---
+    def acquire(self):
+        while True:
+            try:
+                return self.free.get(timeout=_POLL_SEC)
+            except queue.Empty:
+                parent = multiprocessing.parent_process()
+                if parent is not None and not parent.is_alive():
+                    raise RuntimeError("Frame ring consumer process died")
+
+    def publish(self, index, frame_index):
+        self.ready.put((index, frame_index))
+
+    def finish(self, consumers=1):
+        for _ in range(consumers):
+            self.ready.put(None)
+
+    # --- consumer side ---
+    def release(self, index):
+        self.free.put(index)
+
+    def consume(self, producer=None):
+        """Yield (slot, frame_index) until the producer finishes; raises if it dies first."""
+        while True:
+            try:
+                item = self.ready.get(timeout=_POLL_SEC)
+            except queue.Empty:
+                if producer is not None and not producer.is_alive():
+                    raise RuntimeError(f"Frame ring producer exited with code {producer.exitcode}")
+                continue
+            if item is None:
+                return
+            yield item
+
+    def close(self):
+        self._frames = None  # drop our own view so the mapping can be closed
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def decode_into_ring(video_path, ring, frame_skip=1, offset=0, decode_width=0, consumers=1):
+    """Decoder process body: write kept frames (n % frame_skip == offset) straight into ring slots."""
+    if decode_width:
+        source = FFmpegFrameSource(video_path, decode_width, frame_skip, offset)
+    else:
+        source = OpenCVFrameSource(video_path)
+    try:
+        n = 0
+        while True:
+            if n % frame_skip != offset:
+                ok = source.skip()
+            else:
+                index = ring.acquire()
+                ok = source.read_into(ring.slot(index))
+                if ok:
+                    ring.publish(index, n)
+                else:
+                    ring.release(index)
+            if not ok:
+                break
+            n += 1
+    finally:
+        source.release()
+        ring.finish(consumers)
+        ring.close()
+
+
+def start_decoder(video_path, frame_skip=1, offset=0, decode_width=0, num_slots=8):
+    """Create a ring sized for the clip and start its decoder process; returns (ring, process, geometry)."""
+    width, height, fps, frame_count = probe_video(video_path)
+    frame_width, frame_height = decoded_size(width, height, decode_width)
+    ctx = multiprocessing.get_context("spawn")
+    ring = FrameRing(num_slots, (frame_height, frame_width, 3), ctx=ctx)
+    proc = ctx.Process(target=decode_into_ring, args=(str(video_path), ring, frame_skip, offset, decode_width),
+                       daemon=True)
+    proc.start()
+    return ring, proc, (width, height, fps, frame_count, frame_width, frame_height)
+
+
+def ring_frames(video_path, frame_skip=1, offset=0, decode_width=0, num_slots=8):
+    """Yield (frame_index, view) decoded in a separate process.
+
+    Each view is valid until the next iteration; copy it if it must outlive that.
+    """
+    ring, proc, _ = start_decoder(video_path, frame_skip, offset, decode_width, num_slots)
+    held = None
+    try:
+        for index, frame_index in ring.consume(producer=proc):
+            if held is not None:
+                ring.release(held)
+            held = index
+            yield frame_index, ring.slot(index)
+    finally:
+        if proc.is_alive():
+            proc.terminate()
+        proc.join()
+        ring.close()
+
+
+class RingFrameSource:
+    """frame_decoder-compatible source fed by a decoder process (see open_frame_source)."""
+
+    def __init__(self, video_path, decode_width=0, frame_skip=1, num_slots=8):
+        self.frame_skip = max(1, int(frame_skip))
+        self._ring, self._proc, geometry = start_decoder(
+            video_path, self.frame_skip, self.frame_skip - 1, decode_width, num_slots)
+        self.width, self.height, self.fps, self.frame_count, self.frame_width, self.frame_height = geometry
+        self.scale_x = self.width / self.frame_width
+        self.scale_y = self.height / self.frame_height
+        self._frames = self._ring.consume(producer=self._proc)
+        self._held = None
+
+    def read(self):
+        """Next kept frame as a view into the ring; valid until the next read()/release()."""
+        if self._held is not None:
+            self._ring.release(self._held)
+            self._held = None
+        item = next(self._frames, None)
+        if item is None:
+            return False, None
+        self._held = item[0]
+        return True, self._ring.slot(self._held)
+
+    def skip(self):
+        return True  # skipped frames never leave the decoder process
+
+    def release(self):
+        if self._proc.is_alive():
+            self._proc.terminate()
+        self._proc.join()
+        self._ring.close()
@@ -1,12 +1,88 @@
 import argparse
 import os
 import cv2
+import numpy as np
 import sys
 import glob
+import multiprocessing
+import threading
+import time
+import importlib
+import json
+import re
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
-def process_videos(input_dir, output_dir, mode='tp'):
-    print(f"Starting processing in mode: {mode}")
-    
+from dataset_shards import SHARD_BYTES, ShardReader, ShardWriter, repair_shards
+from run_journal import RunJournal
+
+FRAME_STRIDE = 5  # keep every 5th frame (0, 5, 10, ...)
+VEHICLE_CLASSES = [2, 3, 5, 7]  # removed in fp mode (aggressive ghost removal)
+MANIFEST_NAME = "label_manifest.jsonl"
+# Near-duplicate suppression per mode: max dHash Hamming distance (of 64 bits) to the last
+# emitted frame of the same video for a kept frame to be skipped; None keeps every frame.
+# tp / fp keep every frame unless --dedup_radius is given, so their default output is unchanged.
+DEDUP_RADIUS = {'tp': None, 'fp': None, 'mine': 3}
+
+# Pipeline: kept frames are inferred in batches (--batch); label lines are
+# formatted on the inference thread and JPEG encoding + file writes go to a
+# small thread pool (--writers) with a bounded number of frames in flight, so
+# disk I/O overlaps the next batch. --procs splits the videos across worker
+# processes, each with its own model. --batch 1 --writers 1 --procs 1
+# behaves like the original one-frame-at-a-time loop.
+#
+# --mode mine: fp-style labels (vehicles removed), but only for frames where an
+# in-lane vehicle's distance estimate (FollowingDistanceDetector's lane
+# trapezoid + distance geometry, single frame, no EMA) is under DIST_DANGER_M,
+# plus --context kept frames either side. Each kept frame gets an audit record
+# with its triggering box in <output_dir>/mining_audit/<video>.jsonl.
+#
+# Dedup: before inference each kept frame gets a 64-bit difference hash; frames
+# within the mode's DEDUP_RADIUS (--dedup_radius) of the last emitted frame
+# are skipped (stopped traffic, empty road). Emitted / skipped counts go into
+# the manifest, and the radius is part of the manifest key, so a rerun with
+# another radius redoes the videos.
+#
+# --format shards: images and labels go into ~--shard_mb tar shards with
+# offset indexes under <output_dir>/shards/ (dataset_shards.py: reader, YOLO
+# training adapter) instead of two files per frame. Each video's samples are
+# committed to the shard before its manifest record, and a failed video's are
+# rolled back. A redone video tombstones the samples of its earlier attempts
+# in the same commit, the shard counterpart of removing its old files.
+#
+# Resume: every output file is written as <name>.tmp and renamed into place,
+# and a video is appended to <output_dir>/label_manifest.jsonl (frames,
+# stride, model, mode, dedup radius) only after all its files are in place. Reruns skip the
+# videos in the manifest, so a crashed job or newly added input videos only
+# cost the missing videos; a partially written video is redone from scratch
+# (its earlier files, final or .tmp, are removed first).
+
+def iter_kept_frames(video_path, stride=FRAME_STRIDE, decode_process=False):
+    """Yield (frame_idx, frame) for every stride-th frame."""
+    if decode_process:
+        # Decoder runs in its own process; frames are views into a shared-memory ring
+        from frame_ring import ring_frames
+        yield from ring_frames(video_path, frame_skip=stride, offset=0)
+        return
+
+    cap = cv2.VideoCapture(video_path)
+    frame_idx = 0
+    while cap.isOpened():
+        if frame_idx % stride != 0:
+            # Skipped frames are only grabbed, never converted/copied
+            if not cap.grab():
+                break
+            frame_idx += 1
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame_idx, frame
+        frame_idx += 1
+    cap.release()
+
+def load_model(model_name="yolo11x.pt"):
     # Try importing ultralytics
     try:
         from ultralytics import YOLO
@@ -22,16 +98,252 @@ def process_videos(input_dir, output_dir, mode='tp'):
         # "yolo11x.pt" might not be available if internet access is restricted or not pre-downloaded.
         # Let's try downloading 'yolo11n.pt' (smaller) if x fails, or just 'yolov8n.pt'
         # Or better, check if we can download.
-        model_name = "yolo11x.pt" 
         if not os.path.exists(model_name):
              print(f"Model {model_name} not found locally. Ultralytics should auto-download.")
         
-        model = YOLO(model_name)
+        return YOLO(model_name)
     except Exception as e:
         print(f"Error loading model: {e}")
         sys.exit(1)
 
-    video_files = glob.glob(os.path.join(input_dir, "*.mp4"))
+def dhash(frame, size=8):
+    """64-bit difference hash: signs of horizontal gradients of a (size+1) x size grayscale thumbnail."""
+    thumb = cv2.cvtColor(cv2.resize(frame, (size + 1, size), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    return int.from_bytes(np.packbits(thumb[:, 1:] > thumb[:, :-1]).tobytes(), "big")
+
+class FrameDeduper:
+    """Skips frames whose dHash is within radius bits of the last emitted frame."""
+
+    def __init__(self, radius):
+        self.radius = radius
+        self.last = None
+        self.skipped = 0
+
+    def is_duplicate(self, frame):
+        h = dhash(frame)
+        if self.last is not None and bin(h ^ self.last).count("1") <= self.radius:
+            self.skipped += 1
+            return True
+        self.last = h
+        return False
+
+def label_lines(results, mode):
+    """Label file lines for one frame's result (same format as the per-box loop)."""
+    boxes = results.boxes
+    lines = []
+    for cls, conf, xywhn in zip(boxes.cls.tolist(), boxes.conf.tolist(), boxes.xywhn.tolist()):
+        cls = int(cls)
+        if mode in ('fp', 'mine') and cls in VEHICLE_CLASSES:
+            continue
+        lines.append(f"{cls} {xywhn[0]} {xywhn[1]} {xywhn[2]} {xywhn[3]} {conf}\n")
+    return lines
+
+class FrameWriter:
+    """JPEG encoding + label writes on a thread pool, at most max_pending frames queued."""
+
+    def __init__(self, workers=4, max_pending=None, shards=None):
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.shards = shards
+        self.slots = threading.BoundedSemaphore(max_pending or 4 * max(1, workers))
+        self.errors = []
+
+    def _write(self, label_path, lines, img_path, frame):
+        # Same bytes as cv2.imwrite(img_path, frame)
+        ok, jpg = cv2.imencode(".jpg", frame)
+        if not ok:
+            raise RuntimeError(f"JPEG encoding failed for {img_path}")
+        if self.shards is not None:
+            key = os.path.basename(img_path)[:-len(".jpg")]
+            self.shards.add(key, {"jpg": jpg.tobytes(), "txt": "".join(lines).encode()},
+                            {"shape": list(frame.shape[:2])})
+            return
+        # We must save the label file even if empty; temp names first
+        with open(label_path + ".tmp", 'w') as f:
+            f.writelines(lines)
+        with open(img_path + ".tmp", 'wb') as f:
+            f.write(jpg.tobytes())
+        os.replace(label_path + ".tmp", label_path)
+        os.replace(img_path + ".tmp", img_path)
+
+    def _done(self, future):
+        self.slots.release()
+        if future.exception() is not None:
+            self.errors.append(future.exception())
+
+    def submit(self, label_path, lines, img_path, frame):
+        self.slots.acquire()  # backpressure: inference waits when the writers fall behind
+        self.pool.submit(self._write, label_path, lines, img_path, frame).add_done_callback(self._done)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        if self.errors:
+            raise self.errors[0]
+
+class DangerZoneMiner:
+    """Picks the frames of an FP video where the danger logic could fire, +- context kept frames."""
+
+    def __init__(self, context=2, detector_module="detector_dynamic"):
+        module = importlib.import_module(detector_module)
+        # Geometry only; FOLLOWING_DISTANCE_CONFIG_JSON overrides apply as in the experiments
+        self.detector = module.FollowingDistanceDetector(backend="none")
+        self.context = context
+
+    def video_params(self, width, height):
+        """Per-video params, with HFOV from the aspect ratio as in FollowingDistanceDetector.init_stream."""
+        params = dict(self.detector.params)
+        params["HFOV_DEG"] = 100 if width / height > 1.5 else 85
+        return params
+
+    def trigger(self, result, width, height, params=None):
+        """Closest in-lane vehicle under DIST_DANGER_M in this frame, or None."""
+        p = params if params is not None else self.video_params(width, height)
+        boxes = result.boxes
+        best = None
+        for cls, conf, xywh in zip(boxes.cls.tolist(), boxes.conf.tolist(), boxes.xywh.tolist()):
+            if int(cls) not in VEHICLE_CLASSES:
+                continue
+            xc, yc, w, h = xywh
+            if w <= 0 or not self.detector.is_in_lane_flexible(xc, yc + h / 2, w, width, height, params=p):
+                continue
+            dist, _ = self.detector.estimate_distance_engine(w, width, None, 0, 0, params=p)
+            if dist < p["DIST_DANGER_M"] and (best is None or dist < best["distance_m"]):
+                best = {"cls": int(cls), "conf": round(conf, 4), "box_xywh": [round(v, 1) for v in xywh],
+                        "distance_m": round(float(dist), 2)}
+        return best
+
+    def select(self, frames):
+        """
+        Yield (frame_idx, frame, result, audit) for the kept frames among (frame_idx, frame, result) in order.
+        Only `context` frames are held back, waiting for a trigger.
+        """
+        pending = deque(maxlen=self.context)
+        tail, last_trigger = 0, None
+        params = None
+        for frame_idx, frame, result in frames:
+            if params is None:
+                params = self.video_params(frame.shape[1], frame.shape[0])  # once per video
+            hit = self.trigger(result, frame.shape[1], frame.shape[0], params)
+            if hit is not None:
+                for item in pending:
+                    yield (*item, {"trigger": None, "trigger_frame": frame_idx})
+                pending.clear()
+                yield frame_idx, frame, result, {"trigger": hit, "trigger_frame": frame_idx}
+                tail, last_trigger = self.context, frame_idx
+            elif tail > 0:
+                yield frame_idx, frame, result, {"trigger": None, "trigger_frame": last_trigger}
+                tail -= 1
+            elif self.context > 0:
+                pending.append((frame_idx, frame, result))
+
+def process_video(model, video_path, output_dir, mode='tp', decode_process=False, batch_size=8, writers=4, miner=None,
+                  dedup_radius=None, shards=None, stale_keys=()):
+    """
+    Label every kept frame of one video (mode 'mine': only the miner's frames, dedup_radius: minus near-duplicates).
+    shards: a ShardWriter to write into instead of <output_dir>/<video>_<frame>.jpg/.txt files;
+    stale_keys: this video's samples already in the shards (see shard_keys_by_video), tombstoned.
+    Returns manifest stats: {"frames": images written, "emitted": frames past dedup, "skipped_duplicates": n}.
+    """
+    base_name = os.path.basename(video_path).replace(".mp4", "")
+    # Everything an earlier (interrupted or superseded) attempt at this video wrote, so the redo is
+    # complete on its own. Anchored on the frame suffix: camera_5 must not match camera_5_part07's files.
+    own = re.compile(re.escape(base_name) + r"_\d{6,}\.(jpg|txt)(\.tmp)?$")
+    for name in glob.glob(os.path.join(output_dir, f"{glob.escape(base_name)}_[0-9]*")):
+        if own.match(os.path.basename(name)):
+            os.remove(name)
+    if shards is not None and stale_keys:
+        shards.delete(stale_keys)  # pending until this video commits, so a failed redo keeps them
+    writer = FrameWriter(writers, shards=shards)
+    written = emitted = 0
+    audit = []
+    dedup = FrameDeduper(dedup_radius) if dedup_radius is not None else None
+
+    def infer(batch):
+        # Run inference
+        results = model([frame for _, frame in batch], verbose=False)
+        return [(frame_idx, frame, result) for (frame_idx, frame), result in zip(batch, results)]
+
+    def inferred():
+        nonlocal emitted
+        batch = []
+        for frame_idx, frame in iter_kept_frames(video_path, decode_process=decode_process):
+            if dedup is not None and dedup.is_duplicate(frame):
+                continue
+            emitted += 1
+            if decode_process:
+                frame = frame.copy()  # ring slots are reused once the next frame is read
+            batch.append((frame_idx, frame))
+            if len(batch) >= batch_size:
+                yield from infer(batch)
+                batch = []
+        if batch:
+            yield from infer(batch)
+
+    frames = inferred()
+    if miner is not None:
+        frames = miner.select(frames)
+    try:
+        try:
+            for frame_idx, frame, result, *extra in frames:
+                stem = os.path.join(output_dir, f"{base_name}_{frame_idx:06d}")
+                writer.submit(f"{stem}.txt", label_lines(result, mode), f"{stem}.jpg", frame)
+                written += 1
+                if extra:
+                    audit.append({"image": os.path.basename(stem) + ".jpg", "frame": frame_idx, **extra[0]})
+        finally:
+            writer.close()
+    except BaseException:
+        if shards is not None:
+            shards.rollback()
+        raise
+    if shards is not None:
+        shards.commit()
+
+    if miner is not None:
+        audit_dir = os.path.join(output_dir, "mining_audit")
+        os.makedirs(audit_dir, exist_ok=True)
+        audit_path = os.path.join(audit_dir, f"{base_name}.jsonl")
+        with open(audit_path + ".tmp", 'w') as f:
+            f.writelines(json.dumps(record) + "\n" for record in audit)
+        os.replace(audit_path + ".tmp", audit_path)
+    return {"frames": written, "emitted": emitted, "skipped_duplicates": dedup.skipped if dedup is not None else 0}
+
+# Per-process model for --procs > 1
+_worker = {}
+
+def _init_worker(model_path, options, threads, mining, sharding):
+    try:
+        import torch
+        torch.set_num_threads(threads)  # share the node's cores between the worker processes
+    except ImportError:
+        pass
+    _worker["model"] = load_model(model_path)
+    _worker["options"] = options
+    _worker["miner"] = DangerZoneMiner(**mining) if mining is not None else None
+    # Commits are per video, so the worker's shard is complete without a close at exit
+    _worker["shards"] = ShardWriter(**sharding) if sharding is not None else None
+
+def shard_keys_by_video(shard_dir):
+    """{video base name: [sample keys]} of the live samples in shard_dir (keys are <video>_<frame:06d>)."""
+    keys = {}
+    for key in ShardReader(shard_dir).keys:
+        base_name, _, frame = key.rpartition("_")
+        if frame.isdigit() and len(frame) >= 6:
+            keys.setdefault(base_name, []).append(key)
+    return keys
+
+def _process_in_worker(video_path, stale_keys=()):
+    try:
+        return video_path, process_video(_worker["model"], video_path, miner=_worker["miner"], shards=_worker["shards"],
+                                         stale_keys=stale_keys, **_worker["options"])
+    except Exception as e:
+        print(f"Error processing {video_path}: {e}")
+        return video_path, None
+
+def process_videos(input_dir, output_dir, mode='tp', decode_process=False, batch_size=8, writers=4, procs=1,
+                   model_path="yolo11x.pt", mining=None, dedup_radius=None, shard_bytes=None):
+    print(f"Starting processing in mode: {mode}")
+
+    video_files = sorted(glob.glob(os.path.join(input_dir, "*.mp4")))
     print(f"Found {len(video_files)} videos in {input_dir}")
     
     if not video_files:
@@ -39,56 +351,104 @@ def process_videos(input_dir, output_dir, mode='tp'):
         os.system(f"ls -F {input_dir}")
         return
 
-    for video_path in video_files:
-        cap = cv2.VideoCapture(video_path)
-        frame_idx = 0
-        base_name = os.path.basename(video_path).replace(".mp4", "")
-        
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Skip frames to speed up? Every 5th frame?
-            if frame_idx % 5 != 0:
-                frame_idx += 1
-                continue
-                
-            # Run inference
-            results = model(frame, verbose=False)[0]
-            
-            # Save labels
-            label_path = os.path.join(output_dir, f"{base_name}_{frame_idx:06d}.txt")
-            
-            # We must save the label file even if empty
-            with open(label_path, 'w') as f:
-                for box in results.boxes:
-                    cls = int(box.cls[0])
-                    conf = float(box.conf[0])
-                    xywhn = box.xywhn[0].tolist()
-                    
-                    if mode == 'fp':
-                        # Aggressive Ghost Removal: Remove vehicle detections
-                        if cls in [2, 3, 5, 7]:
-                            continue 
-                            
-                    f.write(f"{cls} {xywhn[0]} {xywhn[1]} {xywhn[2]} {xywhn[3]} {conf}\n")
-            
-            # Save frame image
-            img_path = os.path.join(output_dir, f"{base_name}_{frame_idx:06d}.jpg")
-            cv2.imwrite(img_path, frame)
-            
-            frame_idx += 1
-        
-        cap.release()
-    print("Processing complete.")
+    model_id = os.path.basename(model_path)
+    manifest = RunJournal(os.path.join(output_dir, MANIFEST_NAME), key_fields=("video", "stride", "model", "mode", "dedup_radius"),
+                          flush_every=1)
+
+    def manifest_key(video_path):
+        return (os.path.basename(video_path), FRAME_STRIDE, model_id, mode, dedup_radius)
+
+    def complete(video_path, stats):
+        manifest.append({"video": os.path.basename(video_path), "stride": FRAME_STRIDE, "model": model_id,
+                         "mode": mode, **stats, "dedup_radius": dedup_radius,
+                         "completed_at": datetime.now().isoformat()})
+
+    done = len(video_files)
+    video_files = [v for v in video_files if not manifest.done(manifest_key(v))]
+    if len(video_files) < done:
+        print(f"Skipping {done - len(video_files)} videos already in {MANIFEST_NAME}; {len(video_files)} to process")
+
+    if not video_files:
+        manifest.close()
+        print("Processing complete. Nothing to do.")
+        return
+
+    sharding = None
+    stale = {}
+    if shard_bytes:
+        sharding = {"shard_dir": os.path.join(output_dir, "shards"), "max_bytes": shard_bytes}
+        if os.path.isdir(sharding["shard_dir"]):
+            repair_shards(sharding["shard_dir"])  # cut shards of a killed run back to their last video
+            # Samples of videos being redone (manifest key changed, or committed but never recorded)
+            stale = shard_keys_by_video(sharding["shard_dir"])
+
+    def stale_keys(video_path):
+        return stale.get(os.path.basename(video_path).replace(".mp4", ""), ())
+
+    options = {"output_dir": output_dir, "mode": mode, "decode_process": decode_process,
+               "batch_size": batch_size, "writers": writers, "dedup_radius": dedup_radius}
+    start = time.perf_counter()
+    images = skipped = 0
+    try:
+        if procs <= 1:
+            model = load_model(model_path)
+            miner = DangerZoneMiner(**mining) if mining is not None else None
+            shards = ShardWriter(**sharding) if sharding is not None else None
+            start = time.perf_counter()
+            try:
+                for video_path in video_files:
+                    stats = process_video(model, video_path, miner=miner, shards=shards,
+                                          stale_keys=stale_keys(video_path), **options)
+                    complete(video_path, stats)
+                    images += stats["frames"]
+                    skipped += stats["skipped_duplicates"]
+            finally:
+                if shards is not None:
+                    shards.close()
+        else:
+            threads = max(1, (os.cpu_count() or 1) // procs)
+            # ProcessPoolExecutor workers (unlike multiprocessing.Pool's) may start --decode_process decoders
+            with ProcessPoolExecutor(procs, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(model_path, options, threads, mining, sharding)) as pool:
+                # Videos are handed out one at a time, so long videos do not leave a process idle
+                futures = [pool.submit(_process_in_worker, video_path, stale_keys(video_path)) for video_path in video_files]
+                for i, future in enumerate(as_completed(futures), start=1):
+                    video_path, stats = future.result()
+                    if stats is not None:
+                        complete(video_path, stats)
+                        images += stats["frames"]
+                        skipped += stats["skipped_duplicates"]
+                    print(f"[{i}/{len(video_files)}] {os.path.basename(video_path)}: "
+                          f"{stats['frames'] if stats else None} images")
+    finally:
+        manifest.close()
+    elapsed = time.perf_counter() - start
+    print(f"Processing complete. {images} images in {elapsed:.1f}s ({images / elapsed if elapsed > 0 else 0:.1f} images/s), "
+          f"{skipped} near-duplicate frames skipped")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--input_dir", required=True)
     parser.add_argument("--output_dir", required=True)
-    parser.add_argument("--mode", required=True, choices=['tp', 'fp'])
+    parser.add_argument("--mode", required=True, choices=['tp', 'fp', 'mine'], help="mine: fp labels for danger-zone frames only (dedup on by default, see --dedup_radius)")
+    parser.add_argument("--model_path", default="yolo11x.pt", help="YOLO weights; its file name is the model id in the manifest")
+    parser.add_argument("--decode_process", action="store_true", help="Decode in a separate process (shared-memory frame ring)")
+    parser.add_argument("--batch", type=int, default=8, help="Kept frames per model call")
+    parser.add_argument("--writers", type=int, default=4, help="Threads for JPEG encoding / label writes")
+    parser.add_argument("--context", type=int, default=2, help="mine: kept frames saved before/after each triggering frame")
+    parser.add_argument("--detector_module", default="detector_dynamic", help="mine: module providing FollowingDistanceDetector")
+    parser.add_argument("--procs", type=int, default=1, help="Worker processes, each with its own model, splitting the videos")
+    parser.add_argument("--dedup_radius", type=int, default=None,
+                        help=f"Skip frames within this dHash distance of the last emitted one (-1: off; default per mode {DEDUP_RADIUS})")
+    parser.add_argument("--format", default="files", choices=["files", "shards"],
+                        help="shards: tar shards with offset indexes in <output_dir>/shards/")
+    parser.add_argument("--shard_mb", type=int, default=SHARD_BYTES >> 20, help="--format shards: target shard size")
     args = parser.parse_args()
+    dedup_radius = DEDUP_RADIUS[args.mode] if args.dedup_radius is None else args.dedup_radius
     
     os.makedirs(args.output_dir, exist_ok=True)
-    process_videos(args.input_dir, args.output_dir, args.mode)
+    process_videos(args.input_dir, args.output_dir, args.mode, decode_process=args.decode_process,
+                   batch_size=args.batch, writers=args.writers, procs=args.procs, model_path=args.model_path,
+                   mining={"context": args.context, "detector_module": args.detector_module} if args.mode == 'mine' else None,
+                   dedup_radius=dedup_radius if dedup_radius is None or dedup_radius >= 0 else None,
+                   shard_bytes=args.shard_mb << 20 if args.format == "shards" else None)
@@ -0,0 +1,220 @@
+import os
+import threading
+
+import numpy as np
+
+from stage_profiler import NULL_PROFILER
+
+# Inference backends for the vehicle model used by FollowingDistanceDetector.
+#
+#   stream = backend.open_stream(video_path)       # one per video: its own tracker state
+#   backend.track_batch(frames, streams, profiler)  # one detector call for all frames
+#
+# track_batch() returns one (boxes, track_ids) per frame, where boxes is a
+# float32 (N, 4) xywh array in frame pixels and track_ids a list of ints, or
+# (None, None) when the tracker produced no ids for the frame. Detection is
+# batched across streams; each stream's tracker is then updated separately, so
+# videos analysed side by side never share track ids or motion state. The
+# profiler splits detector time ("inference") from tracker time ("tracking").
+# With isolate_errors=True a frame whose detection or tracker update fails
+# gets None (the error is printed) and the other frames are unaffected;
+# otherwise the exception propagates.
+
+DEFAULT_BACKEND = "torch"
+DEFAULT_PRECISION = "fp32"
+INT8_PRECISIONS = ("int8_dynamic", "int8_static")
+
+
+def exported_model_path(weights_path, backend, precision=DEFAULT_PRECISION):
+    """Where the exported model lives (next to the .pt weights)."""
+    stem, _ = os.path.splitext(str(weights_path))
+    if precision in INT8_PRECISIONS:
+        if backend != "onnx":
+            raise ValueError(f"{precision} is only supported with the onnx backend")
+        return f"{stem}_{precision}.onnx"
+    if backend == "onnx":
+        return stem + ".onnx"
+    if backend == "openvino":
+        return stem + "_openvino_model"
+    raise ValueError(f"No export format for backend: {backend}")
+
+
+def weights_path_of(model):
+    path = getattr(model, "ckpt_path", None) or getattr(model, "model_name", None)
+    if not path:
+        raise ValueError("Cannot determine weights path of the loaded model")
+    return str(path)
+
+
+def export_cached(model, backend, imgsz=640):
+    """Export `model` for `backend` once and reuse it while newer than the weights."""
+    weights = weights_path_of(model)
+    target = exported_model_path(weights, backend)
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(weights):
+        print(f"Using cached {backend} export: {target}")
+        return target
+
+    print(f"Exporting {weights} to {backend} (imgsz={imgsz})...")
+    exported = model.export(format=backend, imgsz=imgsz, dynamic=False, half=False, verbose=False)
+    exported = str(exported)
+    if os.path.abspath(exported) != os.path.abspath(target):
+        os.replace(exported, target)
+    print(f"Exported model cached at: {target}")
+    return target
+
+
+def make_tracker(config="botsort.yaml"):
+    """A fresh ultralytics tracker, the same one model.track() would attach."""
+    from ultralytics.trackers.track import TRACKER_MAP
+    from ultralytics.utils import IterableSimpleNamespace
+    from ultralytics.utils.checks import check_yaml
+
+    try:
+        from ultralytics.utils import YAML
+        cfg = YAML.load(check_yaml(config))
+    except ImportError:  # older ultralytics
+        from ultralytics.utils import yaml_load
+        cfg = yaml_load(check_yaml(config))
+    cfg = IterableSimpleNamespace(**cfg)
+    tracker_cls = TRACKER_MAP[cfg.tracker_type]
+    try:
+        return tracker_cls(args=cfg, frame_rate=30)
+    except TypeError:  # newer trackers take args only
+        return tracker_cls(args=cfg)
+
+
+def unpack_tracks(tracks):
+    """Convert tracker output rows (x1, y1, x2, y2, id, ...) to (boxes_xywh, track_ids)."""
+    if tracks is None or len(tracks) == 0:
+        return None, None
+    x1, y1, x2, y2 = (tracks[:, i].astype(np.float32) for i in range(4))
+    boxes = np.stack([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], axis=1)
+    track_ids = tracks[:, 4].astype(int).tolist()
+    return boxes, track_ids
+
+
+class YoloTrackBackend:
+    """Batched ultralytics detection on a (possibly exported) YOLO model plus per-stream trackers."""
+
+    def __init__(self, name, model, imgsz=640, conf=0.5, iou=0.3, device=None, max_batch=None,
+                 tracker="botsort.yaml"):
+        self.name = name
+        self.model = model
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.device = device
+        self.max_batch = max_batch  # None: any batch size; exported static-shape models take 1
+        self.tracker = tracker
+        self._lock = threading.Lock()  # the ultralytics predictor is not thread-safe
+
+    def open_stream(self, video_path=None, start_frame=0):
+        """Tracker state for one video; pass it back to track_batch with that video's frames.
+
+        start_frame is where a seeking caller resumes (the tracker itself does not need it).
+        """
+        return {"video_path": video_path, "tracker": make_tracker(self.tracker)}
+
+    def _predict(self, frames):
+        kwargs = {"conf": self.conf, "iou": self.iou, "verbose": False, "imgsz": self.imgsz}
+        if self.device is not None:
+            kwargs["device"] = self.device
+        step = self.max_batch or len(frames)
+        results = []
+        with self._lock:
+            for i in range(0, len(frames), step):
+                results.extend(self.model.predict(list(frames[i:i + step]), **kwargs))
+        return results
+
+    def _predict_isolated(self, frames, streams):
+        try:
+            return self._predict(frames)
+        except Exception as e:
+            if len(frames) == 1:
+                print(f"Error processing {streams[0]['video_path']}: {e}")
+                return [None]
+            print(f"Batched inference failed ({e}); retrying {len(frames)} frames one by one")
+        # No tracker has seen these frames yet, so predicting them again is safe
+        results = []
+        for frame, stream in zip(frames, streams):
+            try:
+                results.extend(self._predict([frame]))
+            except Exception as e:
+                print(f"Error processing {stream['video_path']}: {e}")
+                results.append(None)
+        return results
+
+    def track_batch(self, frames, streams, profiler=NULL_PROFILER, isolate_errors=False):
+        with profiler.stage("inference"):
+            results = self._predict_isolated(frames, streams) if isolate_errors else self._predict(frames)
+        tracked = []
+        with profiler.stage("tracking"):
+            for frame, stream, result in zip(frames, streams, results):
+                if result is None:
+                    tracked.append(None)
+                    continue
+                try:
+                    detections = result.boxes.cpu().numpy()
+                    tracked.append(unpack_tracks(stream["tracker"].update(detections, frame)))
+                except Exception as e:
+                    if not isolate_errors:
+                        raise
+                    # Each tracker is updated exactly once per frame, so the other streams stay intact
+                    print(f"Error processing {stream['video_path']}: {e}")
+                    tracked.append(None)
+        return tracked
+
+
+def _torch_backend(model, precision=DEFAULT_PRECISION, **kwargs):
+    if precision != DEFAULT_PRECISION:
+        raise ValueError(f"{precision} is only supported with the onnx backend")
+    return YoloTrackBackend("torch", model, **kwargs)
+
+
+def quantized_model_path(model, precision, imgsz=640):
+    """Locate (or for int8_dynamic, build) the INT8 ONNX model for `model`."""
+    weights = weights_path_of(model)
+    target = exported_model_path(weights, "onnx", precision)
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(weights):
+        return target
+    if precision == "int8_static":
+        raise FileNotFoundError(
+            f"{target} not found or stale; calibrate it first with "
+            f"quantize_model.py --weights {weights} --input_dir <corpus>"
+        )
+    from quantize_model import quantize_dynamic_int8
+
+    return quantize_dynamic_int8(export_cached(model, "onnx", imgsz=imgsz), target)
+
+
+def _exported_backend(backend):
+    def factory(model, imgsz=640, precision=DEFAULT_PRECISION, **kwargs):
+        from ultralytics import YOLO
+
+        if precision in INT8_PRECISIONS:
+            path = quantized_model_path(model, precision, imgsz=imgsz)
+        else:
+            path = export_cached(model, backend, imgsz=imgsz)
+        exported = YOLO(path, task=getattr(model, "task", None) or "detect")
+        name = backend if precision == DEFAULT_PRECISION else f"{backend}_{precision}"
+        # Exported with dynamic=False, so the input shape is fixed at batch 1
+        return YoloTrackBackend(name, exported, imgsz=imgsz, device="cpu", max_batch=1, **kwargs)
+    return factory
+
+
+BACKEND_FACTORIES = {
+    "torch": _torch_backend,
+    "onnx": _exported_backend("onnx"),
+    "openvino": _exported_backend("openvino"),
+}
+
+
+def load_backend(name, model, **kwargs):
+    """Build the inference backend `name` around a loaded ultralytics YOLO model.
+
+    Pass precision="int8_dynamic" / "int8_static" to run a quantized ONNX model.
+    """
+    name = (name or DEFAULT_BACKEND).lower()
+    if name not in BACKEND_FACTORIES:
+        raise ValueError(f"Unknown inference backend: {name} (choose from {sorted(BACKEND_FACTORIES)})")
+    return BACKEND_FACTORIES[name](model, **kwargs)
@@ -1,185 +1,354 @@
 import argparse
+import functools
+import glob
+import multiprocessing
 import os
 import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
-import matplotlib.pyplot as plt
+import numpy as np
 
-from services.detectors.inward.falcon.inward_day_detector_v4 import InwardDayDetector as InwardDayDetectorV4
+from run_journal import RunJournal
+
+# Usage:
+#   python local_test_event_screening.py --input_dir videos/ --output_dir out/ --min_confidences 0.4 0.5
+#   python local_test_event_screening.py report --output_dir out/     # tables + graphs from raw_results_*.json
+#
+# The detector (torch) is imported only when inference runs and matplotlib only when graphs are drawn,
+# so `report` starts without either.
+
+ENGINE_NAME = "inward_day_detector"
+
+def model_id(model_path):
+    """Cache key part for the model: path and mtime, so retrained weights at the same path are re-run."""
+    if model_path is None:
+        return "default"
+    mtime = os.path.getmtime(model_path) if os.path.exists(model_path) else None
+    return f"{os.path.abspath(model_path)}@{mtime}"
+
+def frame_scores(logs):
+    """
+    Per-frame cache entry from _process_video logs: for each class, one [raw_score, yolo, confirmed]
+    row per frame where YOLO or the confirmation fired (raw_score: yolo_<cls> frame "confidence").
+    """
+    record = {"frame_count": len(logs["phone"]), "scores_available": True}
+    for cls in ("phone", "cigarette"):
+        rows = []
+        yolo_logs = logs.get(f"yolo_{cls}", [])
+        for i, frame in enumerate(logs[cls]):
+            yolo = yolo_logs[i] if i < len(yolo_logs) else {}
+            if not (yolo.get("isDetected") or frame["isDetected"]):
+                continue
+            score = yolo.get("confidence") if yolo.get("isDetected") else None
+            if yolo.get("isDetected") and score is None:
+                record["scores_available"] = False
+            rows.append([score, int(bool(yolo.get("isDetected"))), int(bool(frame["isDetected"]))])
+        record[cls] = rows
+    return record
+
+def derive_stats(record, min_conf):
+    """
+    Frame counts at min_conf from a cache entry recorded at a lower min_conf: YOLO frames whose
+    raw score is not above min_conf (ultralytics' conf filter) drop out, together with their
+    confirmations. Confirmed frames without a YOLO score are kept.
+
+    Approximation: this assumes confirmation is decided per frame. If the detector confirms over
+    several frames (persistence, smoothing), dropping a low-score frame can change neighbouring
+    confirmations in a real run; use --exact for exact counts.
+    """
+    stats = {"frame_count": record["frame_count"]}
+    for cls in ("phone", "cigarette"):
+        kept = [row for row in record[cls] if row[0] is None or row[0] > min_conf]
+        stats[f"{cls}_frames"] = sum(row[2] for row in kept)
+        stats[f"yolo_{cls}_frames"] = sum(row[1] for row in kept)
+    return stats
+
+SWEEP_FIELDS = ("total_videos", "total_detected", "phone", "cigarette")
+
+def purity_arrays(per_video_stats):
+    """
+    (labels, per-video label codes, purity[V, 2]) with phone / cigarette purity = confirmed / YOLO frames;
+    -inf for videos without YOLO frames so they never pass a threshold.
+    """
+    labels, codes = np.unique([v["label"] for v in per_video_stats], return_inverse=True)
+    yolo = np.array([[v["yolo_phone_frames"], v["yolo_cigarette_frames"]] for v in per_video_stats], dtype=float).reshape(-1, 2)
+    confirmed = np.array([[v["phone_frames"], v["cigarette_frames"]] for v in per_video_stats], dtype=float).reshape(-1, 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        purity = np.where(yolo > 0, confirmed / np.where(yolo > 0, yolo, 1), -np.inf)
+    return labels, codes, purity
+
+def purity_counts(labels, codes, purity, thresholds):
+    """
+    {label: {"total_videos": n, "phone" / "cigarette" / "total_detected": counts per threshold}} where a
+    video counts at threshold t if its purity >= t. One sort per label, then a searchsorted over all
+    thresholds: O((V + T) log V) instead of a Python loop over thresholds x videos.
+    """
+    thresholds = np.asarray(thresholds, dtype=float)
+    # phone, cigarette, either (detected if the better of the two passes)
+    scores = np.column_stack([purity, purity.max(axis=1)])
+    sweep = {}
+    for i, label in enumerate(labels):
+        s = np.sort(scores[codes == i], axis=0)
+        n = len(s)
+        counts = n - np.stack([np.searchsorted(s[:, k], thresholds, side="left") for k in range(3)])
+        sweep[str(label)] = {"total_videos": n, "phone": counts[0], "cigarette": counts[1], "total_detected": counts[2]}
+    return sweep
+
+# Per-process detectors, one per min_conf (--workers: each worker process holds its own)
+_controllers = {}
+
+def _screen(job, model_path):
+    video_path, min_conf = job
+    if min_conf not in _controllers:
+        from services.detectors.inward.falcon.inward_day_detector_v4 import InwardDayDetector as InwardDayDetectorV4
+        _controllers[min_conf] = InwardDayDetectorV4(base_conf=min_conf, model_path=model_path)
+    try:
+        response = _controllers[min_conf]._process_video(video_path)
+    except Exception as e:
+        print(f"Error processing {video_path}: {e}")
+        return None
+    return {"path": video_path, "base_conf": min_conf, **frame_scores(response["logs"])}
+
+def run_jobs(jobs, cache, args):
+    """Run the (video_path, min_conf) jobs missing from the cache, serially or on --workers processes."""
+    model = model_id(args.model_path)
+    todo = [job for job in jobs if not cache.done((*job, model))]
+    if len(todo) < len(jobs):
+        print(f"Resuming: {len(jobs) - len(todo)} of {len(jobs)} already in {cache.path}")
+    if not todo:
+        return
+    if args.workers <= 1:
+        results = (_screen(job, args.model_path) for job in todo)
+        pool = None
+    else:
+        pool = multiprocessing.get_context("spawn").Pool(args.workers)
+        results = pool.imap_unordered(functools.partial(_screen, model_path=args.model_path), todo)
+    try:
+        for idx, record in enumerate(results, start=1):
+            if record is not None:
+                cache.append({**record, "model": model})
+                print(f"Processed video {idx}/{len(todo)}: {record['path']} (min_conf={record['base_conf']})")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
 def main(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # ① Get Video Files
+    video_files = []
+    for root, dirs, files in os.walk(args.input_dir):
+        for file in files:
+            if file.lower().endswith((".mp4", ".mov", ".avi", ".mkv")):
+                relative_path = os.path.relpath(root, args.input_dir)
+                video_files.append((relative_path, file))
+
+    full_list = []
+    for rel_path, filename in sorted(video_files):
+        if rel_path == ".":
+            vp = os.path.join(args.input_dir, filename)
+            label = "default"
+        else:
+            vp = os.path.join(args.input_dir, rel_path, filename)
+            label = os.path.normpath(rel_path).split(os.sep)[0]
+        full_list.append({"path": vp, "label": label})
+    print(f"Total videos found: {len(full_list)}")
+
+    # ② Run Inference once at the lowest min_conf and cache per-frame raw YOLO scores.
+    # A higher min_conf only drops detections below it, so its counts are derived from the cache
+    # (see derive_stats; this assumes per-frame confirmation). --exact restores one full
+    # inference pass per min_conf.
+    # Every record is appended to frame_scores.jsonl as soon as it is computed; a restarted run
+    # only processes the (video, min_conf, model) entries missing from it.
+    min_confidences = sorted(set(args.min_confidences))
+    base_conf = min_confidences[0]
+    model = model_id(args.model_path)
+
+    cache_path = os.path.join(args.output_dir, "frame_scores.jsonl")
+    with RunJournal(cache_path, key_fields=("path", "base_conf", "model"), flush_every=1) as cache:
+        run_jobs([(info["path"], base_conf) for info in full_list], cache, args)
+
+        # No per-frame scores in the logs (or --exact): run those min_conf levels for real
+        exact_jobs = [(info["path"], min_conf) for min_conf in min_confidences[1:] for info in full_list
+                      if cache.done((info["path"], base_conf, model))
+                      and (args.exact or not cache.get((info["path"], base_conf, model))["scores_available"])]
+        run_jobs(exact_jobs, cache, args)
+
+        raw_by_conf = {}
+        for min_conf in min_confidences:
+            print(f"\n=== MIN_CONFIDENCE={min_conf} ===")
+            per_video_stats, failed = [], []
+            for info in full_list:
+                record = cache.get((info["path"], min_conf, model))
+                if record is None and not args.exact:
+                    # Derive only from a base record that has per-frame scores; otherwise its counts
+                    # are the base_conf ones and would be reported as if measured at min_conf
+                    base = cache.get((info["path"], base_conf, model))
+                    record = base if base is not None and base["scores_available"] else None
+                if record is None:
+                    failed.append(info["path"])  # inference failed, see the error above
+                    continue
+                per_video_stats.append({"path": info["path"], "label": info["label"], **derive_stats(record, min_conf)})
+            if failed:
+                print(f"  → {len(failed)} videos failed and are left out of the counts:")
+                for path in failed:
+                    print(f"     {path}")
+
+            # Save Raw JSON
+            raw_json_path = os.path.join(args.output_dir, f"raw_results_minconf_{min_conf}.json")
+            with open(raw_json_path, "w") as rf:
+                json.dump(per_video_stats, rf, indent=2)
+            print(f"  → Saved raw results to {raw_json_path}")
+            raw_by_conf[min_conf] = per_video_stats
+
+    build_report(raw_by_conf, args.holding_thresholds, args.output_dir, workers=args.workers)
+
+def build_report(raw_by_conf, purities, output_dir, workers=1):
+    """results_all.json, purity curves / table and graphs from {min_conf: per-video stats}."""
     # overall_results structure:
     # {
     #   "<ENGINE_NAME>": {
-    #       "minconf_<min_conf>_purity_<purity>": {
+    #       "minconf_<min_conf>_pres_<purity>": {
     #           "<label>": {
     #               "total_videos": <int>,
-    #               "holdingSomething": <int>
+    #               "total_detected": <int>,
+    #               "phone": <int>,
+    #               "cigarette": <int>
     #           },
     #           ...
     #       },
     #       ...
     #   }
     # }
-    ENGINE_NAME = "inward_day_detector"
     overall_results = {ENGINE_NAME: {}}
+    table_lines = ["| min_conf | Label | Total | " + " | ".join(f"{p}" for p in purities) + " |",
+                   "| :--- | :--- | ---: |" + " ---: |" * len(purities)]
 
-    os.makedirs(args.output_dir, exist_ok=True)
+    for min_conf, per_video_stats in sorted(raw_by_conf.items()):
+        # ③ Sweep Purity Thresholds
+        # holding_thresholds is reused as purity_thresholds.
+        # Key name 'pres' is kept for compatibility with the graph / table scripts; it means purity here.
+        labels, codes, purity = purity_arrays(per_video_stats)
+        sweep = purity_counts(labels, codes, purity, purities)
+        for j, purity_t in enumerate(purities):
+            key = f"minconf_{min_conf}_pres_{purity_t}"
+            overall_results[ENGINE_NAME][key] = {
+                lbl: {name: int(c[name][j]) if name != "total_videos" else c[name] for name in SWEEP_FIELDS}
+                for lbl, c in sweep.items()
+            }
+        for lbl, c in sweep.items():
+            table_lines.append(f"| {min_conf} | {lbl} | {c['total_videos']} | "
+                               + " | ".join(str(int(v)) for v in c["total_detected"]) + " |")
+        print(f"  → min_conf={min_conf}: purity sweep over {len(purities)} thresholds for labels {list(sweep)}")
 
-    for min_conf in args.min_confidences:
-        print(f"\n=== Running with MIN_CONFIDENCE={min_conf} ===")
-        controller = InwardDayDetectorV4(base_conf=min_conf, model_path=args.model_path)
-
-        # ① Get Video Files
-        video_files = []
-        for root, dirs, files in os.walk(args.input_dir):
-            for file in files:
-                if file.lower().endswith((".mp4", ".mov", ".avi", ".mkv")):
-                    relative_path = os.path.relpath(root, args.input_dir)
-                    video_files.append((relative_path, file))
-
-        full_list = []
-        for rel_path, filename in video_files:
-            if rel_path == ".":
-                vp = os.path.join(args.input_dir, filename)
-                label = "default"
-            else:
-                vp = os.path.join(args.input_dir, rel_path, filename)
-                label = os.path.normpath(rel_path).split(os.sep)[0]
-            full_list.append({"path": vp, "label": label})
-        print(f"Total videos found: {len(full_list)}")
-
-        # ② Run Inference
-        per_video_stats = []
-        for idx, info in enumerate(full_list, start=1):
-            video_path = info["path"]
-            label     = info["label"]
-            print(f"Processing video {idx}/{len(full_list)}: {video_path}")
-            
-            response = controller._process_video(video_path)
-            logs = response["logs"]
-            frame_count = len(logs["phone"])
-            
-            # Count Detections
-            confirmed_phone_frames = sum(1 for frame in logs["phone"] if frame["isDetected"])
-            confirmed_cigarette_frames = sum(1 for frame in logs["cigarette"] if frame["isDetected"])
-            
-            # v4 Logic: Get YOLO Raw Detections (New Feature)
-            yolo_phone_frames = sum(1 for frame in logs.get("yolo_phone", []) if frame["isDetected"])
-            yolo_cigarette_frames = sum(1 for frame in logs.get("yolo_cigarette", []) if frame["isDetected"])
-            
-            per_video_stats.append({
-                "path": video_path,
-                "label": label,
-                "frame_count": frame_count,
-                "phone_frames": confirmed_phone_frames,      
-                "cigarette_frames": confirmed_cigarette_frames, 
-                "yolo_phone_frames": yolo_phone_frames, 
-                "yolo_cigarette_frames": yolo_cigarette_frames
-            })
-
-        # Save Raw JSON
-        raw_json_path = os.path.join(args.output_dir, f"raw_results_minconf_{min_conf}.json")
-        with open(raw_json_path, "w") as rf:
-            json.dump(per_video_stats, rf, indent=2)
-        print(f"  → Saved raw results to {raw_json_path}")
+        # Exact curves: counts only change at the per-video purities themselves
+        breakpoints = np.unique(np.concatenate([purity[np.isfinite(purity)].ravel(), [0.0]]))
+        curves = {
+            lbl: {"purity": breakpoints.tolist(), **{name: (c[name].tolist() if name != "total_videos" else c[name])
+                                                     for name in SWEEP_FIELDS}}
+            for lbl, c in purity_counts(labels, codes, purity, breakpoints).items()
+        }
+        curves_path = os.path.join(output_dir, f"purity_curves_minconf_{min_conf}.json")
+        with open(curves_path, "w") as cf:
+            json.dump(curves, cf)
+        print(f"  → Saved exact purity curves ({len(breakpoints)} breakpoints) to {curves_path}")
 
-        # ③ Sweep Purity Thresholds
-        # args.holding_thresholds is reused as purity_thresholds
-        for purity in args.holding_thresholds:
-            key = f"minconf_{min_conf}_pres_{purity}" # keep key name 'pres' for compatibility with existing parser if needed, or change to 'purity'
-            # Let's keep 'pres' format for graph script compatibility? 
-            # Or clarify it's purity. Let's use 'pres' but know it means purity in this context.
-            
-            overall_results[ENGINE_NAME][key] = {}
-            labels = sorted({v["label"] for v in per_video_stats})
-            
-            for lbl in labels:
-                vids = [v for v in per_video_stats if v["label"] == lbl]
-                total_videos = len(vids)
-                phone_count = 0
-                cigarette_count = 0
-                total_detected_count = 0
-                
-                for v in vids:
-                    # Purity Calculation
-                    # Phone
-                    yolo_p = v["yolo_phone_frames"]
-                    conf_p = v["phone_frames"]
-                    purity_p = (conf_p / yolo_p) if yolo_p > 0 else 0
-                    is_phone = (purity_p >= purity) and (yolo_p > 0) # Must have at least one detection
-                    
-                    # Cigarette
-                    yolo_c = v["yolo_cigarette_frames"]
-                    conf_c = v["cigarette_frames"]
-                    purity_c = (conf_c / yolo_c) if yolo_c > 0 else 0
-                    is_cigarette = (purity_c >= purity) and (yolo_c > 0)
-                    
-                    if is_phone: phone_count += 1
-                    if is_cigarette: cigarette_count += 1
-                    if is_phone or is_cigarette: total_detected_count += 1
-
-                overall_results[ENGINE_NAME][key][lbl] = {
-                    "total_videos": total_videos,
-                    "total_detected": total_detected_count,
-                    "phone": phone_count,
-                    "cigarette": cigarette_count
-                }
-            print(f"  → {key} (Purity={purity}): computed for labels {labels}")
+    # ④ Purity Table (total_detected per label and threshold)
+    table_path = os.path.join(output_dir, "purity_table.md")
+    with open(table_path, "w") as tf:
+        tf.write("\n".join(table_lines) + "\n")
+    print("\n".join(table_lines))
 
     # ⑤ Save Final JSON
-    final_json_path = os.path.join(args.output_dir, "results_all.json")
+    final_json_path = os.path.join(output_dir, "results_all.json")
     with open(final_json_path, "w") as jf:
         json.dump(overall_results, jf, indent=2)
     print(f"\n=== Saved final JSON to {final_json_path} ===")
 
     # ⑥ Graph Generation (Purity Axis)
-    with open(final_json_path, "r") as f:
-        results = json.load(f)
-
-    grouped = {} 
-    for combo_key, labels_data in results[ENGINE_NAME].items():
+    grouped = {}
+    for combo_key, labels_data in overall_results[ENGINE_NAME].items():
         parts = combo_key.split("_")
         minconf_val = parts[1]
         pres_val = float(parts[3]) # This is Purity
-        if minconf_val not in grouped:
-            grouped[minconf_val] = {}
-        grouped[minconf_val][pres_val] = labels_data
+        grouped.setdefault(minconf_val, {})[pres_val] = labels_data
 
-    graph_dir = os.path.join(args.output_dir, "graphs")
+    graph_dir = os.path.join(output_dir, "graphs")
     os.makedirs(graph_dir, exist_ok=True)
-
-    for minconf_val, pres_dict in grouped.items():
-        plt.figure(figsize=(8, 5))
-        all_labels = sorted({lbl for pres_val in pres_dict for lbl in pres_dict[pres_val].keys()})
-        for lbl in all_labels:
-            x_vals = []
-            y_vals_phone = []
-            y_vals_cigarette = []
-            for pres_val in sorted(pres_dict.keys()):
-                counts = pres_dict[pres_val].get(lbl, {"total_videos": 0, "phone": 0, "cigarette": 0})
-                total = counts["total_videos"]
-                phone = counts["phone"]
-                cigarette = counts["cigarette"]
-                phone_ratio = (phone / total) if total > 0 else 0
-                cigarette_ratio = (cigarette / total) if total > 0 else 0
-                x_vals.append(pres_val)
-                y_vals_phone.append(phone_ratio)
-                y_vals_cigarette.append(cigarette_ratio)
-            
-            plt.plot(x_vals, y_vals_phone, marker='o', label=f"{lbl} (Phone)")
-            plt.plot(x_vals, y_vals_cigarette, marker='x', linestyle='--', label=f"{lbl} (Cigarette)")
-        plt.title(f'Purity Threshold Sweep (min_conf={minconf_val})') # Updated Title
-        plt.xlabel("PURITY_THRESHOLD (Confirmed/YOLO)") # Updated Label
-        plt.ylabel("Detection Ratio (Videos Detected / Total Videos)")
-        plt.ylim(0, 1.0)
-        plt.legend()
-        plt.grid(True)
-        graph_path = os.path.join(graph_dir, f"graph_minconf_{minconf_val}.png")
-        plt.savefig(graph_path)
-        plt.close()
+    jobs = [(minconf_val, pres_dict, os.path.join(graph_dir, f"graph_minconf_{minconf_val}.png"))
+            for minconf_val, pres_dict in grouped.items()]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=multiprocessing.get_context("spawn")) as ex:
+            paths = list(ex.map(render_graph, *zip(*jobs)))
+    else:
+        paths = [render_graph(*job) for job in jobs]
+    for (minconf_val, _, _), graph_path in zip(jobs, paths):
         print(f"Saved graph for min_conf={minconf_val} to {graph_path}")
 
+def render_graph(minconf_val, pres_dict, graph_path):
+    """Detection ratio over purity for one min_conf (runs in a worker process when graphs render in parallel)."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(8, 5))
+    all_labels = sorted({lbl for pres_val in pres_dict for lbl in pres_dict[pres_val].keys()})
+    for lbl in all_labels:
+        x_vals = []
+        y_vals_phone = []
+        y_vals_cigarette = []
+        for pres_val in sorted(pres_dict.keys()):
+            counts = pres_dict[pres_val].get(lbl, {"total_videos": 0, "phone": 0, "cigarette": 0})
+            total = counts["total_videos"]
+            phone = counts["phone"]
+            cigarette = counts["cigarette"]
+            phone_ratio = (phone / total) if total > 0 else 0
+            cigarette_ratio = (cigarette / total) if total > 0 else 0
+            x_vals.append(pres_val)
+            y_vals_phone.append(phone_ratio)
+            y_vals_cigarette.append(cigarette_ratio)
+        
+        plt.plot(x_vals, y_vals_phone, marker='o', label=f"{lbl} (Phone)")
+        plt.plot(x_vals, y_vals_cigarette, marker='x', linestyle='--', label=f"{lbl} (Cigarette)")
+    plt.title(f'Purity Threshold Sweep (min_conf={minconf_val})') # Updated Title
+    plt.xlabel("PURITY_THRESHOLD (Confirmed/YOLO)") # Updated Label
+    plt.ylabel("Detection Ratio (Videos Detected / Total Videos)")
+    plt.ylim(0, 1.0)
+    plt.legend()
+    plt.grid(True)
+    plt.savefig(graph_path)
+    plt.close()
+    return graph_path
+
+def report_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="local_test_event_screening.py report",
+        description="Purity table / results_all.json / graphs from existing raw_results_minconf_*.json (no inference)"
+    )
+    parser.add_argument("--output_dir", type=str, required=True, help="Output directory")
+    parser.add_argument("--raw_dir", type=str, default=None, help="Directory with raw_results_minconf_*.json (default: output_dir)")
+    parser.add_argument("--holding_thresholds", type=float, nargs="+", default=[0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0], help="Purity Thresholds to sweep")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes for graph rendering")
+    args = parser.parse_args(argv)
+
+    raw_by_conf = {}
+    prefix = "raw_results_minconf_"
+    for path in glob.glob(os.path.join(args.raw_dir or args.output_dir, f"{prefix}*.json")):
+        min_conf = float(os.path.basename(path)[len(prefix):-len(".json")])
+        with open(path, "r") as rf:
+            raw_by_conf[min_conf] = json.load(rf)
+    if not raw_by_conf:
+        parser.error(f"no {prefix}*.json in {args.raw_dir or args.output_dir}")
+    os.makedirs(args.output_dir, exist_ok=True)
+    build_report(raw_by_conf, args.holding_thresholds, args.output_dir, workers=args.workers)
+
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["report"]:
+        report_main(sys.argv[2:])
+        sys.exit(0)
+
     parser = argparse.ArgumentParser(
         description="YOLO 推論 + Purity Threshold Sweep"
     )
@@ -189,5 +358,8 @@ if __name__ == "__main__":
     parser.add_argument("--holding_thresholds", type=float, nargs="+", default=[0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0], help="Purity Thresholds to sweep")
     parser.add_argument("--model_path", type=str, default=None, help="Model path")
     parser.add_argument("--annotate", action="store_true", help="Save annotated videos")
+    parser.add_argument("--workers", type=int, default=1, help="Processes, each with its own detector")
+    parser.add_argument("--exact", action="store_true", help="Run inference once per min_conf instead of deriving higher min_conf counts from cached "
+                        "scores (the derivation assumes confirmation is decided per frame)")
     args = parser.parse_args()
     main(args)
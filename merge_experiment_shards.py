@@ -0,0 +1,94 @@
+import argparse
+import glob
+import json
+import os
+import sys
+
+from experiment_results import JOURNAL_NAME, params_key, write_experiment_outputs, write_master_summary
+from run_journal import read_journal
+
+# Combine the shards of a sharded run_experiment_suite run (--task_count N, or
+# BATCH_TASK_COUNT on Batch) into the usual result_<exp>.json and
+# master_experiment_summary.json at the top of the output directory.
+#
+#   python merge_experiment_shards.py --output_dir /mnt/disks/output --config threshold_experiments.json
+#
+# Local check: run the shards as separate processes, then merge:
+#   for i in 0 1 2 3; do python run_experiment_suite.py ... --task_index $i --task_count 4 & done; wait
+
+
+def load_shards(output_dir):
+    """
+    (videos assigned to the shards found, {(experiment, params_key, video): record},
+    number of videos assigned to shards that are absent) over all shard_* dirs.
+    """
+    shard_dirs = sorted(glob.glob(os.path.join(output_dir, "shard_*")))
+    if not shard_dirs:
+        raise FileNotFoundError(f"No shard_* directories under {output_dir}")
+
+    videos, records, task_counts, totals, found = [], {}, set(), set(), set()
+    for path in shard_dirs:
+        manifest_path = os.path.join(path, "shard_manifest.json")
+        if not os.path.exists(manifest_path):
+            print(f"{os.path.basename(path)}: no shard_manifest.json, skipped")
+            continue
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        task_counts.add(manifest["task_count"])
+        totals.add(manifest["total_videos"])
+        found.add(manifest["task_index"])
+        videos.extend(manifest["videos"])
+        for record in read_journal(os.path.join(path, JOURNAL_NAME)):
+            records[(record["experiment"], record["params_key"], record["video"])] = record
+        print(f"{os.path.basename(path)}: {len(manifest['videos'])} videos")
+
+    if not task_counts:
+        raise FileNotFoundError(f"No shard manifests under {output_dir}")
+    if len(task_counts) > 1 or len(totals) > 1:
+        raise ValueError(f"Shards from different runs: task counts {sorted(task_counts)}, videos {sorted(totals)}")
+    expected, total = task_counts.pop(), totals.pop()
+    videos = sorted(set(videos))
+    absent = sorted(set(range(expected)) - found)
+    if absent:
+        # A shard that never started has no manifest, so its videos are only known by count
+        print(f"Missing shards {absent} of {expected}: {total - len(videos)} videos have no result")
+    return videos, records, total - len(videos)
+
+
+def merge_shards(output_dir, experiment_config_path, profile=False):
+    """Write merged outputs; returns {exp_id: number of videos missing a result}."""
+    with open(experiment_config_path, 'r') as f:
+        experiments = json.load(f)
+    video_names, records, absent_videos = load_shards(output_dir)
+
+    results_summary, missing = {}, {}
+    for exp in experiments:
+        exp_id, params = exp["id"], exp["params"]
+        key = params_key(params)
+        results_by_video = {}
+        for name in video_names:
+            record = records.get((exp_id, key, name))
+            if record is not None:
+                results_by_video[name] = record["result"]
+        missing[exp_id] = len(video_names) - len(results_by_video) + absent_videos
+        results_summary[exp_id] = write_experiment_outputs(output_dir, exp_id, params, results_by_video,
+                                                           video_names, profile=profile)
+        print(f"{exp_id}: {results_summary[exp_id]['counts']} (missing {missing[exp_id]})")
+
+    write_master_summary(output_dir, results_summary)
+    return missing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge run_experiment_suite shards into master_experiment_summary.json")
+    parser.add_argument("--output_dir", required=True, help="The --output_dir the shards were run with")
+    parser.add_argument("--config", required=True)
+    parser.add_argument("--profile", action="store_true", help="Also merge per-video profiles")
+    parser.add_argument("--allow_partial", action="store_true", help="Exit 0 even if some videos have no result")
+    args = parser.parse_args()
+
+    missing = merge_shards(args.output_dir, args.config, profile=args.profile)
+    print("Merge complete.")
+    if any(missing.values()) and not args.allow_partial:
+        print(f"Incomplete shards: {missing}")
+        sys.exit(1)
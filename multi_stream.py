@@ -0,0 +1,105 @@
+from frame_decoder import to_source_coords
+from stage_profiler import StageProfiler
+
+# Multi-stream executor: M videos analysed side by side on one detector and one
+# loaded model. Every step reads the next kept frame of each active video,
+# runs one batched detector call over all of them and then updates each
+# video's own tracker, track_data and per-video params (detector.begin_stream).
+# When a video ends its slot is refilled from the queue, so the batch stays
+# full until the queue drains.
+#
+#   executor = MultiStreamExecutor(detector, num_streams=4)
+#   for video_path, result in executor.run(video_files):
+#       ...
+#
+# Results are yielded in completion order. result is None when the video
+# failed mid-analysis (the error is printed), matching the per-video
+# try/except of the sequential loop. Errors are isolated per frame inside
+# track_batch (isolate_errors=True), so only the stream whose frame fails is
+# dropped and no tracker ever sees a frame twice.
+
+
+class MultiStreamExecutor:
+    def __init__(self, detector, num_streams=4):
+        self.detector = detector
+        self.num_streams = max(1, int(num_streams))
+
+    def _open(self, video_path, profile):
+        try:
+            return self.detector.begin_stream(video_path, profile=profile), None
+        except ValueError:
+            print(f"Error opening video: {video_path}")
+            return None, {"status": "error", "logs": []}
+
+    def _infer(self, frames, streams, profile):
+        inference = self.detector.inference
+        trackers = [s["tracker"] for s in streams]
+        if not profile:
+            return inference.track_batch(frames, trackers, isolate_errors=True)
+
+        # Split the batched inference / tracking time evenly over the videos in the batch
+        batch_prof = StageProfiler()
+        results = inference.track_batch(frames, trackers, profiler=batch_prof, isolate_errors=True)
+        for stream in streams:
+            prof = stream["profiler"]
+            prof.observe("batch_size", len(streams))
+            for name, (total, _) in batch_prof.stages.items():
+                prof.add(name, total / len(streams))
+        return results
+
+    def run(self, video_paths, profile=False):
+        """Yield (video_path, result) for every video, analysing up to num_streams at once."""
+        pending = list(video_paths)[::-1]
+        active = []
+        try:
+            while pending or active:
+                # Refill free slots
+                while pending and len(active) < self.num_streams:
+                    video_path = pending.pop()
+                    stream, error = self._open(video_path, profile)
+                    if stream is None:
+                        yield video_path, error
+                    else:
+                        active.append(stream)
+
+                frames, ready = [], []
+                for stream in list(active):
+                    try:
+                        frame = self.detector.next_frame(stream)
+                    except Exception as e:
+                        print(f"Error processing {stream['video_path']}: {e}")
+                        active.remove(stream)
+                        stream["source"].release()
+                        yield stream["video_path"], None
+                        continue
+                    if frame is None:
+                        active.remove(stream)
+                        stream["source"].release()
+                        yield stream["video_path"], self.detector.finish_stream(stream)
+                        continue
+                    frames.append(frame)
+                    ready.append(stream)
+
+                if not ready:
+                    continue
+                try:
+                    results = self._infer(frames, ready, profile)
+                except Exception as e:
+                    # Outside the per-frame isolation: no way to tell which trackers were updated
+                    print(f"Batched inference failed: {e}")
+                    results = [None] * len(ready)
+                for stream, result in zip(ready, results):
+                    try:
+                        if result is not None:
+                            boxes, track_ids = result
+                            self.detector.update_stream(stream, to_source_coords(boxes, stream["source"]), track_ids)
+                            continue
+                    except Exception as e:
+                        print(f"Error processing {stream['video_path']}: {e}")
+                    # Inference (already reported) or tracking update failed: drop this video only
+                    active.remove(stream)
+                    stream["source"].release()
+                    yield stream["video_path"], None
+        finally:
+            for stream in active:
+                stream["source"].release()
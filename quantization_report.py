@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+from datetime import datetime
+
+from benchmark_backends import agreement, load_sample, run_backend
+
+# Accuracy-vs-speed report for INT8 inference against the FP32 baseline.
+# Each mode gets a batch_results_summary_<mode>.json in the usual
+# {"timestamp", "summary", "details"} shape, plus one comparison report.
+
+
+def to_batch_summary(verdicts, videos):
+    """Existing batch_results_summary layout: videos that failed (no verdict) are listed under details["error"]."""
+    details = {"danger": [], "positive": [], "safe": [], "error": []}
+    for name in sorted(os.path.basename(v) for v in videos):
+        status = verdicts[name]["status"] if name in verdicts else "error"
+        details[status if status in details else "error"].append(name)
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "summary": {k: len(v) for k, v in details.items() if k != "error"},
+        "details": details,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare INT8 inference modes against FP32")
+    parser.add_argument("--input_dir", required=True)
+    parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--file_lists", nargs="+", default=["tp_file_list.txt", "fp_file_list.txt"])
+    parser.add_argument("--sample", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default="yolo11x.pt")
+    parser.add_argument("--baseline_backend", default="torch", choices=["torch", "onnx", "openvino"])
+    parser.add_argument("--modes", nargs="+", default=["int8_dynamic", "int8_static"],
+                        choices=["int8_dynamic", "int8_static"])
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    videos = load_sample(args.input_dir, args.file_lists, args.sample, args.seed)
+    print(f"Quantization report on {len(videos)} videos")
+
+    runs = {"fp32": run_backend(args.baseline_backend, args.model, videos, precision="fp32")}
+    for mode in args.modes:
+        print(f"--- Mode: {mode} ---")
+        runs[mode] = run_backend("onnx", args.model, videos, precision=mode)
+
+    baseline = runs["fp32"]
+    baseline_summary = to_batch_summary(baseline["verdicts"], videos)["summary"]
+    report = {"timestamp": datetime.now().isoformat(), "baseline_backend": args.baseline_backend, "modes": {}}
+    for mode, run in runs.items():
+        summary = to_batch_summary(run["verdicts"], videos)
+        with open(os.path.join(args.output_dir, f"batch_results_summary_{mode}.json"), 'w') as f:
+            json.dump(summary, f, indent=4)
+        report["modes"][mode] = {
+            "summary": summary["summary"],
+            "summary_delta": {k: summary["summary"][k] - baseline_summary[k] for k in summary["summary"]},
+            "frames_per_sec": run["frames_per_sec"],
+            "speedup": run["frames_per_sec"] / baseline["frames_per_sec"] if baseline["frames_per_sec"] else None,
+            "agreement": agreement(baseline["verdicts"], run["verdicts"]),
+        }
+
+    report_path = os.path.join(args.output_dir, "quantization_report.json")
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    print("| Mode | Danger | Positive | Safe | frames/sec | speedup | verdict agreement | per-second agreement |")
+    print("| :--- | ---: | ---: | ---: | ---: | ---: | ---: | ---: |")
+    for mode, r in report["modes"].items():
+        s, a = r["summary"], r["agreement"]
+        speedup = f"{r['speedup']:.2f}x" if r["speedup"] else "-"
+        verdict = f"{a['verdict_agreement']:.1%}" if a["verdict_agreement"] is not None else "-"
+        second = f"{a['second_agreement']:.1%}" if a["second_agreement"] is not None else "-"
+        print(f"| {mode} | {s['danger']} | {s['positive']} | {s['safe']} | {r['frames_per_sec']:.1f} | {speedup} | {verdict} | {second} |")
+    print(f"Saved report to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
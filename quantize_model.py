@@ -0,0 +1,144 @@
+import argparse
+import os
+import random
+
+import cv2
+import numpy as np
+
+from benchmark_backends import load_sample
+
+# INT8 quantization of the vehicle model for CPU workers.
+# Static quantization is calibrated on frames sampled from our own TP/FP corpus
+# so activation ranges match dashcam footage rather than COCO.
+
+
+def letterbox(frame, imgsz=640):
+    """Resize keeping aspect ratio and pad to imgsz x imgsz (ultralytics LetterBox, center=True)."""
+    h, w = frame.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * r)), int(round(h * r))
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - new_h) // 2, (imgsz - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = resized
+    return canvas
+
+
+def to_input_tensor(frame, imgsz=640):
+    """BGR uint8 frame -> (1, 3, imgsz, imgsz) float32 RGB in [0, 1]."""
+    img = letterbox(frame, imgsz)[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(img, dtype=np.float32)[None] / 255.0
+
+
+def sample_calibration_frames(videos, num_frames, seed=0):
+    """Spread num_frames evenly over the videos, at random positions inside each clip."""
+    rng = random.Random(seed)
+    per_video = max(1, num_frames // max(1, len(videos)))
+    frames = []
+    for video_path in videos:
+        cap = cv2.VideoCapture(video_path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        if total <= 0:
+            cap.release()
+            continue
+        for idx in sorted(rng.sample(range(total), min(per_video, total))):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        cap.release()
+        if len(frames) >= num_frames:
+            break
+    print(f"Sampled {len(frames)} calibration frames from {len(videos)} videos")
+    return frames[:num_frames]
+
+
+def _copy_metadata(src_path, dst_path):
+    """Keep the ultralytics metadata (names, stride, imgsz) so YOLO() can load the INT8 model."""
+    import onnx
+
+    src = onnx.load(src_path)
+    dst = onnx.load(dst_path)
+    existing = {p.key for p in dst.metadata_props}
+    for prop in src.metadata_props:
+        if prop.key not in existing:
+            dst.metadata_props.add(key=prop.key, value=prop.value)
+    onnx.save(dst, dst_path)
+
+
+def quantize_dynamic_int8(fp32_path, output_path):
+    """Weights-only INT8 quantization; needs no calibration data."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp_path = output_path + ".tmp"
+    print(f"Quantizing (dynamic INT8) {fp32_path} -> {output_path}")
+    quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+    _copy_metadata(fp32_path, tmp_path)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def quantize_static_int8(fp32_path, output_path, frames, imgsz=640):
+    """Weights + activations INT8 (QDQ), calibrated on `frames`."""
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    input_name = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self._frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            return None if frame is None else {input_name: to_input_tensor(frame, imgsz)}
+
+    tmp_path = output_path + ".tmp"
+    print(f"Quantizing (static INT8, {len(frames)} calibration frames) {fp32_path} -> {output_path}")
+    quantize_static(
+        fp32_path, tmp_path, FrameReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    _copy_metadata(fp32_path, tmp_path)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build INT8 variants of the vehicle model")
+    parser.add_argument("--weights", default="yolo11x.pt")
+    parser.add_argument("--input_dir", help="Corpus directory (required for static calibration)")
+    parser.add_argument("--file_lists", nargs="+", default=["tp_file_list.txt", "fp_file_list.txt"])
+    parser.add_argument("--modes", nargs="+", default=["int8_dynamic", "int8_static"],
+                        choices=["int8_dynamic", "int8_static"])
+    parser.add_argument("--calib_videos", type=int, default=64)
+    parser.add_argument("--calib_frames", type=int, default=256)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    from inference_backends import export_cached, exported_model_path
+
+    model = YOLO(args.weights)
+    fp32_path = export_cached(model, "onnx", imgsz=args.imgsz)
+
+    for mode in args.modes:
+        output_path = exported_model_path(args.weights, "onnx", mode)
+        if mode == "int8_dynamic":
+            quantize_dynamic_int8(fp32_path, output_path)
+            continue
+        if not args.input_dir:
+            parser.error("--input_dir is required for int8_static calibration")
+        videos = load_sample(args.input_dir, args.file_lists, args.calib_videos, args.seed)
+        frames = sample_calibration_frames(videos, args.calib_frames, args.seed)
+        quantize_static_int8(fp32_path, output_path, frames, args.imgsz)
+    print("Quantization complete.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import importlib
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+from event_clips import flagged_windows
+from run_journal import read_journal
+
+# Targeted re-analysis: re-check only the seconds a previous run flagged.
+#
+#   python reanalyze.py --input_dir videos/ --previous results.jsonl --output reanalysis.json \
+#       --params '{"DIST_DANGER_M": 12.0}'
+#
+# For every video the previous result's flagged seconds (logs.followingDistance)
+# and events become padded windows; the detector seeks straight to each window
+# (minus WINDOW_WARMUP_SEC for tracker / EMA convergence) and analyses only
+# those frames. Seconds outside the windows were not flagged before and are
+# reported as unchanged.
+#
+# --previous accepts a JSONL of {"video": ..., "result": {...}} records (the
+# run_experiment_suite journal) or a JSON object {video: result}; fanout.py
+# output ({video: {"following_distance": result, ...}}) works too. A journal
+# holding several experiments needs --experiment (and --params_key if that
+# experiment ran with several param sets).
+
+
+def select_run(records, experiment=None, params_key=None):
+    """Journal records of one (experiment, params_key) run; exits if the choice is ambiguous."""
+    if experiment is not None:
+        records = [r for r in records if r.get("experiment") == experiment]
+    if params_key is not None:
+        records = [r for r in records if r.get("params_key") == params_key]
+    runs = sorted({(r.get("experiment"), r.get("params_key")) for r in records}, key=str)
+    if len(runs) > 1:
+        print("The journal holds several runs; choose one with --experiment / --params_key:")
+        for exp, key in runs:
+            print(f"  --experiment {exp} --params_key {key}")
+        sys.exit(1)
+    if not records:
+        print(f"No journal records for experiment={experiment} params_key={params_key}")
+        sys.exit(1)
+    return records
+
+
+def load_previous(path, experiment=None, params_key=None):
+    """{video filename: analyze_video result} from a JSONL journal (one run of it) or a JSON mapping."""
+    if path.endswith(".jsonl"):
+        records = select_run(read_journal(path), experiment, params_key)
+        previous = {r["video"]: r["result"] for r in records if r.get("result")}
+    else:
+        with open(path, 'r') as f:
+            previous = json.load(f)
+    return {
+        os.path.basename(video): result.get("following_distance", result)
+        for video, result in previous.items()
+    }
+
+
+def window_status(events, start, end):
+    types = {e["type"] for e in events if start <= e["time"] <= end}
+    if "danger" in types:
+        return "danger"
+    if "positive" in types:
+        return "positive"
+    return "safe"
+
+
+def merge_logs(previous_logs, new_logs, windows):
+    """Previous per-second logs with the re-analysed windows' seconds replaced."""
+    length = max(len(previous_logs), len(new_logs))
+    merged = [dict(entry) for entry in previous_logs] + [{"isDetected": False}] * (length - len(previous_logs))
+    for start, end in windows:
+        for sec in range(int(start), min(int(math.ceil(end)), length)):
+            merged[sec] = new_logs[sec] if sec < len(new_logs) else {"isDetected": False}
+    return merged
+
+
+def reanalyze_video(detector, video_path, previous, padding_sec=1.0):
+    windows = flagged_windows(previous, padding_sec)
+    record = {"video": os.path.basename(video_path), "previous_status": previous.get("status")}
+    if not windows:
+        record.update({"status": previous.get("status"), "changed": False, "windows": [], "analyzed_seconds": 0.0})
+        return record
+
+    result = detector.analyze_video(video_path, windows=windows)
+    if result["status"] == "error":
+        record.update({"status": "error", "changed": False, "windows": [], "analyzed_seconds": 0.0})
+        return record
+
+    # Drop events confirmed during the warm-up before a window
+    new_events = [e for e in result.get("events", []) if any(start <= e["time"] <= end for start, end in windows)]
+    window_records = []
+    for start, end in windows:
+        entry = {"start": start, "end": end, "status": window_status(new_events, start, end)}
+        if "events" in previous:
+            entry["previous"] = window_status(previous["events"], start, end)
+        window_records.append(entry)
+
+    statuses = {w["status"] for w in window_records}
+    if "danger" in statuses:
+        status = "danger"
+    elif "positive" in statuses or (previous.get("status") == "positive" and "events" not in previous):
+        # Without previous events a recovery outside the flagged seconds cannot be ruled out
+        status = "positive"
+    else:
+        status = "safe"
+
+    record.update({
+        "status": status,
+        "changed": status != previous.get("status"),
+        "windows": window_records,
+        "analyzed_seconds": round(sum(end - start for start, end in windows), 2),
+        "events": new_events,
+        "logs": {"followingDistance": merge_logs(previous.get("logs", {}).get("followingDistance", []),
+                                                 result["logs"]["followingDistance"], windows)},
+    })
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-analyse only the flagged seconds of previously analysed videos")
+    parser.add_argument("--input_dir", required=True)
+    parser.add_argument("--previous", required=True, help="Previous results (.jsonl journal or JSON mapping)")
+    parser.add_argument("--experiment", default=None, help="Experiment id to take from a multi-experiment journal")
+    parser.add_argument("--params_key", default=None, help="params_key to take from the journal (if ambiguous)")
+    parser.add_argument("--output", default="reanalysis.json")
+    parser.add_argument("--params", default=None, help="JSON parameter overrides, or a path to a JSON file")
+    parser.add_argument("--statuses", nargs="+", default=["danger"], help="Previous statuses to re-check")
+    parser.add_argument("--padding", type=float, default=1.0, help="Seconds added around each flagged window")
+    parser.add_argument("--detector_module", default="detector_dynamic")
+    parser.add_argument("--model", "-m", default="yolo11x.pt")
+    parser.add_argument("--backend", default=None, choices=["torch", "onnx", "openvino"])
+    args = parser.parse_args()
+
+    if args.params:
+        params = args.params
+        if os.path.exists(params):
+            with open(params, 'r') as f:
+                params = f.read()
+        # Same override path as run_experiment_suite
+        os.environ["FOLLOWING_DISTANCE_CONFIG_JSON"] = params
+
+    module = importlib.import_module(args.detector_module)
+    detector = module.FollowingDistanceDetector(model_name=args.model, backend=args.backend)
+
+    previous = load_previous(args.previous, args.experiment, args.params_key)
+    targets = sorted(v for v, r in previous.items() if r.get("status") in args.statuses)
+    print(f"Re-checking {len(targets)} of {len(previous)} videos (statuses: {args.statuses})")
+
+    start = time.perf_counter()
+    details = {}
+    for i, video in enumerate(targets):
+        if i % 50 == 0: print(f"Processing {i}/{len(targets)}...")
+        video_path = os.path.join(args.input_dir, video)
+        if not os.path.exists(video_path):
+            print(f"Missing video: {video_path}")
+            continue
+        try:
+            details[video] = reanalyze_video(detector, video_path, previous[video], args.padding)
+        except Exception as e:
+            print(f"Error processing {video_path}: {e}")
+    elapsed = time.perf_counter() - start
+
+    transitions = Counter(f"{r['previous_status']}->{r['status']}" for r in details.values() if r["changed"])
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "summary": dict(Counter(r["status"] for r in details.values())),
+        "changed": dict(transitions),
+        "analyzed_seconds": round(sum(r["analyzed_seconds"] for r in details.values()), 1),
+        "elapsed_sec": round(elapsed, 1),
+        "details": details,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Summary: {report['summary']}  changed: {report['changed']}")
+    print(f"Analyzed {report['analyzed_seconds']}s of video in {elapsed:.0f}s. Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+# Local SQLite index over the result files scattered around the tree:
+#
+#   batch_results_summary_<version>.json                 per-video status (details lists)
+#   <run dir>/result_<exp>.json                          per-video status + params (run_experiment_suite)
+#   build_tmp/<version>_results/<dataset>.json           precision sweep counts per threshold
+#   build_tmp/historical_results/<version>/<dataset>.json
+#   build_tmp/precision_report/<version>/<dataset>/results.json
+#   *.md tables in the generate_precision_table layout   (--table, for numbers only kept as text)
+#
+#   python results_store.py ingest .                               # incremental (mtime + size)
+#   python results_store.py diff v6 fix --status danger            # danger in v6 but not in fix
+#   python results_store.py diff tp threshold_experiments_v1_tp:exp_v07   # TPs lost by exp_v07
+#   python results_store.py counts
+#   python results_store.py metrics --dataset others --min_conf 0.5
+#   python results_store.py sql "SELECT ..."
+#
+# A run is addressed as "version" or "version:experiment". Batch summaries use
+# the file suffix as version ("" -> "base"); result_<exp>.json uses its
+# directory name as version and <exp> as experiment.
+
+DEFAULT_DB = "results.db"
+SKIP_DIRS = {".git", "node_modules", "__pycache__", "web", "app"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY, mtime REAL, size INTEGER, kind TEXT, ingested_at REAL);
+CREATE TABLE IF NOT EXISTS video_results (
+    source TEXT, version TEXT, experiment TEXT, video TEXT, status TEXT);
+CREATE INDEX IF NOT EXISTS idx_video_results_run ON video_results (version, experiment, status, video);
+CREATE INDEX IF NOT EXISTS idx_video_results_video ON video_results (video);
+CREATE INDEX IF NOT EXISTS idx_video_results_source ON video_results (source);
+CREATE TABLE IF NOT EXISTS experiment_params (
+    source TEXT, version TEXT, experiment TEXT, params TEXT);
+CREATE INDEX IF NOT EXISTS idx_experiment_params_source ON experiment_params (source);
+CREATE TABLE IF NOT EXISTS metrics (
+    source TEXT, version TEXT, dataset TEXT, model TEXT, min_conf REAL, presence REAL,
+    total_videos INTEGER, total_detected INTEGER, phone INTEGER, cigarette INTEGER);
+CREATE INDEX IF NOT EXISTS idx_metrics_run ON metrics (dataset, min_conf, presence, version);
+CREATE INDEX IF NOT EXISTS idx_metrics_source ON metrics (source);
+"""
+
+THRESHOLD_KEY = re.compile(r"minconf_([\d.]+)_pres_([\d.]+)$")
+
+
+def connect(db_path=DEFAULT_DB):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def classify(path):
+    """(kind, version, dataset_or_experiment) for a file the store understands, else None."""
+    name = os.path.basename(path)
+    parts = os.path.normpath(path).split(os.sep)
+    if name.startswith("batch_results_summary") and name.endswith(".json"):
+        suffix = name[len("batch_results_summary"):-len(".json")].lstrip("_")
+        return "batch_summary", suffix or "base", ""
+    if name.startswith("result_") and name.endswith(".json"):
+        return "experiment_result", parts[-2] if len(parts) > 1 else "", name[len("result_"):-len(".json")]
+    if name.endswith(".json") and len(parts) >= 2 and parts[-2].endswith("_results"):
+        return "precision", parts[-2][:-len("_results")], name[:-len(".json")]
+    if name.endswith(".json") and len(parts) >= 3 and parts[-3] == "historical_results":
+        return "precision", parts[-2], name[:-len(".json")]
+    if name == "results.json" and len(parts) >= 4 and parts[-4] == "precision_report":
+        return "precision", parts[-3], parts[-2]
+    return None
+
+
+def _ingest_statuses(conn, path, version, experiment, details):
+    rows = [(path, version, experiment, video, status)
+            for status, videos in details.items() for video in videos]
+    conn.executemany("INSERT INTO video_results VALUES (?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+def _ingest_file(conn, path, kind, version, name):
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if kind == "batch_summary":
+        return _ingest_statuses(conn, path, version, "", data.get("details", {}))
+    if kind == "experiment_result":
+        conn.execute("INSERT INTO experiment_params VALUES (?, ?, ?, ?)",
+                     (path, version, name, json.dumps(data.get("summary", {}).get("params", {}), sort_keys=True)))
+        return _ingest_statuses(conn, path, version, name, data.get("details", {}))
+
+    rows = []
+    for model, sweeps in data.items():
+        for key, groups in sweeps.items():
+            match = THRESHOLD_KEY.match(key)
+            if not match:
+                continue
+            m = groups.get("default", {})
+            rows.append((path, version, name, model, float(match.group(1)), float(match.group(2)),
+                         m.get("total_videos"), m.get("total_detected"), m.get("phone"), m.get("cigarette")))
+    conn.executemany("INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+def ingest_table(conn, path, min_conf=0.5, presences=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7)):
+    """Markdown rows `| version | dataset | total | <count per presence> |` (generate_precision_table layout).
+
+    A blank version cell continues the previous row's version; ** markup is ignored.
+    """
+    rows, version = [], None
+    with open(path, 'r') as f:
+        for line in f:
+            cells = [c.strip().strip("*").strip() for c in line.strip().strip("|").split("|")]
+            if len(cells) != 3 + len(presences) or not cells[2].isdigit():
+                continue
+            version = cells[0] or version
+            for presence, value in zip(presences, cells[3:]):
+                detected = int(value) if value.isdigit() else None
+                rows.append((path, version, cells[1], "inward_day_detector", min_conf, presence,
+                             int(cells[2]), detected, None, None))
+    conn.executemany("INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+def _forget(conn, path):
+    for table in ("video_results", "experiment_params", "metrics"):
+        conn.execute(f"DELETE FROM {table} WHERE source = ?", (path,))
+    conn.execute("DELETE FROM sources WHERE path = ?", (path,))
+
+
+def _changed(conn, path, st):
+    row = conn.execute("SELECT mtime, size FROM sources WHERE path = ?", (path,)).fetchone()
+    return row is None or row[0] != st.st_mtime or row[1] != st.st_size
+
+
+def ingest(conn, roots, tables=()):
+    """Re-read only files whose mtime/size changed; drop rows of files that disappeared."""
+    seen, stats = set(), {"files": 0, "skipped": 0, "rows": 0, "removed": 0}
+    candidates = []
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            for filename in filenames:
+                path = os.path.normpath(os.path.join(dirpath, filename))
+                info = classify(path)
+                if info:
+                    candidates.append((path, info))
+    candidates += [(os.path.normpath(path), ("table", None, None)) for path in tables]
+
+    with conn:
+        for path, (kind, version, name) in candidates:
+            seen.add(path)
+            st = os.stat(path)
+            if not _changed(conn, path, st):
+                stats["skipped"] += 1
+                continue
+            _forget(conn, path)
+            try:
+                if kind == "table":
+                    stats["rows"] += ingest_table(conn, path)
+                else:
+                    stats["rows"] += _ingest_file(conn, path, kind, version, name)
+            except (json.JSONDecodeError, AttributeError, ValueError) as e:
+                print(f"Skipping {path}: {e}")
+                continue
+            conn.execute("INSERT INTO sources VALUES (?, ?, ?, ?, ?)", (path, st.st_mtime, st.st_size, kind, time.time()))
+            stats["files"] += 1
+
+        for (path,) in conn.execute("SELECT path FROM sources").fetchall():
+            if path not in seen and not os.path.exists(path):
+                _forget(conn, path)
+                stats["removed"] += 1
+    return stats
+
+
+def _run(selector):
+    version, _, experiment = selector.partition(":")
+    return version, experiment
+
+
+def videos(conn, selector, status="danger"):
+    version, experiment = _run(selector)
+    rows = conn.execute("SELECT DISTINCT video FROM video_results WHERE version = ? AND experiment = ? AND status = ?",
+                        (version, experiment, status))
+    return {r[0] for r in rows}
+
+
+def diff(conn, a, b, status="danger"):
+    """Videos with `status` in run a but not in run b, e.g. FPs in v5 that v6 no longer flags."""
+    version_a, exp_a = _run(a)
+    version_b, exp_b = _run(b)
+    rows = conn.execute("""
+        SELECT DISTINCT video FROM video_results WHERE version = ? AND experiment = ? AND status = ?
+        EXCEPT
+        SELECT video FROM video_results WHERE version = ? AND experiment = ? AND status = ?
+        ORDER BY video""", (version_a, exp_a, status, version_b, exp_b, status))
+    return [r[0] for r in rows]
+
+
+def counts(conn, version=None):
+    query = "SELECT version, experiment, status, COUNT(DISTINCT video) FROM video_results"
+    args = ()
+    if version:
+        query += " WHERE version = ?"
+        args = (version,)
+    table = {}
+    for v, exp, status, n in conn.execute(query + " GROUP BY version, experiment, status", args):
+        table.setdefault((v, exp), {})[status] = n
+    return table
+
+
+def metrics_table(conn, dataset, min_conf=0.5):
+    """{version: {presence: total_detected}} for one dataset at one min_conf."""
+    table = {}
+    rows = conn.execute("""SELECT version, presence, total_detected FROM metrics
+                           WHERE dataset = ? AND min_conf = ? ORDER BY version, presence""", (dataset, min_conf))
+    for version, presence, detected in rows:
+        table.setdefault(version, {})[presence] = detected
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexed store for experiment / batch / precision results")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ingest", help="Index result files under the given roots (incremental)")
+    p.add_argument("roots", nargs="*", default=["."])
+    p.add_argument("--table", nargs="*", default=[], help="Markdown tables in the generate_precision_table layout")
+
+    p = sub.add_parser("diff", help="Videos with STATUS in run A but not in run B")
+    p.add_argument("a")
+    p.add_argument("b")
+    p.add_argument("--status", default="danger")
+
+    p = sub.add_parser("counts", help="Status counts per run")
+    p.add_argument("--version", default=None)
+
+    p = sub.add_parser("metrics", help="total_detected per version and presence threshold")
+    p.add_argument("--dataset", required=True)
+    p.add_argument("--min_conf", type=float, default=0.5)
+
+    p = sub.add_parser("sql", help="Run an SQL query against the store")
+    p.add_argument("query")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    start = time.perf_counter()
+    if args.command == "ingest":
+        stats = ingest(conn, args.roots, args.table)
+        print(f"Ingested {stats['files']} files ({stats['rows']} rows), unchanged {stats['skipped']}, removed {stats['removed']}")
+    elif args.command == "diff":
+        result = diff(conn, args.a, args.b, args.status)
+        for video in result:
+            print(video)
+        print(f"{len(result)} videos {args.status} in {args.a} but not in {args.b}", file=sys.stderr)
+    elif args.command == "counts":
+        print("| Version | Experiment | Danger | Positive | Safe |")
+        print("| :--- | :--- | ---: | ---: | ---: |")
+        for (version, exp), c in sorted(counts(conn, args.version).items()):
+            print(f"| {version} | {exp or '-'} | {c.get('danger', 0)} | {c.get('positive', 0)} | {c.get('safe', 0)} |")
+    elif args.command == "metrics":
+        table = metrics_table(conn, args.dataset, args.min_conf)
+        presences = sorted({p for row in table.values() for p in row})
+        print("| Version | " + " | ".join(f"{p:.1f}s" for p in presences) + " |")
+        print("| :--- |" + " :---: |" * len(presences))
+        for version, row in sorted(table.items()):
+            print(f"| {version} | " + " | ".join(str(row.get(p, "-")) for p in presences) + " |")
+    elif args.command == "sql":
+        for row in conn.execute(args.query):
+            print("\t".join(str(v) for v in row))
+    print(f"({(time.perf_counter() - start) * 1000:.1f} ms)", file=sys.stderr)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,74 +3,108 @@ import os
 import json
 import glob
 from detector import FollowingDistanceDetector  # Import the local (injected) detector class
+from experiment_results import JOURNAL_NAME, params_key, write_experiment_outputs, write_master_summary
+from multi_stream import MultiStreamExecutor
+from run_journal import RunJournal
 
-def run_experiment_suite(input_dir, output_dir, experiment_config_path):
+def shard_videos(video_files, task_index, task_count):
+    """
+    Deterministic size-balanced split: largest file first onto the least loaded shard (LPT).
+    File size tracks decode + inference cost far better than file count for mixed-length clips.
+    """
+    sizes = {v: os.path.getsize(v) for v in video_files}
+    loads = [0] * task_count
+    assigned = [[] for _ in range(task_count)]
+    for video in sorted(video_files, key=lambda v: (-sizes[v], os.path.basename(v))):
+        shard = min(range(task_count), key=lambda i: (loads[i], i))
+        loads[shard] += sizes[video]
+        assigned[shard].append(video)
+    return sorted(assigned[task_index])
+
+def shard_dir(output_dir, task_index):
+    return os.path.join(output_dir, f"shard_{task_index:04d}")
+
+def run_experiment_suite(input_dir, output_dir, experiment_config_path, profile=False, backend=None, decode_process=False,
+                         streams=1, journal_path=None, task_index=0, task_count=1):
     print(f"Loading experiments from {experiment_config_path}")
     with open(experiment_config_path, 'r') as f:
         experiments = json.load(f)
 
-    # Load video list
-    video_files = glob.glob(os.path.join(input_dir, "*.mp4"))
+    # Load video list (sorted so every shard sees the same order)
+    video_files = sorted(glob.glob(os.path.join(input_dir, "*.mp4")))
     print(f"Found {len(video_files)} videos.")
 
+    if task_count > 1:
+        # Sharded run (Batch task array): this task's videos, all experiments, outputs under shard_NNNN/.
+        # merge_experiment_shards.py combines the shards into the usual master summary.
+        all_videos = len(video_files)
+        video_files = shard_videos(video_files, task_index, task_count)
+        output_dir = shard_dir(output_dir, task_index)
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, "shard_manifest.json"), 'w') as f:
+            json.dump({"task_index": task_index, "task_count": task_count, "total_videos": all_videos,
+                       "videos": [os.path.basename(v) for v in video_files],
+                       "bytes": sum(os.path.getsize(v) for v in video_files)}, f, indent=2)
+        print(f"Shard {task_index}/{task_count}: {len(video_files)} of {all_videos} videos")
+        if journal_path:
+            # One journal per shard, where merge_experiment_shards.py reads it; a shared custom
+            # path would have every task appending to the same file
+            print(f"--journal is ignored for sharded runs; using {os.path.join(output_dir, JOURNAL_NAME)}")
+            journal_path = None
+
+    # Every per-video result is appended to the journal as it completes. A restarted run
+    # (preemption / maxRunDuration retry) skips the (experiment, video) pairs already in it,
+    # and all summaries are rebuilt from the journal, so rerunning is idempotent.
+    journal = RunJournal(journal_path or os.path.join(output_dir, JOURNAL_NAME),
+                         key_fields=("experiment", "params_key", "video"))
+    video_names = [os.path.basename(v) for v in video_files]
+
     results_summary = {}
 
     for exp in experiments:
         exp_id = exp["id"]
         params = exp["params"]
+        exp_key = params_key(params)
         print(f"--- Running Experiment: {exp_id} ---")
         print(f"Params: {params}")
 
-        # Set environment variable for the detector to pick up
-        os.environ["FOLLOWING_DISTANCE_CONFIG_JSON"] = json.dumps(params)
-        
-        # Re-instantiate detector to pick up new env vars (crucial!)
-        detector = FollowingDistanceDetector(model_name="yolo11x.pt") # Assume model pre-loaded/downloaded
+        todo = [v for v in video_files if not journal.done((exp_id, exp_key, os.path.basename(v)))]
+        if len(todo) < len(video_files):
+            print(f"Resuming: {len(video_files) - len(todo)} videos already in journal, {len(todo)} to run")
 
-        exp_results = {
-            "danger": [],
-            "safe": [],
-            "positive": []
-        }
-
-        # Process all videos
-        for i, video_path in enumerate(video_files):
-            if i % 50 == 0: print(f"Processing {i}/{len(video_files)}...")
+        if todo:
+            # Set environment variable for the detector to pick up
+            os.environ["FOLLOWING_DISTANCE_CONFIG_JSON"] = json.dumps(params)
             
-            try:
-                # We reuse the analyze_video method directly to avoid overhead
-                result = detector.analyze_video(video_path, output_path=None, annotate=False)
-                status = result["status"]
-                filename = os.path.basename(video_path)
-                
-                if status == "danger":
-                    exp_results["danger"].append(filename)
-                elif status == "positive":
-                    exp_results["positive"].append(filename)
-                else:
-                    exp_results["safe"].append(filename)
-            except Exception as e:
-                print(f"Error processing {video_path}: {e}")
+            # Re-instantiate detector to pick up new env vars (crucial!)
+            detector = FollowingDistanceDetector(model_name="yolo11x.pt", backend=backend) # Assume model pre-loaded/downloaded
+            if decode_process:
+                # Decode in a separate process; frames arrive through a shared-memory ring
+                detector.params["DECODE_PROCESS"] = True
+
+            # Process remaining videos: `streams` videos at a time on the one loaded model, with batched
+            # inference and a separate tracker per video (streams=1 is the plain sequential loop)
+            executor = MultiStreamExecutor(detector, num_streams=streams)
+            for i, (video_path, result) in enumerate(executor.run(todo, profile=profile)):
+                if i % 50 == 0: print(f"Processing {i}/{len(todo)}...")
+                if result is not None:
+                    journal.append({"experiment": exp_id, "params_key": exp_key,
+                                    "video": os.path.basename(video_path), "result": result})
+            journal.flush()
+
+        # Rebuild from the journal (covers earlier attempts; streams > 1 finishes out of order)
+        results_by_video = {}
+        for filename in video_names:
+            record = journal.get((exp_id, exp_key, filename))
+            if record is not None:
+                results_by_video[filename] = record["result"]
+        results_summary[exp_id] = write_experiment_outputs(output_dir, exp_id, params, results_by_video,
+                                                           video_names, profile=profile)
 
-        # Save summary for this experiment
-        summary_entry = {
-            "params": params,
-            "counts": {
-                "danger": len(exp_results["danger"]),
-                "positive": len(exp_results["positive"]),
-                "safe": len(exp_results["safe"])
-            },
-            # "details": exp_results # Too big to dump all details for 24 experiments in one file?
-        }
-        results_summary[exp_id] = summary_entry
-        
-        # Save individual experiment result to disk
-        with open(os.path.join(output_dir, f"result_{exp_id}.json"), 'w') as f:
-             json.dump({"summary": summary_entry, "details": exp_results}, f, indent=2)
+    journal.close()
 
     # Save master summary
-    with open(os.path.join(output_dir, "master_experiment_summary.json"), 'w') as f:
-        json.dump(results_summary, f, indent=2)
+    write_master_summary(output_dir, results_summary)
     print("All experiments complete.")
 
 if __name__ == "__main__":
@@ -78,7 +112,18 @@ if __name__ == "__main__":
     parser.add_argument("--input_dir", required=True)
     parser.add_argument("--output_dir", required=True)
     parser.add_argument("--config", required=True)
+    parser.add_argument("--profile", action="store_true", help="Write per-video stage profiles and percentile summaries")
+    parser.add_argument("--decode_process", action="store_true", help="Decode videos in a separate process (shared-memory frame ring)")
+    parser.add_argument("--streams", type=int, default=1, help="Videos analysed concurrently with batched inference on one model")
+    parser.add_argument("--journal", default=None, help=f"Per-video results journal for resume (default: <output_dir>/{JOURNAL_NAME}; "
+                        f"sharded runs always use <output_dir>/shard_NNNN/{JOURNAL_NAME})")
+    # Cloud Batch sets BATCH_TASK_INDEX / BATCH_TASK_COUNT for each task of a taskCount > 1 job
+    parser.add_argument("--task_index", type=int, default=int(os.environ.get("BATCH_TASK_INDEX", 0)))
+    parser.add_argument("--task_count", type=int, default=int(os.environ.get("BATCH_TASK_COUNT", 1)))
     args = parser.parse_args()
+    if not 0 <= args.task_index < args.task_count:
+        parser.error(f"task_index {args.task_index} out of range for task_count {args.task_count}")
     
     os.makedirs(args.output_dir, exist_ok=True)
-    run_experiment_suite(args.input_dir, args.output_dir, args.config)
+    run_experiment_suite(args.input_dir, args.output_dir, args.config, profile=args.profile, decode_process=args.decode_process,
+                         streams=args.streams, journal_path=args.journal, task_index=args.task_index, task_count=args.task_count)
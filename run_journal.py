@@ -0,0 +1,94 @@
+import json
+import os
+import time
+
+# Append-only JSONL journal of completed work items, for resumable runs.
+#
+#   journal = RunJournal(path, key_fields=("experiment", "params_key", "video"))
+#   if not journal.done(record_key): ... journal.append(record)
+#
+# Records are flushed (and fsynced) every `flush_every` records or
+# `flush_sec` seconds, so a preempted task loses at most that much work. A
+# torn last line from a kill mid-write is cut off when the journal is
+# reopened. Loading keeps the last record per key, so replaying a journal or
+# appending a duplicate is harmless.
+
+
+def _parse_lines(data):
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            continue  # torn line
+
+
+def read_journal(path):
+    """Records of a journal without opening it for writing (e.g. merging shard journals)."""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        return list(_parse_lines(f.read()))
+
+
+class RunJournal:
+    def __init__(self, path, key_fields, flush_every=20, flush_sec=30.0):
+        self.path = path
+        self.key_fields = tuple(key_fields)
+        self.flush_every = flush_every
+        self.flush_sec = flush_sec
+        self.records = {}
+        self._load()
+        self._file = open(path, 'a')
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def key(self, record):
+        return tuple(record.get(field) for field in self.key_fields)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            # Drop a partially written last line before appending after it
+            print(f"Journal {self.path}: dropping {len(data) - end} bytes of a torn last record")
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+        for record in _parse_lines(data[:end]):
+            self.records[self.key(record)] = record
+        print(f"Journal {self.path}: {len(self.records)} completed records")
+
+    def done(self, key):
+        return key in self.records
+
+    def get(self, key):
+        return self.records.get(key)
+
+    def append(self, record):
+        self.records[self.key(record)] = record
+        self._file.write(json.dumps(record) + "\n")
+        self._pending += 1
+        if self._pending >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_sec:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
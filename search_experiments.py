@@ -0,0 +1,283 @@
+import argparse
+import glob
+import importlib
+import json
+import math
+import os
+import random
+import sys
+from datetime import datetime
+
+from experiment_results import params_key
+from multi_stream import MultiStreamExecutor
+from run_journal import RunJournal
+
+# Adaptive threshold search (successive halving) instead of the full
+# generate_experiments.py grid.
+#
+#   python search_experiments.py --tp_dir /mnt/disks/input_tp --fp_dir /mnt/disks/input_fp \
+#       --output_dir ./search --candidates 27 --eta 3 --min_recall 0.7
+#
+# Each round samples candidates from SEARCH_SPACE (random, or TPE with
+# optuna), evaluates them on a small stratified TP/FP subset, keeps the best
+# 1/eta and grows the subset eta-fold, until the survivors have seen the whole
+# corpus. Subsets are nested prefixes of one seeded shuffle, so a survivor only
+# analyses the videos it has not seen yet.
+#
+# Objective (the grid's "recall >70% while keeping FP as low as possible"):
+# candidates reaching --min_recall rank above those that do not and among
+# themselves by FP rate; the rest rank by recall.
+#
+# Per-video results go to a RunJournal keyed like run_experiment_suite's, so
+# an interrupted search resumes without re-analysing. --emit_experiments
+# writes the finalists in the threshold_experiments.json format for a
+# confirmation run with run_experiment_suite.py.
+
+# name: [low, high, step] (stepped range) or a list of choices
+SEARCH_SPACE = {
+    "DIST_DANGER_M": [12.0, 15.0, 0.5],
+    "DANGER_PERSISTENCE_SEC": [0.5, 1.0, 0.1],
+    "EMA_ALPHA": [0.2, 0.6, 0.1],
+}
+
+FIXED_PARAMS = {
+    "DIST_WARN_M": 30.0,  # Same as generate_experiments.py
+}
+
+JOURNAL_NAME = "search_journal.jsonl"
+
+
+def _is_range(spec):
+    return isinstance(spec, list) and len(spec) == 3 and all(isinstance(v, (int, float)) for v in spec)
+
+
+def _steps(spec):
+    if _is_range(spec):
+        low, high, step = spec
+        return [round(low + i * step, 6) for i in range(int(round((high - low) / step)) + 1)]
+    return list(spec)
+
+
+def sample_random(space, n, rng):
+    """Up to n distinct candidates drawn uniformly from the stepped ranges."""
+    choices = {name: _steps(spec) for name, spec in space.items()}
+    total = math.prod(len(v) for v in choices.values())
+    candidates, seen = [], set()
+    while len(candidates) < min(n, total):
+        params = {name: rng.choice(values) for name, values in choices.items()}
+        key = params_key(params)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(params)
+    return candidates
+
+
+class TPESampler:
+    """optuna ask/tell over SEARCH_SPACE; each round's results inform the next round's candidates."""
+
+    def __init__(self, space, seed):
+        try:
+            import optuna
+        except ImportError:
+            raise RuntimeError("--strategy tpe needs optuna (pip install optuna)")
+        optuna.logging.set_verbosity(optuna.logging.WARNING)
+        self.space = space
+        self.study = optuna.create_study(direction="maximize", sampler=optuna.samplers.TPESampler(seed=seed))
+        self.trials = {}
+
+    def sample(self, n):
+        candidates = []
+        for _ in range(n):
+            trial = self.study.ask()
+            params = {}
+            for name, spec in self.space.items():
+                if _is_range(spec):
+                    params[name] = round(trial.suggest_float(name, spec[0], spec[1], step=spec[2]), 6)
+                else:
+                    params[name] = trial.suggest_categorical(name, list(spec))
+            self.trials.setdefault(params_key(params), []).append(trial)
+            candidates.append(params)
+        return candidates
+
+    def tell(self, params, value):
+        for trial in self.trials.pop(params_key(params), []):
+            self.study.tell(trial, value)
+
+
+def score(recall, fp_rate, min_recall):
+    """Scalar objective: above the recall floor, lower FP is better; below it, higher recall is."""
+    if recall >= min_recall:
+        return 1.0 + (1.0 - fp_rate)
+    return recall
+
+
+class SearchEvaluator:
+    """Runs candidates on video subsets with one loaded detector, reusing journaled results."""
+
+    def __init__(self, detector, journal, streams=1, model=None):
+        self.detector = detector
+        self.base_params = dict(detector.params)
+        self.model = model
+        self.journal = journal
+        self.streams = streams
+        self.evaluations = 0
+
+    def _status(self, key, video_path):
+        record = self.journal.get(("search", key, os.path.basename(video_path)))
+        # "error" records come from journals written before failures were left unjournaled
+        return None if record is None or record["result"]["status"] == "error" else record["result"]["status"]
+
+    def _results(self, params, video_files):
+        """{video name: status} of the videos that analysed; failed ones are retried on the next call."""
+        merged = {**self.base_params, **FIXED_PARAMS, **params}
+        # Keyed on everything the result depends on, so a journal reused after changing the
+        # detector defaults, FIXED_PARAMS or --model is not served stale statuses
+        key = params_key({**merged, "_model": self.model})
+        todo = [v for v in video_files if self._status(key, v) is None]
+        if todo:
+            # analyze_video copies detector.params per video, so swapping them here is enough
+            self.detector.params = merged
+            for video_path, result in MultiStreamExecutor(self.detector, num_streams=self.streams).run(todo):
+                self.evaluations += 1
+                if result is None:
+                    continue  # not journaled, like run_experiment_suite: a transient failure is retried
+                self.journal.append({"experiment": "search", "params_key": key,
+                                     "video": os.path.basename(video_path), "params": params,
+                                     "result": {"status": result["status"]}})
+            self.journal.flush()
+        statuses = {os.path.basename(v): self._status(key, v) for v in video_files}
+        return {name: status for name, status in statuses.items() if status is not None}
+
+    def evaluate(self, params, tp_videos, fp_videos, min_recall):
+        tp = self._results(params, tp_videos)
+        fp = self._results(params, fp_videos)
+        # Failed videos are left out of the denominators rather than counted as misses
+        recall = sum(s == "danger" for s in tp.values()) / len(tp) if tp else 0.0
+        fp_rate = sum(s == "danger" for s in fp.values()) / len(fp) if fp else 0.0
+        return {"params": params, "tp_videos": len(tp), "fp_videos": len(fp),
+                "failed_videos": len(tp_videos) + len(fp_videos) - len(tp) - len(fp),
+                "recall": round(recall, 4), "fp_rate": round(fp_rate, 4),
+                "score": round(score(recall, fp_rate, min_recall), 4)}
+
+
+def _subset(videos, fraction):
+    return videos[:min(len(videos), max(1, math.ceil(len(videos) * fraction)))]
+
+
+def successive_halving(evaluator, candidates, tp_videos, fp_videos, eta, min_videos, min_recall):
+    """Returns (rungs, survivors' evaluations on the full corpus)."""
+    total = len(tp_videos) + len(fp_videos)
+    fraction = min(1.0, min_videos / total)
+    rungs = []
+    while True:
+        tp, fp = _subset(tp_videos, fraction), _subset(fp_videos, fraction)
+        evals = [evaluator.evaluate(p, tp, fp, min_recall) for p in candidates]
+        evals.sort(key=lambda e: (e["score"], e["recall"]), reverse=True)
+        rungs.append({"tp_videos": len(tp), "fp_videos": len(fp), "candidates": evals})
+        print(f"Rung {len(rungs) - 1}: {len(candidates)} candidates on {len(tp)} TP + {len(fp)} FP videos; "
+              f"best {evals[0]['params']} recall={evals[0]['recall']} fp_rate={evals[0]['fp_rate']}")
+        if fraction >= 1.0:
+            return rungs, evals
+        keep = max(1, len(candidates) // eta)
+        candidates = [e["params"] for e in evals[:keep]]
+        # A single survivor still goes to the full corpus so the reported operating point is exact
+        fraction = 1.0 if keep == 1 else min(1.0, fraction * eta)
+
+
+def list_videos(directory, seed):
+    videos = sorted(glob.glob(os.path.join(directory, "*.mp4")))
+    random.Random(seed).shuffle(videos)
+    return videos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Successive-halving threshold search over the TP/FP corpus")
+    parser.add_argument("--tp_dir", required=True, help="Videos that should be flagged danger")
+    parser.add_argument("--fp_dir", required=True, help="Videos that should not")
+    parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--space", default=None, help="JSON file overriding SEARCH_SPACE")
+    parser.add_argument("--strategy", default="random", choices=["random", "tpe"])
+    parser.add_argument("--candidates", type=int, default=27, help="Candidates per round")
+    parser.add_argument("--rounds", type=int, default=1, help="Successive-halving rounds (tpe learns across rounds)")
+    parser.add_argument("--eta", type=int, default=3, help="Keep 1/eta of candidates and grow the subset eta-fold per rung")
+    parser.add_argument("--min_videos", type=int, default=30, help="TP + FP videos in the first rung")
+    parser.add_argument("--min_recall", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--streams", type=int, default=1, help="Videos analysed concurrently with batched inference")
+    parser.add_argument("--emit_experiments", type=int, default=0, metavar="K",
+                        help="Write the top K as search_experiments.json for run_experiment_suite.py")
+    parser.add_argument("--detector_module", default="detector_dynamic")
+    parser.add_argument("--model", "-m", default="yolo11x.pt")
+    parser.add_argument("--backend", default=None, choices=["torch", "onnx", "openvino"])
+    args = parser.parse_args()
+    if args.eta < 2:
+        parser.error("--eta must be at least 2")
+
+    space = SEARCH_SPACE
+    if args.space:
+        with open(args.space, 'r') as f:
+            space = json.load(f)
+
+    tp_videos = list_videos(args.tp_dir, args.seed)
+    fp_videos = list_videos(args.fp_dir, args.seed)
+    if not tp_videos:
+        print(f"No videos in {args.tp_dir}")
+        sys.exit(1)
+    print(f"Found {len(tp_videos)} TP and {len(fp_videos)} FP videos.")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    module = importlib.import_module(args.detector_module)
+    detector = module.FollowingDistanceDetector(model_name=args.model, backend=args.backend)
+    rng = random.Random(args.seed)
+    tpe = TPESampler(space, args.seed) if args.strategy == "tpe" else None
+
+    rounds, finalists = [], {}
+    with RunJournal(os.path.join(args.output_dir, JOURNAL_NAME),
+                    key_fields=("experiment", "params_key", "video")) as journal:
+        evaluator = SearchEvaluator(detector, journal, streams=args.streams, model=args.model)
+        for r in range(args.rounds):
+            candidates = tpe.sample(args.candidates) if tpe else sample_random(space, args.candidates, rng)
+            print(f"--- Round {r}: {len(candidates)} candidates ---")
+            rungs, final = successive_halving(evaluator, candidates, tp_videos, fp_videos,
+                                              args.eta, args.min_videos, args.min_recall)
+            if tpe:
+                # Each trial is scored at the last rung it reached
+                reached = {}
+                for rung in rungs:
+                    for e in rung["candidates"]:
+                        reached[params_key(e["params"])] = e
+                for e in reached.values():
+                    tpe.tell(e["params"], e["score"])
+            rounds.append(rungs)
+            for e in final:
+                finalists[params_key(e["params"])] = e
+
+    ranked = sorted(finalists.values(), key=lambda e: (e["score"], e["recall"]), reverse=True)
+    grid_evaluations = args.rounds * args.candidates * (len(tp_videos) + len(fp_videos))
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "strategy": args.strategy,
+        "min_recall": args.min_recall,
+        "fixed_params": FIXED_PARAMS,
+        "best": ranked[0],
+        "finalists": ranked,
+        "rounds": rounds,
+        "video_evaluations": evaluator.evaluations,
+        "full_evaluation_equivalent": grid_evaluations,
+    }
+    with open(os.path.join(args.output_dir, "search_results.json"), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if args.emit_experiments:
+        experiments = [{"id": f"search_{i + 1:02d}", "params": {**e["params"], **FIXED_PARAMS}}
+                       for i, e in enumerate(ranked[:args.emit_experiments])]
+        with open(os.path.join(args.output_dir, "search_experiments.json"), 'w') as f:
+            json.dump(experiments, f, indent=2)
+
+    best = ranked[0]
+    print(f"Best: {best['params']} recall={best['recall']} fp_rate={best['fp_rate']}")
+    print(f"Video evaluations: {evaluator.evaluations} (evaluating every candidate on every video: {grid_evaluations})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import json
+import resource
+import sys
+import time
+
+import numpy as np
+
+# Per-stage timers and counters for the following-distance pipeline.
+# Detectors take profile=True (or a StageProfiler to share across stages, e.g.
+# download + analysis + API post in execute). When profiling is off they use
+# NULL_PROFILER, whose methods are no-ops, so the frame loop stays branch-free.
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class _StageTimer:
+    __slots__ = ("_profiler", "_name", "_start")
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._profiler.add(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class StageProfiler:
+    enabled = True
+
+    def __init__(self):
+        self.stages = {}        # name -> [total_sec, calls]
+        self.counters = {}      # name -> int
+        self.observations = {}  # name -> [sum, max, count]
+
+    def stage(self, name):
+        return _StageTimer(self, name)
+
+    def add(self, name, seconds):
+        entry = self.stages.get(name)
+        if entry is None:
+            self.stages[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        entry = self.observations.get(name)
+        if entry is None:
+            self.observations[name] = [value, value, 1]
+        else:
+            entry[0] += value
+            entry[1] = max(entry[1], value)
+            entry[2] += 1
+
+    def to_dict(self):
+        return {
+            "stages": {
+                name: {"total_sec": total, "calls": calls, "mean_ms": 1000.0 * total / calls if calls else 0.0}
+                for name, (total, calls) in self.stages.items()
+            },
+            "counters": dict(self.counters),
+            "observations": {
+                name: {"mean": s / n if n else 0.0, "max": m, "count": n}
+                for name, (s, m, n) in self.observations.items()
+            },
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullProfiler:
+    enabled = False
+    _timer = _NullTimer()
+
+    def stage(self, name):
+        return self._timer
+
+    def add(self, name, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def observe(self, name, value):
+        pass
+
+    def to_dict(self):
+        return None
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def make_profiler(profile):
+    """profile may be False/None, True, or an existing StageProfiler to keep filling."""
+    if isinstance(profile, (StageProfiler, NullProfiler)):
+        return profile
+    return StageProfiler() if profile else NULL_PROFILER
+
+
+def _percentiles(values):
+    arr = np.asarray(values, dtype=np.float64)
+    return {
+        "count": int(arr.size),
+        "sum": float(arr.sum()),
+        "mean": float(arr.mean()),
+        "p50": float(np.percentile(arr, 50)),
+        "p90": float(np.percentile(arr, 90)),
+        "p99": float(np.percentile(arr, 99)),
+        "max": float(arr.max()),
+    }
+
+
+def summarize_profiles(profiles):
+    """Aggregate per-video profile dicts into per-stage / per-counter percentiles."""
+    profiles = [p for p in profiles if p]
+    stage_secs, counters, observations = {}, {}, {}
+    for p in profiles:
+        for name, s in p["stages"].items():
+            stage_secs.setdefault(name, []).append(s["total_sec"])
+        for name, v in p["counters"].items():
+            counters.setdefault(name, []).append(v)
+        for name, o in p["observations"].items():
+            observations.setdefault(name, []).append(o["mean"])
+    return {
+        "videos": len(profiles),
+        "stages_sec": {name: _percentiles(v) for name, v in stage_secs.items()},
+        "counters": {name: _percentiles(v) for name, v in counters.items()},
+        "observations_mean": {name: _percentiles(v) for name, v in observations.items()},
+        "peak_rss_mb": max((p["peak_rss_mb"] for p in profiles), default=0.0),
+    }
+
+
+def write_jsonl(records, path):
+    """Append one JSON object per record (e.g. {"video": ..., "profile": ...})."""
+    with open(path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def to_prometheus(summary, prefix="following_distance"):
+    """Render a summarize_profiles() result in the Prometheus text exposition format."""
+    lines = [
+        f"# TYPE {prefix}_videos gauge",
+        f"{prefix}_videos {summary['videos']}",
+        f"# TYPE {prefix}_peak_rss_mb gauge",
+        f"{prefix}_peak_rss_mb {summary['peak_rss_mb']:.3f}",
+        f"# TYPE {prefix}_stage_seconds summary",
+    ]
+    for name, s in summary["stages_sec"].items():
+        for q in ("p50", "p90", "p99"):
+            lines.append(f'{prefix}_stage_seconds{{stage="{name}",quantile="0.{q[1:]}"}} {s[q]:.6f}')
+        lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {s["sum"]:.6f}')
+        lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {s["count"]}')
+    lines.append(f"# TYPE {prefix}_counter_total counter")
+    for name, s in summary["counters"].items():
+        lines.append(f'{prefix}_counter_total{{counter="{name}"}} {s["sum"]:.0f}')
+    return "\n".join(lines) + "\n"
+
+
+def export_summary(summary, path):
+    """Write a batch summary as Prometheus text (.prom) or JSON (anything else)."""
+    with open(path, 'w') as f:
+        if path.endswith(".prom"):
+            f.write(to_prometheus(summary))
+        else:
+            json.dump(summary, f, indent=2)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts live at the repo root (diverse_sampling under build_tmp/) and import each other by name
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "build_tmp"))
@@ -0,0 +1,89 @@
+import os
+import tarfile
+
+from dataset_shards import ShardReader, ShardWriter, repair_shards
+
+
+def sample(key):
+    return {"jpg": f"jpg-{key}".encode() * 50, "txt": f"0 0.5 0.5 0.1 0.1 # {key}\n".encode()}
+
+
+def tar_names(shard_dir):
+    names = []
+    for name in sorted(os.listdir(shard_dir)):
+        if name.endswith(".tar"):
+            with tarfile.open(os.path.join(shard_dir, name)) as tar:
+                names.extend(tar.getnames())
+    return names
+
+
+def test_commit_then_random_access(tmp_path):
+    with ShardWriter(str(tmp_path)) as writer:
+        for key in ("a_000000", "a_000005"):
+            writer.add(key, sample(key), {"shape": [4, 4]})
+    reader = ShardReader(str(tmp_path))
+    assert reader.keys == ["a_000000", "a_000005"]
+    assert reader.read("a_000005", "jpg") == sample("a_000005")["jpg"]
+    assert reader.meta("a_000000")["shape"] == [4, 4]
+    # Still a plain tar
+    assert tar_names(str(tmp_path)) == ["a_000000.jpg", "a_000000.txt", "a_000005.jpg", "a_000005.txt"]
+
+
+def test_rollback_drops_uncommitted_samples(tmp_path):
+    writer = ShardWriter(str(tmp_path))
+    writer.add("good_000000", sample("good_000000"))
+    writer.commit()
+    writer.add("bad_000000", sample("bad_000000"))
+    writer.rollback()
+    writer.add("next_000000", sample("next_000000"))
+    writer.close()
+    reader = ShardReader(str(tmp_path))
+    assert reader.keys == ["good_000000", "next_000000"]
+    assert reader.read("next_000000", "txt") == sample("next_000000")["txt"]
+    assert "bad_000000.jpg" not in tar_names(str(tmp_path))
+
+
+def test_repair_cuts_a_killed_writer_back_to_its_last_commit(tmp_path):
+    writer = ShardWriter(str(tmp_path))
+    writer.add("kept_000000", sample("kept_000000"))
+    writer.commit()
+    writer.add("lost_000000", sample("lost_000000"))  # written, never committed
+    writer.tar.flush()
+    # Simulate the kill: no close(), and a torn index line
+    with open(writer.tar_path[:-len(".tar")] + ".idx.jsonl", 'a') as f:
+        f.write('{"key": "lo')
+    assert repair_shards(str(tmp_path)) == 1
+    assert repair_shards(str(tmp_path)) == 0
+    assert ShardReader(str(tmp_path)).keys == ["kept_000000"]
+    assert tar_names(str(tmp_path)) == ["kept_000000.jpg", "kept_000000.txt"]
+
+
+def test_writers_never_reopen_a_shard(tmp_path):
+    for key in ("a_000000", "b_000000"):
+        with ShardWriter(str(tmp_path)) as writer:
+            writer.add(key, sample(key))
+    assert sorted(n for n in os.listdir(tmp_path) if n.endswith(".tar")) == ["shard-000000.tar", "shard-000001.tar"]
+
+
+def test_delete_tombstones_earlier_samples_and_readd_wins(tmp_path):
+    with ShardWriter(str(tmp_path)) as writer:
+        for key in ("v_000000", "v_000005", "w_000000"):
+            writer.add(key, sample(key))
+    # Redo of video v in a later writer: frame 0 written again, frame 5 not
+    with ShardWriter(str(tmp_path)) as writer:
+        writer.delete(["v_000000", "v_000005"])
+        writer.add("v_000000", {"jpg": b"new", "txt": b""})
+    reader = ShardReader(str(tmp_path))
+    assert reader.keys == ["v_000000", "w_000000"]
+    assert reader.read("v_000000", "jpg") == b"new"
+
+
+def test_rolled_back_delete_keeps_the_old_samples(tmp_path):
+    with ShardWriter(str(tmp_path)) as writer:
+        writer.add("v_000000", sample("v_000000"))
+    writer = ShardWriter(str(tmp_path))
+    writer.delete(["v_000000"])
+    writer.rollback()  # the redo failed
+    writer.close()
+    assert ShardReader(str(tmp_path)).keys == ["v_000000"]
+    assert repair_shards(str(tmp_path)) == 0
@@ -0,0 +1,93 @@
+import numpy as np
+
+from diverse_sampling import SignatureCache, k_center, select_diverse, select_per_group, water_fill
+
+
+def test_water_fill_small_groups_keep_everything():
+    quotas = water_fill(np.array([2, 100, 5, 50]), 40)
+    assert quotas.sum() == 40
+    assert quotas[0] == 2 and quotas[2] == 5
+    assert abs(int(quotas[1]) - int(quotas[3])) <= 1
+
+
+def test_water_fill_caps_at_group_sizes_and_spreads_remainder():
+    assert water_fill(np.array([3, 3, 3]), 100).tolist() == [3, 3, 3]
+    quotas = water_fill(np.array([10, 10, 10]), 7)
+    assert quotas.sum() == 7 and quotas.max() - quotas.min() <= 1
+    assert water_fill(np.array([4, 9]), 0).tolist() == [0, 0]
+
+
+def test_k_center_never_picks_a_duplicate_twice():
+    x = np.zeros((6, 2), np.float32)
+    x[3:] = 1.0
+    picks = k_center(x, 3)
+    assert len(set(picks)) == 3
+
+
+def clustered_signatures(rng, sizes):
+    """Groups of near-identical 256-byte signatures, one random pattern per group."""
+    sigs, groups = [], []
+    for g, size in enumerate(sizes):
+        base = rng.integers(0, 256, 256)
+        noise = rng.integers(-3, 4, (size, 256))
+        sigs.append(np.clip(base + noise, 0, 255).astype(np.uint8))
+        groups += [g] * size
+    return np.concatenate(sigs), np.array(groups)
+
+
+def test_select_diverse_covers_rare_scenes():
+    rng = np.random.default_rng(0)
+    # One scene repeated 2000 times, 15 rare scenes of 5 frames each
+    sigs, groups = clustered_signatures(rng, [2000] + [5] * 15)
+    picked = select_diverse(sigs, 160, seed=0)
+    assert len(picked) == 160 and len(set(picked)) == 160 and picked == sorted(picked)
+    assert set(groups[picked]) == set(range(16))  # random picks would expect ~6 rare frames in total
+    assert (groups[picked] == 0).sum() < 160 - 15
+
+
+def test_select_diverse_edge_cases_and_determinism():
+    sigs, _ = clustered_signatures(np.random.default_rng(1), [50, 50])
+    assert select_diverse(sigs, 500) == list(range(100))
+    assert select_diverse(sigs, 0) == []
+    assert select_diverse(sigs, 30, seed=3) == select_diverse(sigs, 30, seed=3)
+
+
+def test_select_per_group_limits_each_group():
+    sigs, groups = clustered_signatures(np.random.default_rng(2), [10, 3, 8])
+    picked = select_per_group(sigs, [10, 3, 8], limit=4)
+    assert np.bincount(groups[picked]).tolist() == [4, 3, 4]
+
+
+class _SerialPool:
+    def __init__(self, *args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def imap_unordered(self, fn, jobs, chunksize=1):
+        return map(fn, jobs)
+
+
+def test_signature_cache_round_trip_and_torn_record(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_signature(path):
+        calls.append(path)
+        return np.full(256, int(path[-1]), np.uint8)
+
+    monkeypatch.setattr("diverse_sampling.signature", fake_signature)
+    monkeypatch.setattr("diverse_sampling.multiprocessing.Pool", _SerialPool)
+    path = str(tmp_path / "signatures.bin")
+    # Digests ending in 00 exercise the raw-bytes index (an "S32" field would strip them)
+    digests = ["ab" * 31 + "00", "cd" * 32]
+    sigs = SignatureCache(path).get(digests, ["img1", "img2"])
+    assert sigs[:, 0].tolist() == [1, 2]
+    with open(path, 'ab') as f:
+        f.write(b"\1\2\3")  # torn append
+    cache = SignatureCache(path)
+    assert cache.get(digests, ["img1", "img2"])[:, 0].tolist() == [1, 2]
+    assert calls == ["img1", "img2"]  # second load came entirely from the file
@@ -0,0 +1,40 @@
+from event_clips import event_windows, merge_windows
+
+
+def logs(flagged, length):
+    return {"followingDistance": [{"isDetected": sec in flagged} for sec in range(length)]}
+
+
+def test_merge_windows_sorts_and_merges_overlap_and_gap():
+    assert merge_windows([]) == []
+    assert merge_windows([(5, 6), (1, 2), (1.5, 3)]) == [(1, 3), (5, 6)]
+    assert merge_windows([(1, 2), (2, 3)]) == [(1, 3)]  # touching
+    assert merge_windows([(1, 2), (2.5, 3)]) == [(1, 2), (2.5, 3)]
+    assert merge_windows([(1, 2), (2.5, 3)], gap_sec=0.5) == [(1, 3)]
+    assert merge_windows([(0, 10), (2, 3)]) == [(0, 10)]  # contained
+
+
+def test_danger_event_widens_to_its_run_of_flagged_seconds():
+    result = {"logs": logs({10, 11, 12}, 20), "events": [{"type": "danger", "time": 11.2, "track_id": 1}]}
+    assert event_windows(result, padding_sec=1.0) == [(9.0, 14.0)]
+
+
+def test_positive_events_are_points_and_windows_merge_and_clip():
+    result = {"logs": logs({3}, 40),
+              "events": [{"type": "danger", "time": 3.4, "track_id": 1},
+                         {"type": "positive", "time": 5.0, "track_id": 1},
+                         {"type": "positive", "time": 29.0, "track_id": 2}]}
+    # danger run [3, 4) and positive 5.0 overlap once padded; the last window is clipped to the duration
+    assert event_windows(result, padding_sec=2.0, duration=30.0) == [(1.0, 7.0), (27.0, 30.0)]
+
+
+def test_padding_never_goes_below_zero():
+    result = {"logs": logs({0}, 5), "events": [{"type": "danger", "time": 0.5, "track_id": 1}]}
+    assert event_windows(result, padding_sec=2.0) == [(0.0, 3.0)]
+
+
+def test_results_without_events_fall_back_to_danger_seconds():
+    result = {"status": "danger", "logs": logs({4, 5, 9}, 12)}
+    assert event_windows(result, padding_sec=0.5) == [(3.5, 6.5), (8.5, 10.5)]
+    assert event_windows({"status": "safe", "logs": logs({4}, 12)}) == []
+    assert event_windows({"logs": logs(set(), 12), "events": []}) == []
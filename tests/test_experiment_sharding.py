@@ -0,0 +1,80 @@
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+# run_experiment_suite imports the injected `detector` module (run_benchmarks does the same)
+sys.modules.setdefault("detector", importlib.import_module("detector_dynamic"))
+
+from experiment_results import JOURNAL_NAME, params_key  # noqa: E402
+from merge_experiment_shards import merge_shards  # noqa: E402
+from run_experiment_suite import shard_videos  # noqa: E402
+
+
+def make_videos(tmp_path, sizes):
+    paths = []
+    for i, size in enumerate(sizes):
+        path = tmp_path / f"v{i:02d}.mp4"
+        path.write_bytes(b"\0" * size)
+        paths.append(str(path))
+    return paths
+
+
+def test_shard_videos_partitions_and_balances_bytes(tmp_path):
+    sizes = [900, 700, 650, 400, 300, 300, 120, 100, 60, 10]
+    videos = make_videos(tmp_path, sizes)
+    task_count = 3
+    shards = [shard_videos(videos, i, task_count) for i in range(task_count)]
+    assert sorted(v for shard in shards for v in shard) == sorted(videos)
+    loads = [sum(os.path.getsize(v) for v in shard) for shard in shards]
+    # LPT bound: max load <= mean + largest item
+    assert max(loads) <= sum(sizes) / task_count + max(sizes)
+    # Greedy LPT on this input: 900+300, 700+300+120+60, 650+400+100+10 (bytes)
+    assert sorted(loads) == [1160, 1180, 1200]
+
+
+def test_shard_videos_is_deterministic_and_order_independent(tmp_path):
+    videos = make_videos(tmp_path, [5, 5, 5, 5, 3])
+    first = [shard_videos(videos, i, 2) for i in range(2)]
+    again = [shard_videos(list(reversed(videos)), i, 2) for i in range(2)]
+    assert first == again
+
+
+def write_shard(output_dir, index, task_count, total, videos, experiments):
+    path = os.path.join(output_dir, f"shard_{index:04d}")
+    os.makedirs(path)
+    with open(os.path.join(path, "shard_manifest.json"), 'w') as f:
+        json.dump({"task_index": index, "task_count": task_count, "total_videos": total, "videos": videos}, f)
+    with open(os.path.join(path, JOURNAL_NAME), 'w') as f:
+        for exp in experiments:
+            for video in videos:
+                f.write(json.dumps({"experiment": exp["id"], "params_key": params_key(exp["params"]), "video": video,
+                                    "result": {"status": "safe", "logs": {"followingDistance": []}}}) + "\n")
+
+
+@pytest.fixture
+def config(tmp_path):
+    experiments = [{"id": "e1", "params": {"DIST_DANGER_M": 13.0}}]
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(experiments))
+    return str(path), experiments
+
+
+def test_merge_counts_videos_of_absent_shards_as_missing(tmp_path, config):
+    config_path, experiments = config
+    out = str(tmp_path / "out")
+    write_shard(out, 0, 3, 5, ["a.mp4", "b.mp4"], experiments)
+    write_shard(out, 2, 3, 5, ["e.mp4"], experiments)  # shard 1 (c, d) never ran
+    assert merge_shards(out, config_path) == {"e1": 2}
+
+
+def test_merge_of_complete_shards_has_nothing_missing(tmp_path, config):
+    config_path, experiments = config
+    out = str(tmp_path / "out")
+    write_shard(out, 0, 2, 3, ["a.mp4", "b.mp4"], experiments)
+    write_shard(out, 1, 2, 3, ["c.mp4"], experiments)
+    assert merge_shards(out, config_path) == {"e1": 0}
+    with open(os.path.join(out, "master_experiment_summary.json")) as f:
+        assert "e1" in json.load(f)
@@ -0,0 +1,125 @@
+import json
+
+import numpy as np
+import pytest
+
+import detector_dynamic
+from benchmarks.stub_backend import StubBackend
+from benchmarks.synthetic import generate_suite
+from inference_backends import YoloTrackBackend
+from multi_stream import MultiStreamExecutor
+
+
+@pytest.fixture(scope="module")
+def videos(tmp_path_factory):
+    # One short clip per synthetic resolution (16:9 and 4:3, so both HFOV branches run)
+    return generate_suite(str(tmp_path_factory.mktemp("videos")), seconds=3, copies=1)
+
+
+def make_detector():
+    backend = StubBackend()
+    detector = detector_dynamic.FollowingDistanceDetector(backend=backend)
+    backend.frame_skip = detector.params["FRAME_SKIP"]
+    return detector
+
+
+def canonical(result):
+    return json.dumps(result, sort_keys=True, default=float)
+
+
+@pytest.fixture(scope="module")
+def sequential(videos):
+    detector = make_detector()
+    return {v: canonical(detector.analyze_video(v)) for v in videos}
+
+
+@pytest.mark.parametrize("num_streams", [1, 3])
+def test_matches_sequential_analyze_video(videos, sequential, num_streams):
+    results = dict(MultiStreamExecutor(make_detector(), num_streams=num_streams).run(videos))
+    assert sorted(results) == sorted(videos)
+    for video in videos:
+        assert canonical(results[video]) == sequential[video], video
+
+
+def test_failing_stream_is_dropped_and_others_are_unaffected(videos, sequential):
+    detector = make_detector()
+    open_stream, replay = detector.inference.open_stream, detector.inference._replay
+    bad = videos[1]
+
+    def marking(video_path, start_frame=0):
+        stream = open_stream(video_path, start_frame)
+        stream["inject"] = video_path == bad
+        return stream
+
+    def faulty(frame, stream):
+        # Mid-batch: the streams before this one have already been stepped
+        if stream["inject"] and stream["calls"] == 5:
+            raise RuntimeError("injected")
+        return replay(frame, stream)
+
+    detector.inference.open_stream, detector.inference._replay = marking, faulty
+    results = dict(MultiStreamExecutor(detector, num_streams=3).run(videos))
+    assert results[bad] is None
+    for video in videos:
+        if video != bad:
+            assert canonical(results[video]) == sequential[video], video
+
+
+def test_unopenable_video_reports_error(videos, tmp_path):
+    missing = str(tmp_path / "missing.mp4")
+    results = dict(MultiStreamExecutor(make_detector(), num_streams=2).run([missing, videos[0]]))
+    assert results[missing]["status"] == "error"
+    assert results[videos[0]]["status"] in ("danger", "positive", "safe")
+
+
+class FakeBoxes:
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return np.zeros((0, 6), np.float32)
+
+
+class FakeResult:
+    boxes = FakeBoxes()
+
+
+class FakeModel:
+    """predict fails on batches of more than one frame, and on frames marked bad."""
+
+    def predict(self, frames, **kwargs):
+        if len(frames) > 1:
+            raise RuntimeError("batch failed")
+        if frames[0] == "bad-predict":
+            raise RuntimeError("frame failed")
+        return [FakeResult()]
+
+
+class CountingTracker:
+    def __init__(self, fail=False):
+        self.updates = 0
+        self.fail = fail
+
+    def update(self, detections, frame):
+        self.updates += 1
+        if self.fail:
+            raise RuntimeError("tracker failed")
+        return np.array([[0, 0, 10, 10, 7]], np.float32)
+
+
+def test_track_batch_isolates_errors_without_updating_a_tracker_twice():
+    backend = YoloTrackBackend("fake", FakeModel())
+    frames = ["ok", "bad-predict", "bad-track", "ok"]
+    streams = [{"video_path": f"v{i}", "tracker": CountingTracker(fail=frame == "bad-track")}
+               for i, frame in enumerate(frames)]
+    results = backend.track_batch(frames, streams, isolate_errors=True)
+    assert [r is None for r in results] == [False, True, True, False]
+    assert results[0][1] == [7]
+    # Predict failures happen before tracking; each tracker saw its frame at most once
+    assert [s["tracker"].updates for s in streams] == [1, 0, 1, 1]
+
+
+def test_track_batch_raises_without_isolation():
+    backend = YoloTrackBackend("fake", FakeModel())
+    with pytest.raises(RuntimeError):
+        backend.track_batch(["ok", "ok"], [{"video_path": "a", "tracker": CountingTracker()}] * 2)
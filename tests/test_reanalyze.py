@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from event_clips import flagged_windows
+from reanalyze import load_previous, merge_logs, reanalyze_video
+
+
+def flags(seconds, length):
+    return [{"isDetected": sec in seconds} for sec in range(length)]
+
+
+class FakeDetector:
+    """analyze_video returning a canned windowed result; records the windows it was asked for."""
+
+    def __init__(self, result):
+        self.result = result
+        self.windows = None
+
+    def analyze_video(self, video_path, windows=None):
+        self.windows = windows
+        return self.result
+
+
+def test_flagged_windows_cover_flagged_seconds_and_events():
+    previous = {"logs": {"followingDistance": flags({2, 3, 10}, 20)},
+                "events": [{"type": "positive", "time": 15.0, "track_id": 1}]}
+    assert flagged_windows(previous, padding_sec=1.0) == [(1.0, 5.0), (9.0, 12.0), (14.0, 16.0)]
+
+
+def test_merge_logs_replaces_only_window_seconds():
+    previous = flags({2, 3, 10}, 12)
+    new = flags({11}, 12)
+    merged = merge_logs(previous, new, [(1.0, 5.0)])
+    assert [e["isDetected"] for e in merged] == [sec in {10} for sec in range(12)]
+    # Seconds past the new logs' end inside a window read as not detected
+    assert merge_logs(flags({0, 5}, 6), flags(set(), 2), [(4.0, 6.0)])[5] == {"isDetected": False}
+
+
+def test_reanalyze_ignores_warmup_events_and_reports_change():
+    previous = {"status": "danger", "logs": {"followingDistance": flags({10, 11}, 20)},
+                "events": [{"type": "danger", "time": 10.5, "track_id": 1}]}
+    # Re-run finds nothing in the window; its only event is in the warm-up before it
+    result = {"status": "danger", "logs": {"followingDistance": flags({7}, 20)},
+              "events": [{"type": "danger", "time": 7.5, "track_id": 3}]}
+    detector = FakeDetector(result)
+    record = reanalyze_video(detector, "v.mp4", previous, padding_sec=1.0)
+    assert detector.windows == [(9.0, 13.0)]
+    assert record["status"] == "safe" and record["changed"]
+    assert record["events"] == []
+    assert record["windows"] == [{"start": 9.0, "end": 13.0, "status": "safe", "previous": "danger"}]
+    assert record["analyzed_seconds"] == 4.0
+
+
+def test_unflagged_video_is_not_reanalysed():
+    detector = FakeDetector(None)
+    record = reanalyze_video(detector, "v.mp4", {"status": "safe", "logs": {"followingDistance": flags(set(), 5)},
+                                                 "events": []})
+    assert detector.windows is None
+    assert record["status"] == "safe" and not record["changed"]
+
+
+def write_journal(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records))
+    return str(path)
+
+
+def test_load_previous_selects_one_run_of_a_journal(tmp_path):
+    path = write_journal(tmp_path / "j.jsonl", [
+        {"experiment": "a", "params_key": "k1", "video": "x.mp4", "result": {"status": "danger"}},
+        {"experiment": "b", "params_key": "k2", "video": "x.mp4", "result": {"status": "safe"}},
+    ])
+    assert load_previous(path, experiment="b") == {"x.mp4": {"status": "safe"}}
+    with pytest.raises(SystemExit):
+        load_previous(path)  # ambiguous
+    with pytest.raises(SystemExit):
+        load_previous(path, experiment="c")  # no records
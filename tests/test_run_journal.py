@@ -0,0 +1,41 @@
+import json
+
+from run_journal import RunJournal, read_journal
+
+KEY = ("experiment", "video")
+
+
+def write_lines(path, records, torn=b""):
+    with open(path, 'wb') as f:
+        for r in records:
+            f.write((json.dumps(r) + "\n").encode())
+        f.write(torn)
+
+
+def test_torn_last_line_is_cut_off_and_appends_stay_parseable(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    write_lines(path, [{"experiment": "e", "video": "a"}, {"experiment": "e", "video": "b"}],
+                torn=b'{"experiment": "e", "vid')
+    with RunJournal(str(path), key_fields=KEY) as journal:
+        assert journal.done(("e", "a")) and journal.done(("e", "b"))
+        assert len(journal.records) == 2
+        journal.append({"experiment": "e", "video": "c"})
+    # The torn bytes were truncated before appending, so no line was glued onto them
+    assert [r["video"] for r in read_journal(str(path))] == ["a", "b", "c"]
+    assert path.read_bytes().endswith(b"\n")
+
+
+def test_read_journal_skips_torn_line_without_modifying_file(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    write_lines(path, [{"experiment": "e", "video": "a"}], torn=b'{"experim')
+    size = path.stat().st_size
+    assert read_journal(str(path)) == [{"experiment": "e", "video": "a"}]
+    assert path.stat().st_size == size
+    assert read_journal(str(tmp_path / "missing.jsonl")) == []
+
+
+def test_last_record_per_key_wins(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    write_lines(path, [{"experiment": "e", "video": "a", "n": 1}, {"experiment": "e", "video": "a", "n": 2}])
+    with RunJournal(str(path), key_fields=KEY) as journal:
+        assert journal.get(("e", "a"))["n"] == 2
@@ -0,0 +1,58 @@
+import random
+
+import numpy as np
+
+from local_test_event_screening import purity_arrays, purity_counts
+
+
+def reference_counts(per_video_stats, purity):
+    """The per-threshold loop purity_counts replaced."""
+    out = {}
+    for lbl in sorted({v["label"] for v in per_video_stats}):
+        vids = [v for v in per_video_stats if v["label"] == lbl]
+        phone = cigarette = detected = 0
+        for v in vids:
+            yolo_p, yolo_c = v["yolo_phone_frames"], v["yolo_cigarette_frames"]
+            is_phone = yolo_p > 0 and v["phone_frames"] / yolo_p >= purity
+            is_cigarette = yolo_c > 0 and v["cigarette_frames"] / yolo_c >= purity
+            phone += is_phone
+            cigarette += is_cigarette
+            detected += is_phone or is_cigarette
+        out[lbl] = {"total_videos": len(vids), "phone": phone, "cigarette": cigarette, "total_detected": detected}
+    return out
+
+
+def random_stats(n, seed):
+    rng = random.Random(seed)
+    stats = []
+    for _ in range(n):
+        v = {"label": rng.choice(["tp", "fp", "other"])}
+        for cls in ("phone", "cigarette"):
+            yolo = rng.choice([0, 0, 1, 3, 10, 40])
+            v[f"yolo_{cls}_frames"] = yolo
+            v[f"{cls}_frames"] = rng.randint(0, yolo)
+        stats.append(v)
+    return stats
+
+
+def test_purity_counts_matches_reference_loop():
+    stats = random_stats(300, seed=1)
+    # Exact ratios (1/3, 0.5, 1.0) land on thresholds to exercise the >= boundary
+    thresholds = [0.0, 0.1, 1 / 3, 0.5, 0.7, 1.0, 1.5]
+    sweep = purity_counts(*purity_arrays(stats), thresholds)
+    for i, t in enumerate(thresholds):
+        expected = reference_counts(stats, t)
+        assert sorted(sweep) == sorted(expected)
+        for lbl, counts in expected.items():
+            got = sweep[lbl]
+            assert got["total_videos"] == counts["total_videos"]
+            for field in ("phone", "cigarette", "total_detected"):
+                assert int(got[field][i]) == counts[field], (t, lbl, field)
+
+
+def test_videos_without_yolo_frames_never_count():
+    stats = [{"label": "a", "yolo_phone_frames": 0, "phone_frames": 0,
+              "yolo_cigarette_frames": 0, "cigarette_frames": 0}]
+    sweep = purity_counts(*purity_arrays(stats), [0.0])
+    assert sweep["a"]["total_videos"] == 1
+    assert np.all(sweep["a"]["total_detected"] == 0)